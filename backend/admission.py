@@ -0,0 +1,221 @@
+"""Admission control and query cost guard for expensive endpoints.
+
+:class:`AdmissionMiddleware` gives each pool of routes (search, exports,
+catalog reads) its own concurrency limit and a bounded wait queue. A request
+that finds the queue full, or waits longer than the pool allows, gets a 503
+with ``Retry-After`` before doing any work. Routes outside every pool (cart,
+checkout, orders) are never queued, so a flood of searches cannot delay them.
+
+:class:`CostGuard` rejects a Mongo query before it is sent when it cannot use
+an index and the collection is larger than ``QUERY_MAX_DOCS_EXAMINED``. A
+``$regex``, ``$where`` or ``$expr`` filter examines the whole collection; every
+other filter and sort is served by the indexes in ``INDEX_SPEC`` and is let
+through. In practice only searches on a worker whose in-memory catalog is still
+warming up reach Mongo as a regex, and such a worker is not ready yet
+(``/readyz``), so a load balancer does not send it traffic. An offset page
+walks ``skip + limit`` index entries however the filter is served, so pages
+deeper than the same limit are rejected with a 400 pointing at ``nextCursor``.
+"""
+import asyncio
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Pattern, Tuple
+from urllib.parse import parse_qsl
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from metrics import Counter, Gauge, registry
+
+ADMISSION_ACTIVE = registry.register(Gauge(
+    "admission_active_requests", "Requests holding an admission slot.", ("pool",),
+))
+ADMISSION_QUEUED = registry.register(Gauge(
+    "admission_queued_requests", "Requests waiting for an admission slot.", ("pool",),
+))
+ADMISSION_REJECTED = registry.register(Counter(
+    "admission_rejected_total", "Requests shed by admission control or the query cost guard.", ("pool", "reason"),
+))
+
+
+@dataclass(frozen=True)
+class AdmissionPool:
+    name: str
+    # Full-match path patterns; with ``params``, only requests carrying one of
+    # those query parameters belong to the pool.
+    routes: Tuple[str, ...]
+    concurrency: int
+    queue: int
+    params: Tuple[str, ...] = ()
+    queue_timeout: float = 1.0
+    retry_after: int = 1
+
+
+class _Gate:
+    def __init__(self, pool: AdmissionPool):
+        self.pool = pool
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> Optional[str]:
+        """``None`` once a slot is held, otherwise the reason the request is shed."""
+        if self.active < self.pool.concurrency and not self._waiters:
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.pool.queue:
+            return "queue_full"
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        ADMISSION_QUEUED.inc(self.pool.name)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.pool.queue_timeout)
+            return None
+        except asyncio.TimeoutError:
+            if waiter.done():
+                return None
+            waiter.cancel()
+            return "queue_timeout"
+        except asyncio.CancelledError:
+            # A slot handed over as the client went away must be passed on.
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            ADMISSION_QUEUED.dec(self.pool.name)
+            if waiter.cancelled():
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+
+    def release(self) -> None:
+        # Hand the slot straight to the oldest waiter, so ``active`` is unchanged.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, pools: List[AdmissionPool]):
+        self.app = app
+        self.pools: List[Tuple[List[Pattern[str]], AdmissionPool]] = [
+            ([re.compile(route) for route in pool.routes], pool) for pool in pools
+        ]
+        self._gates: Dict[str, _Gate] = {pool.name: _Gate(pool) for pool in pools}
+
+    def pool_for(self, path: str, query_string: bytes) -> Optional[AdmissionPool]:
+        params = None
+        for patterns, pool in self.pools:
+            if not any(pattern.fullmatch(path) for pattern in patterns):
+                continue
+            if pool.params:
+                if params is None:
+                    params = {name for name, _ in parse_qsl(query_string.decode("latin-1"))}
+                if not params.intersection(pool.params):
+                    continue
+            return pool
+        return None
+
+    async def __call__(self, scope, receive, send):
+        pool = self.pool_for(scope["path"], scope.get("query_string", b"")) if scope["type"] == "http" else None
+        if pool is None:
+            await self.app(scope, receive, send)
+            return
+        gate = self._gates[pool.name]
+        reason = await gate.acquire()
+        if reason is not None:
+            ADMISSION_REJECTED.inc(pool.name, reason)
+            response = JSONResponse(
+                {"detail": "We're receiving a lot of requests, please try again shortly"},
+                status_code=503,
+                headers={"Retry-After": str(pool.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        ADMISSION_ACTIVE.inc(pool.name)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            ADMISSION_ACTIVE.dec(pool.name)
+            gate.release()
+
+
+class QueryTooExpensive(Exception):
+    def __init__(self, detail: str, status_code: int = 400, retry_after: Optional[int] = None):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+async def query_cost_response(request: Request, exc: QueryTooExpensive) -> JSONResponse:
+    headers = {"Retry-After": str(exc.retry_after)} if exc.retry_after is not None else None
+    return JSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=headers)
+
+
+def _scans(filter: Any) -> bool:
+    """True if the filter has an operator no index can serve."""
+    if isinstance(filter, dict):
+        return any(key in ("$regex", "$where", "$expr") or _scans(value) for key, value in filter.items())
+    if isinstance(filter, (list, tuple)):
+        return any(_scans(item) for item in filter)
+    return False
+
+
+def estimate_docs_examined(filter: Dict[str, Any], collection_size: int) -> Optional[int]:
+    """Documents an unindexed filter examines, or ``None`` if an index serves it."""
+    return collection_size if _scans(filter) else None
+
+
+class CostGuard:
+    """Rejects filters that cannot use an index on collections above a size limit.
+
+    Indexed filters and sorts (see ``INDEX_SPEC``) are let through. Only a
+    filter no index can serve examines the whole collection, and only then is
+    the collection size compared to the limit. Independently, ``skip + limit``
+    is counted against the limit, since Mongo walks every skipped entry.
+    """
+
+    def __init__(self, max_docs_examined: int = 10000, size_ttl: float = 60.0):
+        self.max_docs_examined = max_docs_examined
+        self.size_ttl = size_ttl
+        self._sizes: Dict[str, Tuple[float, int]] = {}
+
+    async def collection_size(self, collection) -> int:
+        now = time.monotonic()
+        entry = self._sizes.get(collection.name)
+        if entry is None or entry[0] <= now:
+            entry = self._sizes[collection.name] = (now + self.size_ttl, await collection.estimated_document_count())
+        return entry[1]
+
+    def check_depth(self, pool: str, skip: int, limit: int) -> None:
+        """Raise :class:`QueryTooExpensive` if an offset page would walk too many documents."""
+        if skip + limit > self.max_docs_examined:
+            ADMISSION_REJECTED.inc(pool, "page_depth")
+            raise QueryTooExpensive(
+                f"Page is too deep: it would examine {skip + limit} documents, over the limit of "
+                f"{self.max_docs_examined}. Use nextCursor to page further",
+            )
+
+    async def check(self, pool: str, collection, filter: Dict[str, Any], skip: int = 0, limit: int = 0) -> None:
+        """Raise :class:`QueryTooExpensive` if the query would examine too many documents."""
+        self.check_depth(pool, skip, limit)
+        if not _scans(filter):
+            return
+        size = await self.collection_size(collection)
+        examined = estimate_docs_examined(filter, size)
+        if examined is not None and examined > self.max_docs_examined:
+            ADMISSION_REJECTED.inc(pool, "collection_scan")
+            raise QueryTooExpensive(
+                f"Search is temporarily unavailable: it would scan {examined} documents, over the limit of "
+                f"{self.max_docs_examined}. Please try again shortly",
+                status_code=503,
+                retry_after=5,
+            )
@@ -0,0 +1,315 @@
+"""Result and response caches for catalog reads."""
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from starlette.datastructures import Headers
+
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_ID = "catalog"
+
+
+class SignatureCache:
+    """Caches computed query results per filter signature for ``ttl`` seconds.
+
+    Registered as a catalog engine listener so any catalog change drops every
+    cached entry. With ``flights``, concurrent misses for the same key share one
+    computation instead of each running it.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 4096, flights: Optional[SingleFlight] = None, name: str = ""):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.flights = flights
+        self.name = name
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+
+    async def get(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        value = await (self.flights.do(self.name, key, compute) if self.flights is not None else compute())
+        if len(self._entries) >= self.max_entries:
+            self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+        self._entries[key] = (now + self.ttl, value)
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def apply(self, upserted: Iterable[Dict[str, Any]], removed: Iterable[str]) -> None:
+        self.clear()
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    media_type: str
+    # The route's own headers (e.g. Vary), replayed on every hit
+    headers: Tuple[Tuple[str, str], ...] = ()
+
+
+class LRUTier:
+    """In-process LRU tier with a per-entry TTL."""
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, CachedResponse]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: CachedResponse) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class MemorySharedTier(LRUTier):
+    """Local stand-in for a shared tier, for development and tests."""
+
+
+class MongoSharedTier:
+    """Shared tier stored in a Mongo collection, visible to every worker.
+
+    Expired entries are ignored on read and reaped by a TTL index on
+    ``expiresAt``.
+    """
+
+    def __init__(self, collection, ttl: float = 300.0):
+        self.collection = collection
+        self.ttl = ttl
+
+    async def ensure_index(self) -> None:
+        await self.collection.create_index("expiresAt", expireAfterSeconds=0)
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        doc = await self.collection.find_one({"_id": key})
+        # BSON dates are UTC; clients without tz_aware return them naive.
+        if doc is None or doc["expiresAt"].replace(tzinfo=timezone.utc) <= datetime.now(timezone.utc):
+            return None
+        return CachedResponse(
+            body=bytes(doc["body"]),
+            etag=doc["etag"],
+            media_type=doc["mediaType"],
+            headers=tuple((name, value) for name, value in doc.get("headers", [])),
+        )
+
+    async def set(self, key: str, value: CachedResponse) -> None:
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+        await self.collection.replace_one(
+            {"_id": key},
+            {
+                "body": value.body,
+                "etag": value.etag,
+                "mediaType": value.media_type,
+                "headers": [list(header) for header in value.headers],
+                "expiresAt": expires_at,
+            },
+            upsert=True,
+        )
+
+
+class ResponseCache:
+    """Two-tier cache of encoded responses: local LRU first, then the shared tier."""
+
+    def __init__(self, local: LRUTier, shared=None):
+        self.local = local
+        self.shared = shared
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        value = await self.local.get(key)
+        if value is None and self.shared is not None:
+            try:
+                value = await self.shared.get(key)
+            except PyMongoError as exc:
+                logger.warning("Shared response cache read failed: %s", exc)
+                return None
+            if value is not None:
+                await self.local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: CachedResponse) -> None:
+        await self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, value)
+            except PyMongoError as exc:
+                logger.warning("Shared response cache write failed: %s", exc)
+
+    def invalidate(self) -> None:
+        """Drop the local tier; shared entries are orphaned by the version bump."""
+        self.local.clear()
+
+    def apply(self, upserted: Iterable[Dict[str, Any]], removed: Iterable[str]) -> None:
+        self.invalidate()
+
+
+# Not replayed from a cached response: hop-by-hop headers, headers the cache
+# sets itself, and cookies, which must never be shared between clients.
+UNCACHED_HEADERS = frozenset({
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailer",
+    "transfer-encoding", "upgrade", "content-length", "content-type", "etag", "cache-control", "set-cookie",
+})
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def normalize_query(query_string: bytes) -> str:
+    pairs = parse_qsl(query_string.decode("latin-1"), keep_blank_values=False)
+    # Sort by name only: repeated parameters keep their order, which can matter.
+    return urlencode(sorted(pairs, key=lambda pair: pair[0]))
+
+
+class CatalogVersion:
+    """Catalog version counter shared through the ``catalog_meta`` collection.
+
+    Seeding and admin writes call :func:`bump_catalog_version`; every worker
+    polls the counter and embeds it in response cache keys. A worker only
+    publishes a new version once its in-memory state has been reloaded, so a
+    body cached under a version always reflects that version's data.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.value = 0
+
+    async def _fetch(self) -> int:
+        doc = await self.collection.find_one({"_id": CATALOG_VERSION_ID})
+        return doc.get("version", 0) if doc else 0
+
+    async def refresh(self) -> bool:
+        value = await self._fetch()
+        changed = value != self.value
+        self.value = value
+        return changed
+
+    async def follow(self, reload: Callable[[], Awaitable[None]]) -> bool:
+        """If the version moved, run ``reload`` and only then publish the new version."""
+        value = await self._fetch()
+        if value == self.value:
+            return False
+        await reload()
+        self.value = value
+        return True
+
+
+async def bump_catalog_version(db) -> int:
+    doc = await db.catalog_meta.find_one_and_update(
+        {"_id": CATALOG_VERSION_ID},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return doc["version"]
+
+
+class ResponseCacheMiddleware:
+    """Serves cached GET responses for the configured routes with ETag/304.
+
+    Keys combine the catalog version, the path and the sorted query
+    parameters, so a version bump invalidates every tier at once.
+    """
+
+    def __init__(self, app, cache: ResponseCache, version: CatalogVersion, routes: Sequence[str]):
+        self.app = app
+        self.cache = cache
+        self.version = version
+        self.routes = [re.compile(route) for route in routes]
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not any(route.fullmatch(scope["path"]) for route in self.routes)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        key = f"{self.version.value}:{scope['path']}?{normalize_query(scope.get('query_string', b''))}"
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        cached = await self.cache.get(key)
+        if cached is not None:
+            await self._send_cached(send, cached, if_none_match)
+            return
+
+        start: Dict[str, Any] = {}
+        chunks: List[bytes] = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        body = b"".join(chunks)
+        if start.get("status") != 200:
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+            return
+        headers = Headers(raw=start["headers"])
+        cached = CachedResponse(
+            body=body,
+            etag=make_etag(body),
+            media_type=headers.get("content-type", "application/json"),
+            headers=tuple(
+                (name, value) for name, value in headers.items() if name.lower() not in UNCACHED_HEADERS
+            ),
+        )
+        await self.cache.set(key, cached)
+        await self._send_cached(send, cached, if_none_match)
+
+    @staticmethod
+    async def _send_cached(send, cached: CachedResponse, if_none_match: Optional[str]) -> None:
+        headers = [
+            (b"etag", cached.etag.encode()),
+            (b"cache-control", b"no-cache"),
+            *((name.encode("latin-1"), value.encode("latin-1")) for name, value in cached.headers),
+        ]
+        if if_none_match and etag_matches(if_none_match, cached.etag):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        headers += [
+            (b"content-type", cached.media_type.encode()),
+            (b"content-length", str(len(cached.body)).encode()),
+        ]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": cached.body})
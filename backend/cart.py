@@ -0,0 +1,77 @@
+"""Cart batch mutations as a single ordered bulk write.
+
+Cart lines are unique per (userId, productId, size); see indexes.INDEX_SPEC.
+Adds and product-keyed sets upsert on that key, so a batch never has to read
+the cart first.
+"""
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from models import CartOperation
+
+DUPLICATE_KEY = 11000
+
+
+def cart_line_upsert(userId: str, productId: str, size: Optional[str], update: Dict[str, Any]) -> UpdateOne:
+    return UpdateOne(
+        {"userId": userId, "productId": productId, "size": size},
+        {**update, "$setOnInsert": {"id": str(uuid.uuid4())}},
+        upsert=True
+    )
+
+
+def cart_line_filter(userId: str, op: CartOperation) -> Dict[str, Any]:
+    if op.itemId:
+        return {"userId": userId, "id": op.itemId}
+    return {"userId": userId, "productId": op.productId, "size": op.size}
+
+
+def batch_writes(userId: str, operations: Sequence[CartOperation]) -> List[Union[UpdateOne, DeleteOne]]:
+    """Translate batch operations into bulk writes, raising ``ValueError`` for invalid ones."""
+    writes: List[Union[UpdateOne, DeleteOne]] = []
+    for op in operations:
+        if not op.itemId and not op.productId:
+            raise ValueError("Each operation needs a productId or itemId")
+        if op.op == "add":
+            if not op.productId:
+                raise ValueError("add operations need a productId")
+            writes.append(cart_line_upsert(userId, op.productId, op.size, {"$inc": {"quantity": op.quantity}}))
+        elif op.op == "remove" or op.quantity <= 0:
+            writes.append(DeleteOne(cart_line_filter(userId, op)))
+        elif op.itemId:
+            writes.append(UpdateOne(cart_line_filter(userId, op), {"$set": {"quantity": op.quantity}}))
+        else:
+            writes.append(cart_line_upsert(userId, op.productId, op.size, {"$set": {"quantity": op.quantity}}))
+    return writes
+
+
+class CartConflict(Exception):
+    """A batch kept colliding with concurrent writes; ``applied`` operations were written."""
+
+    def __init__(self, applied: int):
+        super().__init__(f"{applied} operations applied")
+        self.applied = applied
+
+
+async def apply_batch(collection, writes: Sequence[Union[UpdateOne, DeleteOne]], session=None, max_attempts: int = 3) -> None:
+    """Run ``writes`` in order, each exactly once.
+
+    Two requests upserting the same new line race on the unique index and one
+    gets a duplicate-key error. An ordered bulk write stops there with the
+    earlier operations already applied, so only the rest is retried; by then
+    the line exists and the upsert updates it.
+    """
+    applied = 0
+    for _ in range(max_attempts):
+        try:
+            await collection.bulk_write(list(writes[applied:]), ordered=True, session=session)
+            return
+        except BulkWriteError as exc:
+            errors = exc.details.get("writeErrors", [])
+            if not errors or errors[0].get("code") != DUPLICATE_KEY:
+                raise
+            applied += errors[0]["index"]
+    raise CartConflict(applied)
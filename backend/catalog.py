@@ -0,0 +1,347 @@
+"""In-process columnar catalog engine.
+
+The whole ``products`` collection is small enough to live in memory on every
+worker, so listing queries are answered from column arrays instead of a
+``find`` + ``count_documents`` round trip per request. A snapshot is immutable
+once built; reloads build a new one and swap the reference, so readers never
+see a half-loaded catalog.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, fields
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pymongo.errors import OperationFailure, PyMongoError
+
+from pagination import SORT_KEYS, Cursor
+
+logger = logging.getLogger(__name__)
+
+# The id tiebreak gives every sort a total order, which keyset cursors rely on.
+SORT_OPTIONS = {
+    "featured": [("rating", -1), ("id", 1)],
+    "newest": [("id", -1)],
+    "price_low": [("price", 1), ("id", 1)],
+    "price_high": [("price", -1), ("id", 1)],
+}
+
+CODED_FIELDS = ("category", "metal", "purity", "metalColor", "gender")
+
+
+@dataclass(frozen=True)
+class ProductFilters:
+    """Filter parameters shared by every product listing path."""
+    category: Optional[str] = None
+    metal: Optional[str] = None
+    purity: Optional[str] = None
+    metalColor: Optional[str] = None
+    occasion: Optional[str] = None
+    gender: Optional[str] = None
+    minPrice: Optional[float] = None
+    maxPrice: Optional[float] = None
+    availability: Optional[str] = None
+
+    def to_mongo(self) -> Dict[str, Any]:
+        query: Dict[str, Any] = {}
+        for field in CODED_FIELDS:
+            value = getattr(self, field)
+            if value:
+                query[field] = value
+        if self.occasion:
+            query["occasion"] = {"$in": [self.occasion]}
+        if self.minPrice is not None or self.maxPrice is not None:
+            query["price"] = {}
+            if self.minPrice is not None:
+                query["price"]["$gte"] = self.minPrice
+            if self.maxPrice is not None:
+                query["price"]["$lte"] = self.maxPrice
+        if self.availability == "ship":
+            query["availability.ship"] = True
+        elif self.availability == "storePickup":
+            query["availability.storePickup"] = True
+        return query
+
+    def signature(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, f.name) for f in fields(self))
+
+
+def _encode(values: Sequence[Optional[str]]) -> Tuple[np.ndarray, Dict[str, int]]:
+    vocab: Dict[str, int] = {}
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        if value is None:
+            codes[i] = -1
+        else:
+            codes[i] = vocab.setdefault(value, len(vocab))
+    return codes, vocab
+
+
+def _bitset(values: Sequence[Sequence[str]]) -> Tuple[np.ndarray, Dict[str, int]]:
+    vocab: Dict[str, int] = {}
+    for items in values:
+        for item in items:
+            vocab.setdefault(item, len(vocab))
+    words = max(1, (len(vocab) + 63) // 64)
+    bits = np.zeros((len(values), words), dtype=np.uint64)
+    for i, items in enumerate(values):
+        for item in items:
+            code = vocab[item]
+            bits[i, code // 64] |= np.uint64(1 << (code % 64))
+    return bits, vocab
+
+
+class CatalogSnapshot:
+    """Immutable column arrays built from one read of the products collection."""
+
+    def __init__(self, docs: List[Dict[str, Any]]):
+        self.docs = docs
+        self.size = len(docs)
+        self.ids = [doc.get("id") for doc in docs]
+        self.position = {product_id: i for i, product_id in enumerate(self.ids)}
+
+        self.price = np.array(
+            [doc.get("price") if doc.get("price") is not None else np.nan for doc in docs],
+            dtype=np.float64,
+        )
+        self.rating = np.array(
+            [doc.get("rating") if doc.get("rating") is not None else np.nan for doc in docs],
+            dtype=np.float64,
+        )
+        self.codes: Dict[str, np.ndarray] = {}
+        self.vocab: Dict[str, Dict[str, int]] = {}
+        for field in CODED_FIELDS:
+            self.codes[field], self.vocab[field] = _encode([doc.get(field) for doc in docs])
+        self.occasion_bits, self.occasion_vocab = _bitset([doc.get("occasion") or [] for doc in docs])
+        self.tag_bits, self.tag_vocab = _bitset([doc.get("tags") or [] for doc in docs])
+        availability = [doc.get("availability") or {} for doc in docs]
+        self.ship = np.array([bool(a.get("ship")) for a in availability], dtype=bool)
+        self.store_pickup = np.array([bool(a.get("storePickup")) for a in availability], dtype=bool)
+
+        # Each sort is a precomputed permutation with the product id as a stable
+        # tiebreak, so a query only has to mask it.
+        by_id = sorted(range(self.size), key=lambda i: self.ids[i] or "")
+        self.orders = {
+            "featured": self._order(-np.nan_to_num(self.rating, nan=-np.inf), by_id),
+            "newest": np.array(by_id[::-1], dtype=np.int64),
+            "price_low": self._order(np.nan_to_num(self.price, nan=-np.inf), by_id),
+            "price_high": self._order(-np.nan_to_num(self.price, nan=-np.inf), by_id),
+        }
+        # Inverse permutations: a product's position within each sort.
+        self.ranks = {}
+        for sort, order in self.orders.items():
+            rank = np.empty(self.size, dtype=np.int64)
+            rank[order] = np.arange(self.size)
+            self.ranks[sort] = rank
+
+    @staticmethod
+    def _order(key: np.ndarray, by_id: List[int]) -> np.ndarray:
+        ranked = np.array(by_id, dtype=np.int64)
+        return ranked[np.argsort(key[ranked], kind="stable")]
+
+    def contains(self, field: str, value: str) -> np.ndarray:
+        """Mask of products whose ``occasion`` or ``tags`` list includes ``value``."""
+        if field == "occasion":
+            bits, vocab = self.occasion_bits, self.occasion_vocab
+        else:
+            bits, vocab = self.tag_bits, self.tag_vocab
+        code = vocab.get(value)
+        if code is None:
+            return np.zeros(self.size, dtype=bool)
+        return (bits[:, code // 64] & np.uint64(1 << (code % 64))) != 0
+
+    def mask(self, filters: ProductFilters) -> np.ndarray:
+        mask = np.ones(self.size, dtype=bool)
+        for field in CODED_FIELDS:
+            value = getattr(filters, field)
+            if value:
+                code = self.vocab[field].get(value, -2)
+                mask &= self.codes[field] == code
+        if filters.occasion:
+            mask &= self.contains("occasion", filters.occasion)
+        if filters.minPrice is not None:
+            mask &= self.price >= filters.minPrice
+        if filters.maxPrice is not None:
+            mask &= self.price <= filters.maxPrice
+        if filters.availability == "ship":
+            mask &= self.ship
+        elif filters.availability == "storePickup":
+            mask &= self.store_pickup
+        return mask
+
+    def _at_or_before(self, i: int, after: Cursor) -> bool:
+        field, direction = SORT_KEYS[after.sort]
+        doc_id = self.ids[i]
+        if field == "id":
+            return doc_id >= after.id
+        value = (self.rating if field == "rating" else self.price)[i]
+        if value == after.value:
+            return doc_id <= after.id
+        return value > after.value if direction < 0 else value < after.value
+
+    def _seek(self, hits: np.ndarray, after: Cursor) -> int:
+        lo, hi = 0, hits.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._at_or_before(int(hits[mid]), after):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def query(
+        self,
+        filters: ProductFilters,
+        sort: Optional[str],
+        skip: int,
+        limit: int,
+        ranked: Optional[Sequence[Tuple[str, float]]] = None,
+        after: Optional[Cursor] = None,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Filter, sort and page the catalog.
+
+        ``ranked`` restricts the result to search hits; with the default
+        ``featured`` sort they keep their relevance order. A keyset ``after``
+        cursor replaces ``skip`` with a binary search over the sorted hits.
+        """
+        mask = self.mask(filters)
+        sort = sort if sort in self.orders else "featured"
+        if ranked is None:
+            order = self.orders[sort]
+            hits = order[mask[order]]
+        else:
+            positions = np.array(
+                [self.position[doc_id] for doc_id, _ in ranked if doc_id in self.position],
+                dtype=np.int64,
+            )
+            hits = positions[mask[positions]]
+            if sort != "featured":
+                hits = hits[np.argsort(self.ranks[sort][hits], kind="stable")]
+        relevance = ranked is not None and sort == "featured"
+        if after is not None and after.id is not None and not relevance:
+            skip = self._seek(hits, after)
+        return [self.docs[i] for i in hits[skip:skip + limit]], int(hits.size)
+
+
+class CatalogEngine:
+    """Keeps a warm :class:`CatalogSnapshot` in sync with the products collection.
+
+    Change streams are used when the deployment supports them; standalone
+    servers fall back to reloading on a fixed interval.
+
+    Listeners get ``apply(upserted, removed)`` on the event loop. A listener
+    whose update is expensive can also define ``prepare(upserted, removed)``:
+    it runs in a worker thread, must not change what readers see, and returns
+    a callable that swaps the result in on the loop.
+    """
+
+    def __init__(self, refresh_interval: float = 60.0, listeners: Sequence[Any] = ()):
+        self.refresh_interval = refresh_interval
+        self.listeners = list(listeners)
+        self._snapshot: Optional[CatalogSnapshot] = None
+        # Prepared listener state is diffed against the served state, so
+        # reloads must not overlap.
+        self._reload_lock = asyncio.Lock()
+
+    @property
+    def warm(self) -> bool:
+        return self._snapshot is not None
+
+    @property
+    def snapshot(self) -> Optional[CatalogSnapshot]:
+        return self._snapshot
+
+    async def reload(self, collection) -> CatalogSnapshot:
+        async with self._reload_lock:
+            docs = await collection.find({}, {"_id": 0}).to_list(None)
+            # Building the snapshot and the listeners' indexes can take seconds
+            # on a large catalog; keep it off the loop so probes stay served.
+            snapshot, upserted, removed, prepared = await asyncio.to_thread(self._prepare, docs)
+            # Listeners see each change once, in the same tick as the swap.
+            if upserted or removed:
+                for listener, commit in zip(self.listeners, prepared):
+                    if commit is not None:
+                        commit()
+                    else:
+                        listener.apply(upserted, removed)
+            self._snapshot = snapshot
+        logger.info("Catalog engine loaded %d products", snapshot.size)
+        return snapshot
+
+    def _prepare(self, docs: List[Dict[str, Any]]):
+        snapshot = CatalogSnapshot(docs)
+        previous = self._snapshot
+        if previous is None:
+            upserted, removed = docs, []
+        else:
+            upserted = [
+                doc for doc in docs
+                if doc.get("id") not in previous.position
+                or previous.docs[previous.position[doc.get("id")]] != doc
+            ]
+            removed = [doc_id for doc_id in previous.ids if doc_id not in snapshot.position]
+        prepared: List[Optional[Callable[[], None]]] = [
+            listener.prepare(upserted, removed) if hasattr(listener, "prepare") and (upserted or removed) else None
+            for listener in self.listeners
+        ]
+        return snapshot, upserted, removed, prepared
+
+    def query(
+        self,
+        filters: ProductFilters,
+        sort: Optional[str],
+        skip: int,
+        limit: int,
+        ranked: Optional[Sequence[Tuple[str, float]]] = None,
+        after: Optional[Cursor] = None,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        return self._snapshot.query(filters, sort, skip, limit, ranked, after)
+
+    async def run(self, collection) -> None:
+        """Warm the engine, then keep it current until cancelled."""
+        while not self.warm:
+            try:
+                await self.reload(collection)
+            except PyMongoError as exc:
+                logger.warning("Catalog engine warm-up failed: %s", exc)
+                await asyncio.sleep(self.refresh_interval)
+        while True:
+            try:
+                await self._watch(collection)
+            except OperationFailure as exc:
+                logger.info("Change streams unavailable (%s); polling every %ss", exc, self.refresh_interval)
+                await self._poll(collection)
+            except PyMongoError as exc:
+                logger.warning("Catalog change stream interrupted: %s", exc)
+                await asyncio.sleep(self.refresh_interval)
+                try:
+                    await self.reload(collection)
+                except PyMongoError as exc:
+                    logger.warning("Catalog engine reload failed: %s", exc)
+
+    async def _watch(self, collection) -> None:
+        """Reload after each burst of changes until the stream closes.
+
+        A drop or rename of the collection (e.g. a blue/green catalog swap)
+        invalidates the stream; it is then dead and ``run`` reloads and opens
+        a new one.
+        """
+        dirty = False
+        async with collection.watch(max_await_time_ms=500) as stream:
+            while stream.alive:
+                change = await stream.try_next()
+                if change is not None:
+                    dirty = True
+                elif dirty:
+                    await self.reload(collection)
+                    dirty = False
+        if dirty:
+            await self.reload(collection)
+
+    async def _poll(self, collection) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.reload(collection)
+            except PyMongoError as exc:
+                logger.warning("Catalog engine reload failed: %s", exc)
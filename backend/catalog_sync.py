@@ -0,0 +1,237 @@
+"""Streaming, incremental catalog sync.
+
+Reads a JSON array or NDJSON catalog item by item, validates each item, and
+applies only the differences against the live ``products`` collection:
+products whose content hash changed are upserted and products missing from
+the feed are deleted, in batched ``bulk_write`` calls. A blue/green mode loads
+a fresh collection instead and swaps it in with one rename, so the live
+catalog is never empty.
+"""
+import gzip
+import hashlib
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, IO, Iterator, List, Set
+
+from pymongo import DeleteOne, ReplaceOne
+
+from cache import bump_catalog_version
+from indexes import INDEX_SPEC, reconcile_indexes
+
+Validator = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+CHUNK_SIZE = 1 << 16
+
+
+def open_source(path: Path) -> IO[str]:
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_items(fp: IO[str], chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """Yield items from a JSON array or NDJSON stream without loading it whole."""
+    buf = fp.read(chunk_size)
+    stripped = buf.lstrip()
+    while not stripped and buf:
+        buf = fp.read(chunk_size)
+        stripped = buf.lstrip()
+    if not stripped.startswith("["):
+        lines = buf
+        while True:
+            *complete, lines = lines.split("\n")
+            for line in complete:
+                if line.strip():
+                    yield json.loads(line)
+            more = fp.read(chunk_size)
+            if not more:
+                break
+            lines += more
+        if lines.strip():
+            yield json.loads(lines)
+        return
+
+    decoder = json.JSONDecoder()
+    buf = stripped[1:]
+    pos = 0
+    eof = False
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+            # A value running into the end of the buffer may be truncated.
+            if end >= len(buf.rstrip()) and not eof:
+                raise json.JSONDecodeError("incomplete", buf, end)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more = fp.read(chunk_size)
+            eof = not more
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+        yield item
+        pos = end
+        if pos > chunk_size:
+            buf, pos = buf[pos:], 0
+
+
+def content_hash(doc: Dict[str, Any]) -> str:
+    canonical = json.dumps(doc, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+@dataclass
+class SyncReport:
+    read: int = 0
+    invalid: int = 0
+    unchanged: int = 0
+    upserted: int = 0
+    deleted: int = 0
+    elapsed: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def rate(self) -> float:
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.upserted or self.deleted)
+
+
+class _Batcher:
+    def __init__(self, collection, batch_size: int):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.pending: List[Any] = []
+
+    async def add(self, op) -> None:
+        self.pending.append(op)
+        if len(self.pending) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if self.pending:
+            await self.collection.bulk_write(self.pending, ordered=False)
+            self.pending = []
+
+
+async def _existing_hashes(collection, validate: Validator) -> Dict[str, str]:
+    hashes: Dict[str, str] = {}
+    async for doc in collection.find({}, {"_id": 0}):
+        try:
+            hashes[doc["id"]] = content_hash(validate(doc))
+        except (KeyError, ValueError):
+            # Unparseable rows never match, so the feed overwrites them.
+            if "id" in doc:
+                hashes[doc["id"]] = ""
+    return hashes
+
+
+def _validated(items: Iterator[Any], validate: Validator, report: SyncReport, skipped: Set[str]) -> Iterator[Dict[str, Any]]:
+    for item in items:
+        report.read += 1
+        try:
+            yield validate(item)
+        except ValueError as exc:
+            report.invalid += 1
+            if isinstance(item, dict) and isinstance(item.get("id"), str):
+                skipped.add(item["id"])
+            if len(report.errors) < 20:
+                label = item.get("id") if isinstance(item, dict) else None
+                report.errors.append(f"item {report.read} ({label or 'no id'}): {exc}")
+
+
+async def sync_catalog(
+    db,
+    source: Path,
+    validate: Validator,
+    batch_size: int = 1000,
+    delete_missing: bool = True,
+) -> SyncReport:
+    """Apply only changed products from ``source`` to the live collection."""
+    started = time.perf_counter()
+    report = SyncReport()
+    collection = db.products
+    hashes = await _existing_hashes(collection, validate)
+    seen: Set[str] = set()
+    skipped: Set[str] = set()
+    batcher = _Batcher(collection, batch_size)
+
+    with open_source(source) as fp:
+        for doc in _validated(iter_items(fp), validate, report, skipped):
+            seen.add(doc["id"])
+            digest = content_hash(doc)
+            if hashes.get(doc["id"]) == digest:
+                report.unchanged += 1
+                continue
+            hashes[doc["id"]] = digest
+            # updatedAt is the checkpoint field for incremental exports; it is
+            # not part of the model, so it never affects the content hash.
+            doc["updatedAt"] = datetime.now(timezone.utc)
+            await batcher.add(ReplaceOne({"id": doc["id"]}, doc, upsert=True))
+            report.upserted += 1
+
+    if delete_missing:
+        for product_id in hashes.keys() - seen - skipped:
+            await batcher.add(DeleteOne({"id": product_id}))
+            report.deleted += 1
+    await batcher.flush()
+
+    if report.changed:
+        await bump_catalog_version(db)
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+async def promote_staging(client, db, staging_name: str) -> None:
+    """Index a staging collection like ``products`` and rename it over ``products`` in one step."""
+    index_report = await reconcile_indexes(db, {staging_name: INDEX_SPEC["products"]})
+    if index_report.failed:
+        raise RuntimeError(f"Could not index staging collection: {index_report.failed}")
+    await client.admin.command(
+        "renameCollection", f"{db.name}.{staging_name}", to=f"{db.name}.products", dropTarget=True
+    )
+
+
+async def swap_catalog(
+    client,
+    db,
+    source: Path,
+    validate: Validator,
+    batch_size: int = 1000,
+) -> SyncReport:
+    """Blue/green full reload: load a fresh collection, index it, rename it over ``products``."""
+    started = time.perf_counter()
+    report = SyncReport()
+    staging_name = f"products_staging_{int(time.time())}"
+    staging = db[staging_name]
+    batch: List[Dict[str, Any]] = []
+
+    try:
+        with open_source(source) as fp:
+            for doc in _validated(iter_items(fp), validate, report, set()):
+                doc["updatedAt"] = datetime.now(timezone.utc)
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    await staging.insert_many(batch, ordered=False)
+                    report.upserted += len(batch)
+                    batch = []
+        if batch:
+            await staging.insert_many(batch, ordered=False)
+            report.upserted += len(batch)
+        await promote_staging(client, db, staging_name)
+    except BaseException:
+        await staging.drop()
+        raise
+
+    await bump_catalog_version(db)
+    report.elapsed = time.perf_counter() - started
+    return report
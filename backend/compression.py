@@ -0,0 +1,126 @@
+"""Response compression negotiated by Accept-Encoding.
+
+Complete (non-streamed) responses of a compressible type are compressed with
+brotli when the client accepts it and the ``brotli`` package is installed,
+otherwise with gzip. Bodies below ``minimum_size`` are sent as-is, since the
+framing overhead outweighs the savings. Streamed responses and responses that
+already carry a Content-Encoding pass through untouched. A strong ETag becomes
+weak, because the representation bytes depend on the encoding.
+"""
+import gzip
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/x-ndjson")
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def choose_encoding(header: str) -> Optional[str]:
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    for encoding in (("br",) if brotli is not None else ()) + ("gzip",):
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[dict] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            if message.get("more_body", False) or not self._eligible(start["headers"], len(body)):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+            compressed = compress(body, encoding, self.gzip_level, self.brotli_quality)
+            await send({**start, "headers": self._headers(start["headers"], encoding, len(compressed))})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _eligible(self, headers: List[Tuple[bytes, bytes]], size: int) -> bool:
+        if size < self.minimum_size:
+            return False
+        content_type = b""
+        for name, value in headers:
+            name = name.lower()
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value
+        return content_type.decode("latin-1").startswith(COMPRESSIBLE_TYPES)
+
+    @staticmethod
+    def _headers(headers: List[Tuple[bytes, bytes]], encoding: str, size: int) -> List[Tuple[bytes, bytes]]:
+        result = []
+        vary = None
+        for name, value in headers:
+            lower = name.lower()
+            if lower == b"content-length":
+                continue
+            if lower == b"etag" and not value.startswith(b"W/"):
+                value = b"W/" + value
+            if lower == b"vary":
+                vary = value
+                if b"accept-encoding" not in value.lower():
+                    value = value + b", Accept-Encoding"
+            result.append((name, value))
+        if vary is None:
+            result.append((b"vary", b"Accept-Encoding"))
+        result.append((b"content-encoding", encoding.encode()))
+        result.append((b"content-length", str(size).encode()))
+        return result
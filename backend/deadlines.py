@@ -0,0 +1,52 @@
+"""Per-request time budget for Mongo commands.
+
+Each request runs inside ``pymongo.timeout``, so every command it issues
+carries a ``maxTimeMS`` of whatever budget remains, and nothing waits for a
+pooled connection or server selection past the deadline. Motor copies the
+context into its executor threads, so the budget follows the request. Routes
+can have their own budget, e.g. a tight one for search-as-you-type, and a
+budget of 0 exempts routes that stream for a long time (exports). A request
+that runs out of budget gets a 503 with ``Retry-After`` rather than a 500.
+"""
+import re
+from typing import Dict, List, Optional, Pattern, Tuple
+
+import pymongo
+from pymongo.errors import ExecutionTimeout, NetworkTimeout, ServerSelectionTimeoutError, WaitQueueTimeoutError
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+# Raised by pymongo when an operation outlives its time budget
+TIMEOUT_ERRORS = (ExecutionTimeout, NetworkTimeout, ServerSelectionTimeoutError, WaitQueueTimeoutError)
+
+
+async def timeout_response(request: Request, exc: Exception) -> JSONResponse:
+    return JSONResponse(
+        {"detail": "The request took too long, please try again"},
+        status_code=503,
+        headers={"Retry-After": "1"},
+    )
+
+
+class RequestDeadlineMiddleware:
+    def __init__(self, app, default_ms: int, budgets: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.default = default_ms / 1000 if default_ms > 0 else None
+        # Full-match path pattern -> budget in milliseconds; first match wins
+        self.budgets: List[Tuple[Pattern[str], Optional[float]]] = [
+            (re.compile(pattern), ms / 1000 if ms > 0 else None) for pattern, ms in (budgets or {}).items()
+        ]
+
+    def budget(self, path: str) -> Optional[float]:
+        for pattern, seconds in self.budgets:
+            if pattern.fullmatch(path):
+                return seconds
+        return self.default
+
+    async def __call__(self, scope, receive, send):
+        budget = self.budget(scope["path"]) if scope["type"] == "http" else None
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+        with pymongo.timeout(budget):
+            await self.app(scope, receive, send)
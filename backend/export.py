@@ -0,0 +1,112 @@
+"""Streaming catalog export for marketplace feeds.
+
+Products are streamed straight from a Mongo cursor as NDJSON or CSV, one
+cursor batch per chunk, so memory stays flat regardless of catalog size.
+Output can be gzip-compressed on the fly. Incremental exports pass the
+checkpoint returned by the previous export as ``since`` and only receive
+products whose ``updatedAt`` is at or after it.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def export_filter(since: Optional[datetime]) -> Dict[str, Any]:
+    return {"updatedAt": {"$gte": since}} if since is not None else {}
+
+
+def export_sort(since: Optional[datetime]) -> List[Tuple[str, int]]:
+    # Both orders are served by an index (see indexes.INDEX_SPEC).
+    return [("updatedAt", 1), ("id", 1)] if since is not None else [("id", 1)]
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.isoformat()
+    return str(value)
+
+
+def _cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return _default(value)
+    if isinstance(value, list) and all(isinstance(v, (str, int, float)) for v in value):
+        return "|".join(str(v) for v in value)
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, separators=(",", ":"), default=_default)
+    return value
+
+
+class _NDJSONEncoder:
+    def header(self) -> str:
+        return ""
+
+    def encode(self, docs: Iterable[Dict[str, Any]]) -> str:
+        return "".join(json.dumps(doc, separators=(",", ":"), default=_default) + "\n" for doc in docs)
+
+
+class _CSVEncoder:
+    def __init__(self, fields: List[str]):
+        self.fields = fields
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+
+    def _drain(self) -> str:
+        text = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return text
+
+    def header(self) -> str:
+        self._writer.writerow(self.fields)
+        return self._drain()
+
+    def encode(self, docs: Iterable[Dict[str, Any]]) -> str:
+        self._writer.writerows([_cell(doc.get(field)) for field in self.fields] for doc in docs)
+        return self._drain()
+
+
+async def stream_export(
+    collection,
+    fields: List[str],
+    fmt: str = "ndjson",
+    since: Optional[datetime] = None,
+    batch_size: int = 500,
+    compress: bool = False,
+) -> AsyncIterator[bytes]:
+    """Yield encoded (and optionally gzipped) chunks, one per cursor batch."""
+    encoder = _CSVEncoder(fields) if fmt == "csv" else _NDJSONEncoder()
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    projection = {"_id": 0, **{field: 1 for field in fields}}
+    cursor = collection.find(export_filter(since), projection).sort(export_sort(since)).batch_size(batch_size)
+
+    def emit(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return gzip.compress(data) if gzip is not None else data
+
+    head = emit(encoder.header())
+    if head:
+        yield head
+    batch: List[Dict[str, Any]] = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            chunk = emit(encoder.encode(batch))
+            batch = []
+            if chunk:
+                yield chunk
+    if batch:
+        yield emit(encoder.encode(batch))
+    if gzip is not None:
+        yield gzip.flush()
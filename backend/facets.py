@@ -0,0 +1,124 @@
+"""Faceted counts for the product listing filter sidebar.
+
+Each facet is counted over the products matching every *other* active filter,
+so selecting a category still shows how many products every other category
+has. The catalog engine answers from its column arrays; the Mongo fallback
+computes all facets in a single ``$facet`` aggregation.
+"""
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from catalog import CODED_FIELDS, CatalogSnapshot, ProductFilters
+
+# Lower bounds of the price buckets; the last bucket is open-ended.
+PRICE_BUCKETS = [0, 10000, 25000, 50000, 100000, 200000]
+AVAILABILITY_VALUES = ("ship", "storePickup")
+FACETS = CODED_FIELDS + ("occasion", "availability", "price")
+
+
+def _without(filters: ProductFilters, facet: str) -> ProductFilters:
+    if facet == "price":
+        return replace(filters, minPrice=None, maxPrice=None)
+    return replace(filters, **{facet: None})
+
+
+def _values(counts: Dict[str, int]) -> List[Dict[str, Any]]:
+    return [
+        {"value": value, "count": count}
+        for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        if count
+    ]
+
+
+def _price_buckets(counts: Sequence[int]) -> List[Dict[str, Any]]:
+    bounds = PRICE_BUCKETS + [None]
+    return [
+        {"min": bounds[i], "max": bounds[i + 1], "count": int(count)}
+        for i, count in enumerate(counts)
+    ]
+
+
+def snapshot_facets(
+    snapshot: CatalogSnapshot,
+    filters: ProductFilters,
+    ranked: Optional[Sequence[Tuple[str, float]]] = None,
+) -> Dict[str, Any]:
+    base = np.ones(snapshot.size, dtype=bool)
+    if ranked is not None:
+        base[:] = False
+        positions = [snapshot.position[doc_id] for doc_id, _ in ranked if doc_id in snapshot.position]
+        base[positions] = True
+
+    result: Dict[str, Any] = {"total": int((base & snapshot.mask(filters)).sum())}
+    for facet in FACETS:
+        mask = base & snapshot.mask(_without(filters, facet))
+        if facet in CODED_FIELDS:
+            codes = snapshot.codes[facet][mask]
+            counts = np.bincount(codes[codes >= 0], minlength=len(snapshot.vocab[facet]))
+            result[facet] = _values({value: int(counts[code]) for value, code in snapshot.vocab[facet].items()})
+        elif facet == "occasion":
+            bits = snapshot.occasion_bits[mask].astype("<u8").view(np.uint8)
+            counts = np.unpackbits(bits, axis=1, bitorder="little").sum(axis=0)
+            result[facet] = _values({value: int(counts[code]) for value, code in snapshot.occasion_vocab.items()})
+        elif facet == "availability":
+            result[facet] = _values({
+                "ship": int(snapshot.ship[mask].sum()),
+                "storePickup": int(snapshot.store_pickup[mask].sum()),
+            })
+        else:
+            prices = snapshot.price[mask]
+            buckets = np.searchsorted(PRICE_BUCKETS, prices[prices >= PRICE_BUCKETS[0]], side="right") - 1
+            result[facet] = _price_buckets(np.bincount(buckets, minlength=len(PRICE_BUCKETS)))
+    return result
+
+
+def mongo_facet_pipeline(filters: ProductFilters, search: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    def match(f: ProductFilters) -> Dict[str, Any]:
+        query = f.to_mongo()
+        if search:
+            query.update(search)
+        return {"$match": query}
+
+    stages: Dict[str, List[Dict[str, Any]]] = {
+        "total": [match(filters), {"$count": "count"}],
+    }
+    for facet in FACETS:
+        head = match(_without(filters, facet))
+        if facet in CODED_FIELDS:
+            stages[facet] = [head, {"$group": {"_id": f"${facet}", "count": {"$sum": 1}}}]
+        elif facet == "occasion":
+            stages[facet] = [head, {"$unwind": "$occasion"}, {"$group": {"_id": "$occasion", "count": {"$sum": 1}}}]
+        elif facet == "availability":
+            stages[facet] = [head, {"$group": {
+                "_id": None,
+                **{
+                    value: {"$sum": {"$cond": [{"$eq": [f"$availability.{value}", True]}, 1, 0]}}
+                    for value in AVAILABILITY_VALUES
+                },
+            }}]
+        else:
+            stages[facet] = [head, {"$match": {"price": {"$gte": PRICE_BUCKETS[0]}}}, {"$bucket": {
+                "groupBy": "$price",
+                "boundaries": PRICE_BUCKETS,
+                "default": PRICE_BUCKETS[-1],
+                "output": {"count": {"$sum": 1}},
+            }}]
+    return [{"$facet": stages}]
+
+
+def parse_mongo_facets(row: Dict[str, Any]) -> Dict[str, Any]:
+    total = row.get("total") or []
+    result: Dict[str, Any] = {"total": total[0]["count"] if total else 0}
+    for facet in FACETS:
+        groups = row.get(facet) or []
+        if facet == "availability":
+            counts = groups[0] if groups else {}
+            result[facet] = _values({value: counts.get(value, 0) for value in AVAILABILITY_VALUES})
+        elif facet == "price":
+            by_bound = {group["_id"]: group["count"] for group in groups}
+            result[facet] = _price_buckets([by_bound.get(bound, 0) for bound in PRICE_BUCKETS])
+        else:
+            result[facet] = _values({group["_id"]: group["count"] for group in groups if group["_id"] is not None})
+    return result
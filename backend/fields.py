@@ -0,0 +1,70 @@
+"""Sparse fieldsets for catalog responses.
+
+``?view=card`` returns what a product grid renders, ``?view=detail`` the
+whole document, and ``?fields=a,b,c`` an explicit list. A fieldset becomes the
+Mongo projection on the cold path and an in-memory projection of snapshot
+documents on the warm path, so both return the same shape.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+CARD_FIELDS = (
+    "id", "name", "category", "metal", "purity", "price",
+    "images", "rating", "reviewCount", "availability",
+)
+# Array fields trimmed to their first N elements in a view.
+CARD_SLICES = (("images", 1),)
+
+
+@dataclass(frozen=True)
+class FieldSet:
+    name: str
+    fields: Tuple[str, ...]
+    slices: Tuple[Tuple[str, int], ...] = ()
+
+    @property
+    def cacheable(self) -> bool:
+        # Named views are few; ad-hoc field lists are encoded per request.
+        return self.name in VIEWS
+
+
+VIEWS: Dict[str, Optional[FieldSet]] = {
+    "card": FieldSet("card", CARD_FIELDS, CARD_SLICES),
+    "detail": None,
+}
+
+
+def resolve_fieldset(view: Optional[str], fields: Optional[str], allowed: Iterable[str]) -> Optional[FieldSet]:
+    """``None`` means the full document; raises ``ValueError`` for unknown names."""
+    if fields:
+        requested = [field for field in fields.split(",") if field]
+        unknown = sorted(set(requested) - set(allowed))
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        ordered = ("id",) + tuple(field for field in dict.fromkeys(requested) if field != "id")
+        return FieldSet(",".join(ordered), ordered)
+    if view is None:
+        return None
+    if view not in VIEWS:
+        raise ValueError(f"Unknown view: {view}")
+    return VIEWS[view]
+
+
+def mongo_projection(fieldset: Optional[FieldSet], extra: Iterable[str] = ()) -> Dict[str, Any]:
+    """Projection for ``find``; ``extra`` fields (e.g. sort keys) are fetched but not returned."""
+    if fieldset is None:
+        return {"_id": 0}
+    projection: Dict[str, Any] = {"_id": 0, **{field: 1 for field in fieldset.fields}}
+    projection.update((field, 1) for field in extra)
+    projection.update((field, {"$slice": count}) for field, count in fieldset.slices)
+    return projection
+
+
+def project(doc: Dict[str, Any], fieldset: Optional[FieldSet]) -> Dict[str, Any]:
+    if fieldset is None:
+        return doc
+    projected = {field: doc[field] for field in fieldset.fields if field in doc}
+    for field, count in fieldset.slices:
+        if isinstance(projected.get(field), list):
+            projected[field] = projected[field][:count]
+    return projected
@@ -0,0 +1,34 @@
+"""Liveness and readiness probes.
+
+Liveness only says the worker's event loop is serving requests. Readiness also
+needs a Mongo round trip within ``ping_timeout`` and every warm-cache check to
+pass, and turns false once the worker starts shutting down. A load balancer
+therefore only routes to workers that can serve reads from memory.
+"""
+import asyncio
+from typing import Callable, Dict, Tuple
+
+import pymongo
+from pymongo.errors import PyMongoError
+
+
+class Readiness:
+    def __init__(self, client, warm_checks: Dict[str, Callable[[], bool]], ping_timeout: float = 1.0):
+        self.client = client
+        self.warm_checks = warm_checks
+        self.ping_timeout = ping_timeout
+        self.draining = False
+
+    async def ping(self) -> bool:
+        try:
+            with pymongo.timeout(self.ping_timeout):
+                await self.client.admin.command("ping")
+            return True
+        except (PyMongoError, asyncio.TimeoutError):
+            return False
+
+    async def check(self) -> Tuple[bool, Dict[str, bool]]:
+        checks = {"mongo": await self.ping()}
+        checks.update((name, bool(check())) for name, check in self.warm_checks.items())
+        ready = not self.draining and all(checks.values())
+        return ready, {**checks, "draining": self.draining}
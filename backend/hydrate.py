@@ -0,0 +1,62 @@
+"""Server-side hydration of cart, wishlist and order lines with product data.
+
+All referenced products are fetched in one go: from the warm catalog engine
+when possible, otherwise with a single ``$in`` lookup.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from catalog import CatalogEngine
+
+# Product fields the cart, wishlist and order views render.
+LINE_PRODUCT_FIELDS = (
+    "id", "name", "sku", "category", "metal", "purity", "metalColor", "price", "images", "availability",
+)
+
+
+def _project(doc: Dict[str, Any], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+    if fields is None:
+        return doc
+    return {field: doc[field] for field in fields if field in doc}
+
+
+async def fetch_products(
+    collection,
+    catalog: CatalogEngine,
+    ids: Iterable[str],
+    fields: Optional[Sequence[str]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Map of product id to (projected) product for every id that exists."""
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return {}
+    if catalog.warm:
+        snapshot = catalog.snapshot
+        return {
+            product_id: _project(snapshot.docs[snapshot.position[product_id]], fields)
+            for product_id in ids
+            if product_id in snapshot.position
+        }
+    projection = {"_id": 0, **({field: 1 for field in fields} if fields else {})}
+    docs = await collection.find({"id": {"$in": ids}}, projection).to_list(len(ids))
+    return {doc["id"]: doc for doc in docs}
+
+
+def expand_lines(lines: List[Dict[str, Any]], products: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Attach ``product`` and, for lines with a quantity, ``lineTotal``."""
+    expanded = []
+    for line in lines:
+        product = products.get(line.get("productId"))
+        line = {**line, "product": product}
+        if "quantity" in line:
+            price = product.get("price") if product else None
+            line["lineTotal"] = price * line["quantity"] if price is not None else None
+        expanded.append(line)
+    return expanded
+
+
+def cart_summary(lines: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "items": lines,
+        "itemCount": sum(line.get("quantity", 0) for line in lines),
+        "subtotal": sum(line.get("lineTotal") or 0 for line in lines),
+    }
@@ -0,0 +1,216 @@
+"""Declarative index spec, startup reconciliation and query-shape coverage.
+
+``INDEX_SPEC`` is the single source of truth for the indexes the API relies
+on. :func:`reconcile_indexes` creates whatever is missing and reports indexes
+that exist but are not in the spec; it never drops anything.
+:func:`explain_query_shapes` runs ``explain`` for every query shape the
+routes issue and flags collection scans and in-memory sorts.
+"""
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE
+from pymongo.errors import OperationFailure
+
+from catalog import SORT_OPTIONS
+from orders import ORDER_SORT
+
+logger = logging.getLogger(__name__)
+
+# Directions are 1/-1, or an index type such as "2dsphere"
+Keys = Tuple[Tuple[str, Union[int, str]], ...]
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    keys: Keys
+    unique: bool = False
+    options: Dict[str, Any] = field(default_factory=dict, hash=False)
+
+    @property
+    def name(self) -> str:
+        return "_".join(f"{key}_{direction}" for key, direction in self.keys)
+
+
+def _ix(*keys: Tuple[str, Union[int, str]], unique: bool = False, **options) -> IndexSpec:
+    return IndexSpec(keys=tuple(keys), unique=unique, options=options)
+
+
+# Listing sorts (see catalog.SORT_OPTIONS) always end in an ascending id
+# tiebreak, so the compound indexes below serve filter + sort without an
+# in-memory SORT stage. An index can be scanned backwards, which only reverses
+# both keys, so price_high (price desc, id asc) needs its own index.
+FEATURED = (("rating", DESCENDING), ("id", ASCENDING))
+PRICE = (("price", ASCENDING), ("id", ASCENDING))
+PRICE_DESC = (("price", DESCENDING), ("id", ASCENDING))
+
+INDEX_SPEC: Dict[str, List[IndexSpec]] = {
+    "products": [
+        _ix(("id", ASCENDING), unique=True),
+        _ix(*FEATURED),
+        _ix(*PRICE),
+        _ix(*PRICE_DESC),
+        _ix(("category", ASCENDING), *FEATURED),
+        _ix(("category", ASCENDING), *PRICE),
+        _ix(("category", ASCENDING), *PRICE_DESC),
+        _ix(("metal", ASCENDING), *FEATURED),
+        _ix(("metal", ASCENDING), *PRICE),
+        _ix(("metal", ASCENDING), *PRICE_DESC),
+        _ix(("occasion", ASCENDING), *FEATURED),
+        _ix(("gender", ASCENDING), *FEATURED),
+        _ix(("tags", ASCENDING)),
+        _ix(("updatedAt", ASCENDING), ("id", ASCENDING)),
+    ],
+    "stores": [
+        _ix(("city", ASCENDING)),
+        _ix(("pincode", ASCENDING)),
+        _ix(("location", GEOSPHERE)),
+    ],
+    "cart": [
+        _ix(("userId", ASCENDING), ("productId", ASCENDING), ("size", ASCENDING), unique=True),
+        _ix(("id", ASCENDING)),
+    ],
+    "wishlist": [
+        _ix(("userId", ASCENDING), ("productId", ASCENDING)),
+        _ix(("id", ASCENDING)),
+    ],
+    "orders": [
+        _ix(("userId", ASCENDING), ("createdAt", DESCENDING), ("id", DESCENDING)),
+        _ix(("userId", ASCENDING), ("status", ASCENDING), ("createdAt", DESCENDING), ("id", DESCENDING)),
+        _ix(("id", ASCENDING)),
+    ],
+    "newsletter": [
+        _ix(("email", ASCENDING), unique=True),
+    ],
+}
+
+
+@dataclass
+class ReconcileReport:
+    created: List[str] = field(default_factory=list)
+    present: List[str] = field(default_factory=list)
+    extra: List[str] = field(default_factory=list)
+    conflicts: List[str] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+
+    def log(self) -> None:
+        logger.info(
+            "Indexes: %d created, %d present, %d extra, %d conflicting, %d failed",
+            len(self.created), len(self.present), len(self.extra), len(self.conflicts), len(self.failed),
+        )
+        for name in self.extra:
+            logger.info("Index not in spec: %s", name)
+        for name in self.conflicts + self.failed:
+            logger.warning("Index needs attention: %s", name)
+
+
+async def reconcile_indexes(db, spec: Optional[Dict[str, List[IndexSpec]]] = None) -> ReconcileReport:
+    """Create missing indexes from the spec and report everything else."""
+    spec = INDEX_SPEC if spec is None else spec
+    report = ReconcileReport()
+    for collection_name, wanted in spec.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        by_keys = {tuple((k, d if isinstance(d, str) else int(d)) for k, d in info["key"]): (name, info) for name, info in existing.items()}
+        for index in wanted:
+            label = f"{collection_name}.{index.name}"
+            found = by_keys.pop(index.keys, None)
+            if found is not None:
+                if bool(found[1].get("unique")) != index.unique:
+                    report.conflicts.append(f"{label} (unique={found[1].get('unique', False)}, spec={index.unique})")
+                else:
+                    report.present.append(label)
+                continue
+            try:
+                await collection.create_index(
+                    list(index.keys), name=index.name, unique=index.unique, background=True, **index.options
+                )
+                report.created.append(label)
+            except OperationFailure as exc:
+                report.failed.append(f"{label} ({exc})")
+        report.extra.extend(f"{collection_name}.{name}" for name, _ in by_keys.values() if name != "_id_")
+    return report
+
+
+@dataclass(frozen=True)
+class QueryShape:
+    name: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[Sequence[Tuple[str, int]]] = None
+
+
+def _listing(name: str, filter: Dict[str, Any], sort: str) -> QueryShape:
+    return QueryShape(f"products.list.{name}.{sort}", "products", filter, SORT_OPTIONS[sort])
+
+
+QUERY_SHAPES: List[QueryShape] = [
+    *(_listing("all", {}, sort) for sort in ("featured", "newest", "price_low", "price_high")),
+    *(_listing("category", {"category": "Ring"}, sort) for sort in ("featured", "price_low", "price_high")),
+    *(_listing("metal", {"metal": "Gold"}, sort) for sort in ("featured", "price_low", "price_high")),
+    _listing("occasion", {"occasion": {"$in": ["Wedding"]}}, "featured"),
+    _listing("gender", {"gender": "Women"}, "featured"),
+    _listing("price_range", {"price": {"$gte": 10000, "$lte": 100000}}, "price_low"),
+    QueryShape("products.export", "products", {}, [("id", ASCENDING)]),
+    QueryShape("products.export.since", "products", {"updatedAt": {"$gte": datetime(2024, 1, 1)}},
+               [("updatedAt", ASCENDING), ("id", ASCENDING)]),
+    QueryShape("products.detail", "products", {"id": "prod_001"}),
+    QueryShape("products.batch", "products", {"id": {"$in": ["prod_001", "prod_002"]}}),
+    QueryShape("products.related", "products", {
+        "id": {"$ne": "prod_001"},
+        "$or": [{"category": "Ring"}, {"tags": {"$in": ["traditional"]}}],
+    }),
+    QueryShape("products.quiz", "products", {
+        "occasion": {"$in": ["Wedding"]}, "price": {"$gte": 10000, "$lte": 100000}, "metal": "Gold",
+    }),
+    QueryShape("stores.pincode", "stores", {"pincode": "400001"}),
+    QueryShape("stores.near", "stores", {
+        "location": {"$nearSphere": {"$geometry": {"type": "Point", "coordinates": [72.8354, 18.9388]}}},
+    }),
+    QueryShape("cart.by_user", "cart", {"userId": "guest"}),
+    QueryShape("cart.line", "cart", {"userId": "guest", "productId": "prod_001", "size": None}),
+    QueryShape("cart.by_id", "cart", {"id": "x"}),
+    QueryShape("wishlist.by_user", "wishlist", {"userId": "guest"}),
+    QueryShape("wishlist.line", "wishlist", {"userId": "guest", "productId": "prod_001"}),
+    QueryShape("wishlist.by_id", "wishlist", {"id": "x"}),
+    QueryShape("orders.by_user", "orders", {"userId": "guest"}, ORDER_SORT),
+    QueryShape("orders.by_user.status", "orders", {"userId": "guest", "status": "pending"}, ORDER_SORT),
+    QueryShape("orders.by_user.range", "orders", {
+        "userId": "guest", "createdAt": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2025, 1, 1)},
+    }, ORDER_SORT),
+    QueryShape("newsletter.email", "newsletter", {"email": "a@example.com"}),
+]
+
+
+def _stages(plan: Dict[str, Any]) -> List[str]:
+    stages = [plan.get("stage", "?")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _stages(child)
+    return stages
+
+
+async def explain_query_shapes(db, shapes: Optional[List[QueryShape]] = None) -> List[Dict[str, Any]]:
+    """Explain every shape and flag collection scans and in-memory sorts."""
+    results = []
+    for shape in QUERY_SHAPES if shapes is None else shapes:
+        command: Dict[str, Any] = {"find": shape.collection, "filter": shape.filter}
+        if shape.sort:
+            command["sort"] = dict(shape.sort)
+        explain = await db.command({"explain": command, "verbosity": "executionStats"})
+        stages = _stages(explain["queryPlanner"]["winningPlan"])
+        stats = explain.get("executionStats", {})
+        results.append({
+            "shape": shape.name,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+            "inMemorySort": "SORT" in stages,
+            "docsExamined": stats.get("totalDocsExamined"),
+            "keysExamined": stats.get("totalKeysExamined"),
+            "returned": stats.get("nReturned"),
+        })
+    return results
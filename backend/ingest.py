@@ -0,0 +1,153 @@
+"""Write-behind ingestion for lead and form submissions.
+
+Form endpoints enqueue their document and return immediately. One flusher
+per collection batches the queue into ``insert_many(ordered=False)`` once a
+size or time threshold is reached. Queues are bounded; a full queue is
+reported to the caller so the route can shed load with a 503. Pending
+documents are flushed on shutdown.
+"""
+import asyncio
+import contextvars
+import logging
+from typing import Any, Dict, List, Optional
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+
+class QueueFull(Exception):
+    """The collection's ingestion queue is at capacity."""
+
+
+class WriteBehindQueue:
+    def __init__(
+        self,
+        collection,
+        max_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        max_retries: int = 3,
+    ):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, doc: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(doc)
+        except asyncio.QueueFull:
+            raise QueueFull(self.collection.name)
+
+    def start(self) -> None:
+        if self._task is None:
+            # A queue is often started by the first submit, inside a request.
+            # Run the flusher in a fresh context so it does not inherit that
+            # request's pymongo.timeout deadline or metric labels.
+            self._task = asyncio.create_task(self._run(), context=contextvars.Context())
+
+    async def drain(self) -> None:
+        """Stop the flusher and write out everything still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while not self._queue.empty():
+            await self._flush(self._take(self.batch_size))
+
+    def _take(self, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                deadline = loop.time() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    batch.extend(self._take(self.batch_size - len(batch)))
+                    remaining = deadline - loop.time()
+                    if len(batch) >= self.batch_size or remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                await self._flush(batch)
+            except asyncio.CancelledError:
+                # Shutting down with a batch in hand: write it before exiting.
+                # insert_many already assigned _ids, so a partially applied
+                # insert is not duplicated.
+                await self._flush(batch)
+                raise
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                await self.collection.insert_many(batch, ordered=False)
+                return
+            except BulkWriteError as exc:
+                # Unordered inserts keep going past duplicates; only report
+                # errors other than unique-index rejections.
+                errors = [e for e in exc.details.get("writeErrors", []) if e.get("code") != DUPLICATE_KEY]
+                if errors:
+                    logger.error(
+                        "Dropped %d of %d %s documents: %s",
+                        len(errors), len(batch), self.collection.name, errors[0].get("errmsg"),
+                    )
+                return
+            except PyMongoError as exc:
+                logger.warning(
+                    "Flushing %d %s documents failed (attempt %d/%d): %s",
+                    len(batch), self.collection.name, attempt, self.max_retries, exc,
+                )
+                await asyncio.sleep(min(2 ** attempt * 0.1, 2.0))
+        logger.error("Dropped %d %s documents after %d attempts", len(batch), self.collection.name, self.max_retries)
+
+
+class IngestPipeline:
+    """One :class:`WriteBehindQueue` per collection."""
+
+    def __init__(self, db, **queue_options):
+        self.db = db
+        self.queue_options = queue_options
+        self._queues: Dict[str, WriteBehindQueue] = {}
+        self._started = False
+
+    def queue(self, name: str) -> WriteBehindQueue:
+        queue = self._queues.get(name)
+        if queue is None:
+            queue = WriteBehindQueue(self.db[name], **self.queue_options)
+            self._queues[name] = queue
+            if self._started:
+                queue.start()
+        return queue
+
+    def submit(self, name: str, doc: Dict[str, Any]) -> None:
+        self.queue(name).submit(doc)
+
+    def start(self) -> None:
+        self._started = True
+        for queue in self._queues.values():
+            queue.start()
+
+    async def drain(self) -> None:
+        self._started = False
+        await asyncio.gather(*(queue.drain() for queue in self._queues.values()))
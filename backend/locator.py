@@ -0,0 +1,212 @@
+"""Nearest-store lookup for the store locator.
+
+Stores carry ``latitude``/``longitude`` plus a GeoJSON ``location`` point for
+the Mongo ``2dsphere`` index. The API keeps every store in a KD-tree over unit
+vectors on the sphere: straight-line (chord) distance between unit vectors
+grows monotonically with great-circle distance, so a plain Euclidean tree
+answers k-nearest queries. Pincodes become coordinates through a local
+centroid table (``pincode_centroids.csv``, or the file named by
+``PINCODE_CENTROIDS``). A pincode missing from the table falls back to the mean
+of known pincodes sharing its sorting district (first three digits), then its
+region (first two).
+"""
+import asyncio
+import csv
+import heapq
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_CENTROIDS = Path(__file__).parent / "pincode_centroids.csv"
+LEAF_SIZE = 32
+
+LatLng = Tuple[float, float]
+
+
+def geo_point(latitude: float, longitude: float) -> Dict[str, Any]:
+    """GeoJSON point; GeoJSON orders coordinates longitude first."""
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+def unit_vectors(latitudes, longitudes) -> np.ndarray:
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lng = np.radians(np.asarray(longitudes, dtype=np.float64))
+    return np.stack([np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)], axis=-1)
+
+
+def chord_to_km(chord: np.ndarray) -> np.ndarray:
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chord / 2, 1.0))
+
+
+def km_to_chord(km: float) -> float:
+    return float(2 * np.sin(min(km / (2 * EARTH_RADIUS_KM), np.pi / 2)))
+
+
+def load_centroids(path: Path = DEFAULT_CENTROIDS) -> Dict[str, LatLng]:
+    with open(path, newline="") as f:
+        return {row["pincode"]: (float(row["latitude"]), float(row["longitude"])) for row in csv.DictReader(f)}
+
+
+class KDTree:
+    """Static KD-tree over 3-D points with k-nearest queries."""
+
+    def __init__(self, points: np.ndarray, leaf_size: int = LEAF_SIZE):
+        self.points = points
+        self.leaf_size = leaf_size
+        self._order = np.arange(len(points))
+        # (start, end, axis, split, left, right); axis is -1 for leaves
+        self._nodes: List[Tuple[int, int, int, float, int, int]] = []
+        if len(points):
+            self._build(0, len(points))
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _build(self, start: int, end: int) -> int:
+        node = len(self._nodes)
+        self._nodes.append((start, end, -1, 0.0, -1, -1))
+        if end - start <= self.leaf_size:
+            return node
+        members = self._order[start:end]
+        coords = self.points[members]
+        axis = int(np.argmax(coords.max(axis=0) - coords.min(axis=0)))
+        self._order[start:end] = members[np.argsort(coords[:, axis], kind="stable")]
+        middle = (start + end) // 2
+        split = float(self.points[self._order[middle], axis])
+        left = self._build(start, middle)
+        right = self._build(middle, end)
+        self._nodes[node] = (start, end, axis, split, left, right)
+        return node
+
+    def query(self, point: np.ndarray, k: int, max_distance: float = np.inf) -> List[Tuple[float, int]]:
+        """The ``k`` nearest ``(distance, index)`` pairs within ``max_distance``, nearest first."""
+        if not self._nodes or k <= 0:
+            return []
+        best: List[Tuple[float, int]] = []  # max-heap of (-distance, index)
+
+        def bound() -> float:
+            return -best[0][0] if len(best) == k else max_distance
+
+        coords = point.tolist()
+        stack = [0]
+        while stack:
+            start, end, axis, split, left, right = self._nodes[stack.pop()]
+            if axis < 0:
+                members = self._order[start:end]
+                delta = self.points[members] - point
+                distances = np.sqrt(np.einsum("ij,ij->i", delta, delta))
+                close = distances <= bound()
+                for distance, index in zip(distances[close].tolist(), members[close].tolist()):
+                    if distance > bound():
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, index))
+                    else:
+                        heapq.heapreplace(best, (-distance, index))
+                continue
+            offset = coords[axis] - split
+            near, far = (left, right) if offset < 0 else (right, left)
+            # Pushed first so it is popped last, after the near side has tightened the bound.
+            if abs(offset) <= bound():
+                stack.append(far)
+            stack.append(near)
+        return sorted((-distance, index) for distance, index in best)
+
+
+class StoreLocator:
+    """In-memory store positions and pincode centroids."""
+
+    def __init__(self, centroids: Optional[Dict[str, LatLng]] = None):
+        self._centroids: Dict[str, LatLng] = dict(centroids or {})
+        self._prefixes: Dict[str, LatLng] = {}
+        self._stores: List[Dict[str, Any]] = []
+        self._tree: Optional[KDTree] = None
+        self._index_prefixes()
+
+    @property
+    def warm(self) -> bool:
+        return self._tree is not None
+
+    def __len__(self) -> int:
+        return len(self._stores)
+
+    def _index_prefixes(self) -> None:
+        sums: Dict[str, List[float]] = {}
+        for pincode, (lat, lng) in self._centroids.items():
+            for length in (3, 2):
+                total = sums.setdefault(pincode[:length], [0.0, 0.0, 0])
+                total[0] += lat
+                total[1] += lng
+                total[2] += 1
+        self._prefixes = {prefix: (lat / n, lng / n) for prefix, (lat, lng, n) in sums.items()}
+
+    def resolve_pincode(self, pincode: str) -> Optional[LatLng]:
+        pincode = pincode.strip()
+        if len(pincode) != 6 or not pincode.isdigit():
+            return None
+        return self._centroids.get(pincode) or self._prefixes.get(pincode[:3]) or self._prefixes.get(pincode[:2])
+
+    def load(self, stores: List[Dict[str, Any]]) -> None:
+        """Index stores; stores without coordinates are placed at their pincode centroid."""
+        placed, positions = [], []
+        for store in stores:
+            if store.get("latitude") is not None and store.get("longitude") is not None:
+                position = (float(store["latitude"]), float(store["longitude"]))
+                # A store's own coordinates beat the table for its pincode.
+                if store.get("pincode"):
+                    self._centroids[store["pincode"]] = position
+            else:
+                position = self.resolve_pincode(store.get("pincode") or "")
+                if position is None:
+                    logger.warning("Store %s has no coordinates or known pincode", store.get("id"))
+                    continue
+            placed.append(store)
+            positions.append(position)
+        self._index_prefixes()
+        points = unit_vectors([p[0] for p in positions], [p[1] for p in positions]) if positions else np.empty((0, 3))
+        self._stores = placed
+        self._tree = KDTree(points)
+
+    async def reload(self, collection) -> None:
+        self.load(await collection.find({}, {"_id": 0, "location": 0}).to_list(None))
+        logger.info("Store locator loaded %d stores", len(self._stores))
+
+    async def warm_up(self, collection, delay: float = 1.0, max_delay: float = 30.0) -> None:
+        """Load the stores, retrying with backoff until Mongo answers."""
+        while not self.warm:
+            try:
+                await self.reload(collection)
+            except PyMongoError as exc:
+                logger.warning("Store locator warm-up failed, retrying in %.0fs: %s", delay, exc)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_delay)
+
+    def nearest(self, origin: LatLng, k: int = 5, max_km: Optional[float] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """The ``k`` nearest stores to ``origin`` as ``(store, distance_km)``, nearest first."""
+        if self._tree is None:
+            return []
+        point = unit_vectors(origin[0], origin[1])
+        max_chord = km_to_chord(max_km) if max_km is not None else np.inf
+        return [
+            (self._stores[index], float(chord_to_km(chord)))
+            for chord, index in self._tree.query(point, k, max_chord)
+        ]
+
+
+def geo_near_pipeline(origin: LatLng, k: int, max_km: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Aggregation equivalent of :meth:`StoreLocator.nearest`, served by the 2dsphere index."""
+    near: Dict[str, Any] = {
+        "near": geo_point(*origin),
+        "distanceField": "distanceKm",
+        "distanceMultiplier": 0.001,
+        "spherical": True,
+    }
+    if max_km is not None:
+        near["maxDistance"] = max_km * 1000
+    return [{"$geoNear": near}, {"$limit": k}, {"$project": {"_id": 0, "location": 0}}]
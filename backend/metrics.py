@@ -0,0 +1,391 @@
+"""Request and Mongo command metrics in Prometheus text format.
+
+:class:`MetricsMiddleware` records per-route latency and response-size
+histograms and in-flight gauges. :class:`MongoCommandListener` is registered
+on the Mongo client and records per-collection, per-command durations and
+document counts. It also attributes them to the request being served, since
+Motor copies the request's context into its executor threads. Requests slower
+than a threshold are logged with their Mongo breakdown.
+
+Under several worker processes, :class:`MultiProcessMetrics` sums every
+worker's registry through snapshot files in a shared directory, so a scrape
+sees the whole server rather than whichever worker answered it.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def dump(self) -> list:
+        """JSON-serialisable samples, loadable into :meth:`fresh` with ``load``."""
+        raise NotImplementedError
+
+    def fresh(self) -> "_Metric":
+        """Empty metric of the same name and shape, to merge dumps into."""
+        return type(self)(self.name, self.help, self.labels)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Labels, float] = defaultdict(float)
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] += amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in items]
+
+    def dump(self) -> list:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def load(self, samples) -> None:
+        with self._lock:
+            for key, value in samples:
+                self._values[tuple(key)] += value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class CallbackGauge(_Metric):
+    """Gauge whose samples are collected from ``collect`` at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str], collect: Callable[[], List[Tuple[Labels, float]]]):
+        super().__init__(name, help, labels)
+        self.collect = collect
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in self.collect()]
+
+    def dump(self) -> list:
+        return [[list(key), value] for key, value in self.collect()]
+
+    def fresh(self) -> "Gauge":
+        return Gauge(self.name, self.help, self.labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self._counts: Dict[Labels, List[int]] = {}
+        self._sums: Dict[Labels, float] = defaultdict(float)
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(labels)
+            if counts is None:
+                counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._sums[labels] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(counts), self._sums[key]) for key, counts in self._counts.items())
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                bucket_labels = _format_labels(self.labels, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+    def dump(self) -> list:
+        with self._lock:
+            return [[list(key), list(counts), self._sums[key]] for key, counts in self._counts.items()]
+
+    def fresh(self) -> "Histogram":
+        return Histogram(self.name, self.help, self.labels, self.buckets)
+
+    def load(self, samples) -> None:
+        with self._lock:
+            for key, counts, total in samples:
+                key = tuple(key)
+                merged = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+                for index, count in enumerate(counts):
+                    merged[index] += count
+                self._sums[key] += total
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+    def dump(self) -> Dict[str, list]:
+        return {metric.name: metric.dump() for metric in self._metrics}
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MultiProcessMetrics:
+    """Sums the registries of all worker processes sharing ``directory``.
+
+    Each worker writes its registry to ``<pid>.json`` every ``interval``
+    seconds and whenever it answers a scrape, which then merges every file, so
+    other workers' samples are at most ``interval`` seconds old. Counters and
+    histograms of exited workers are kept, so totals do not go backwards when
+    a worker is replaced; their gauges are dropped. The directory must be
+    emptied before the workers start (serve.py does this).
+    """
+
+    def __init__(self, registry: Registry, directory, interval: float = 5.0, pid: Optional[int] = None):
+        self.registry = registry
+        self.directory = Path(directory)
+        self.interval = interval
+        self.pid = pid or os.getpid()
+
+    def write(self) -> None:
+        path = self.directory / f"{self.pid}.json"
+        partial = self.directory / f"{self.pid}.tmp"
+        partial.write_text(json.dumps(self.registry.dump()))
+        os.replace(partial, path)
+
+    def render(self) -> str:
+        self.write()
+        merged = Registry()
+        for metric in self.registry._metrics:
+            merged.register(metric.fresh())
+        for path in sorted(self.directory.glob("*.json")):
+            try:
+                pid = int(path.stem)
+                snapshot = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            alive = pid == self.pid or _alive(pid)
+            for metric in merged._metrics:
+                if metric.kind == "gauge" and not alive:
+                    continue
+                metric.load(snapshot.get(metric.name, ()))
+        return merged.render()
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.write()
+            except OSError:
+                logger.exception("Could not write metrics snapshot to %s", self.directory)
+
+
+registry = Registry()
+REQUEST_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "Request latency by route.", ("method", "route", "status"),
+))
+RESPONSE_SIZE = registry.register(Histogram(
+    "http_response_size_bytes", "Response body size by route.", ("method", "route"), SIZE_BUCKETS,
+))
+IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "Requests currently being served.", ("method", "route"),
+))
+MONGO_LATENCY = registry.register(Histogram(
+    "mongo_command_duration_seconds", "Mongo command latency.", ("collection", "command", "outcome"),
+))
+MONGO_DOCS = registry.register(Counter(
+    "mongo_command_documents_total", "Documents returned or written by Mongo commands.", ("collection", "command"),
+))
+
+
+@dataclass
+class RequestStats:
+    """Mongo work done on behalf of one request."""
+    commands: Dict[Tuple[str, str], List[float]] = field(default_factory=dict)
+
+    def add(self, collection: str, command: str, seconds: float, docs: int) -> None:
+        entry = self.commands.setdefault((collection, command), [0, 0.0, 0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += docs
+
+    @property
+    def mongo_seconds(self) -> float:
+        return sum(entry[1] for entry in self.commands.values())
+
+    def breakdown(self) -> str:
+        ranked = sorted(self.commands.items(), key=lambda item: -item[1][1])
+        return ", ".join(
+            f"{collection}.{command} x{count} {seconds * 1000:.1f}ms ({docs} docs)"
+            for (collection, command), (count, seconds, docs) in ranked
+        ) or "none"
+
+
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "current_request", default=None
+)
+
+# Commands whose target collection is not the value of the command-name key.
+_COLLECTION_KEYS = {"getMore": "collection"}
+
+
+def _documents(reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    return int(reply.get("n", 0) or 0)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every command and charges it to the current request, if any."""
+
+    def __init__(self):
+        self._collections: Dict[Tuple[int, object], str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        key = _COLLECTION_KEYS.get(event.command_name, event.command_name)
+        collection = event.command.get(key)
+        with self._lock:
+            self._collections[(event.request_id, event.connection_id)] = (
+                collection if isinstance(collection, str) else event.database_name
+            )
+
+    def _finish(self, event, outcome: str, docs: int) -> None:
+        with self._lock:
+            collection = self._collections.pop((event.request_id, event.connection_id), "?")
+        seconds = event.duration_micros / 1e6
+        MONGO_LATENCY.observe(seconds, collection, event.command_name, outcome)
+        if docs:
+            MONGO_DOCS.inc(collection, event.command_name, amount=docs)
+        stats = current_request.get()
+        if stats is not None:
+            stats.add(collection, event.command_name, seconds, docs)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event, "ok", _documents(event.reply))
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, "error", 0)
+
+
+class MetricsMiddleware:
+    """Per-route latency, size and in-flight metrics plus a slow-request log."""
+
+    def __init__(self, app, slow_request_seconds: float = 1.0):
+        self.app = app
+        self.slow_request_seconds = slow_request_seconds
+
+    def _route(self, scope) -> str:
+        # Resolve the route template up front so in-flight gauges and cache
+        # hits short-circuited by inner middleware are labelled too.
+        router = scope.get("app").router if scope.get("app") is not None else None
+        for route in getattr(router, "routes", ()):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", scope["path"])
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route(scope)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        IN_FLIGHT.inc(method, route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_FLIGHT.dec(method, route)
+            current_request.reset(token)
+            REQUEST_LATENCY.observe(elapsed, method, route, str(status))
+            RESPONSE_SIZE.observe(size, method, route)
+            if elapsed >= self.slow_request_seconds:
+                mongo = stats.mongo_seconds
+                logger.warning(
+                    "Slow request %s %s -> %s in %.1fms (mongo %.1fms, app %.1fms, %d bytes); mongo: %s",
+                    method, scope["path"], status, elapsed * 1000, mongo * 1000,
+                    max(elapsed - mongo, 0.0) * 1000, size, stats.breakdown(),
+                )
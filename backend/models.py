@@ -0,0 +1,161 @@
+"""Request and document models shared by the API and the maintenance scripts.
+
+Kept free of server setup, so scripts can validate catalog rows without
+importing the app.
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class StoneDetails(BaseModel):
+    type: Optional[str] = None
+    carat: Optional[float] = None
+    clarity: Optional[str] = None
+    color: Optional[str] = None
+
+
+class Availability(BaseModel):
+    ship: bool = True
+    storePickup: bool = False
+
+
+class Product(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    name: str
+    sku: str
+    category: str
+    metal: str
+    purity: str
+    metalColor: str
+    grossWeight: float
+    price: float
+    description: str
+    images: List[str]
+    tags: List[str]
+    occasion: List[str]
+    gender: str
+    stoneDetails: Optional[StoneDetails] = None
+    availability: Availability
+    rating: float
+    reviewCount: int
+    dimensions: Optional[Dict[str, Any]] = None
+    priceBreakup: Optional[Dict[str, float]] = None
+
+
+class CartItem(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    productId: str
+    quantity: int = 1
+    size: Optional[str] = None
+    userId: str = "guest"
+
+
+class CartOperation(BaseModel):
+    op: Literal["add", "set", "remove"]
+    productId: Optional[str] = None
+    size: Optional[str] = None
+    itemId: Optional[str] = None
+    quantity: int = 1
+
+
+class CartBatch(BaseModel):
+    userId: str = "guest"
+    operations: List[CartOperation] = Field(..., max_length=100)
+
+
+class WishlistItem(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    productId: str
+    userId: str = "guest"
+
+
+class Appointment(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    name: str
+    phone: str
+    city: str
+    preferredStore: str
+    date: str
+    time: str
+    purpose: str
+    createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class ExchangeLead(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    name: str
+    phone: str
+    email: str
+    city: str
+    goldType: str
+    approximateWeight: str
+    createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class Store(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    name: str
+    address: str
+    city: str
+    pincode: str
+    phone: str
+    hours: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+
+class Order(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    userId: str = "guest"
+    items: List[Dict[str, Any]]
+    total: float
+    address: Dict[str, str]
+    paymentMethod: str
+    status: str = "pending"
+    createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class QuizResponse(BaseModel):
+    occasion: str
+    budget: List[int]
+    style: str
+    metal: str
+
+
+class NewsletterSubscription(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    email: str
+    createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class ContactForm(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    name: str
+    email: str
+    phone: Optional[str] = None
+    message: str
+    createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class StoreQuery(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    name: str
+    phone: str
+    pincode: str
+    productId: str
+    # Routed to the store nearest the pincode when not given
+    storeId: Optional[str] = None
+    createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,73 @@
+"""Order history queries.
+
+History is read newest first on the ``(userId, createdAt, id)`` index and
+paginated with a keyset cursor over ``(createdAt, id)``, so every page is an
+index range seek. ``createdAt`` is stored as a BSON date and ``itemCount`` is
+written with the order so summaries never read item arrays; orders written
+before that convention are converted by ``scripts/migrate_orders.py``.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pagination import decode_token, encode_token, parse_datetime
+
+ORDER_SORT = [("createdAt", -1), ("id", -1)]
+
+# Named projections; "summary" leaves out item arrays and addresses.
+ORDER_VIEWS: Dict[str, Dict[str, Any]] = {
+    "summary": {
+        "_id": 0,
+        "id": 1,
+        "status": 1,
+        "total": 1,
+        "paymentMethod": 1,
+        "createdAt": 1,
+        "itemCount": 1,
+    },
+    "full": {"_id": 0},
+}
+
+
+def order_item_count(items: List[Dict[str, Any]]) -> int:
+    return sum(item.get("quantity", 1) for item in items)
+
+
+def encode_order_cursor(order: Dict[str, Any]) -> str:
+    created = order["createdAt"]
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    return encode_token({"createdAt": created.isoformat(), "id": order["id"]})
+
+
+def decode_order_cursor(token: str) -> Tuple[datetime, str]:
+    """Parse an order-history cursor, raising ``ValueError`` if it is malformed."""
+    payload = decode_token(token)
+    if not isinstance(payload.get("createdAt"), str) or not isinstance(payload.get("id"), str):
+        raise ValueError("Invalid cursor")
+    return parse_datetime(payload["createdAt"]), payload["id"]
+
+
+def order_history_filter(
+    user_id: str,
+    statuses: Optional[List[str]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after: Optional[Tuple[datetime, str]] = None,
+) -> Dict[str, Any]:
+    query: Dict[str, Any] = {"userId": user_id}
+    if statuses:
+        query["status"] = statuses[0] if len(statuses) == 1 else {"$in": statuses}
+    created: Dict[str, Any] = {}
+    if since is not None:
+        created["$gte"] = since
+    if until is not None:
+        created["$lt"] = until
+    if created:
+        query["createdAt"] = created
+    if after is not None:
+        created_at, order_id = after
+        query["$or"] = [
+            {"createdAt": {"$lt": created_at}},
+            {"createdAt": created_at, "id": {"$lt": order_id}},
+        ]
+    return query
@@ -0,0 +1,88 @@
+"""Keyset cursor pagination and cached totals for product listings.
+
+Cursors are opaque, URL-safe tokens carrying the last row's (sort key, id)
+pair, so the next page is a range seek instead of a growing ``skip``.
+Relevance-ranked search results have no stable sort key and fall back to an
+offset inside the cursor, which is cheap because they are served from memory.
+"""
+import base64
+import json
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+# Sort name -> (key field, direction); ties always break on ascending id.
+SORT_KEYS = {
+    "featured": ("rating", -1),
+    "newest": ("id", -1),
+    "price_low": ("price", 1),
+    "price_high": ("price", -1),
+}
+
+
+@dataclass(frozen=True)
+class Cursor:
+    sort: str
+    value: Any = None
+    id: Optional[str] = None
+    offset: Optional[int] = None
+
+
+def parse_datetime(value: str) -> datetime:
+    """Parse an ISO-8601 timestamp or checkpoint; naive values are taken as UTC."""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def encode_token(payload: Dict[str, Any]) -> str:
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """Decode an opaque token back to its payload, raising ``ValueError`` if malformed."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(payload, dict):
+        raise ValueError("Invalid cursor")
+    return payload
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    return encode_token({k: v for k, v in asdict(cursor).items() if v is not None})
+
+
+def decode_cursor(token: str) -> Cursor:
+    """Parse a cursor token, raising ``ValueError`` if it is malformed."""
+    try:
+        cursor = Cursor(**decode_token(token))
+    except TypeError as exc:
+        raise ValueError("Invalid cursor") from exc
+    if cursor.sort not in SORT_KEYS:
+        raise ValueError("Invalid cursor")
+    if cursor.offset is None and cursor.id is None:
+        raise ValueError("Invalid cursor")
+    if cursor.offset is not None and (not isinstance(cursor.offset, int) or cursor.offset < 0):
+        raise ValueError("Invalid cursor")
+    return cursor
+
+
+def cursor_after(sort: str, doc: Dict[str, Any]) -> Cursor:
+    field, _ = SORT_KEYS[sort]
+    return Cursor(sort=sort, value=None if field == "id" else doc.get(field), id=doc.get("id"))
+
+
+def keyset_filter(cursor: Cursor) -> Dict[str, Any]:
+    """Mongo filter selecting rows strictly after the cursor in its sort order."""
+    field, direction = SORT_KEYS[cursor.sort]
+    if field == "id":
+        return {"id": {"$lt": cursor.id}}
+    op = "$lt" if direction < 0 else "$gt"
+    return {"$or": [
+        {field: {op: cursor.value}},
+        {field: cursor.value, "id": {"$gt": cursor.id}},
+    ]}
@@ -0,0 +1,95 @@
+"""Ranked quiz recommendations scored against the in-memory catalog.
+
+Instead of turning the quiz into a hard Mongo filter, every product is scored
+at once as a weighted soft match over the catalog snapshot's columns, so a
+tight quiz still returns a full, ranked page.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from catalog import CatalogSnapshot
+from search import tokenize
+
+WEIGHTS = {
+    "occasion": 0.3,
+    "budget": 0.3,
+    "metal": 0.2,
+    "style": 0.15,
+    "rating": 0.05,
+}
+
+# Quiz style answers mapped onto catalog tags. Unknown styles match their own
+# words as tags.
+STYLE_TAGS = {
+    "traditional": ["traditional", "ethnic", "temple", "antique", "kundan", "polki", "bridal", "festive"],
+    "modern": ["modern", "trendy", "minimal", "layered", "layering", "infinity"],
+    "minimal": ["minimal", "daily", "studs", "versatile", "casual", "chain"],
+    "classic": ["classic", "elegant", "diamond", "pearl", "gift"],
+    "bold": ["bold", "statement", "luxury", "gemstone", "rare"],
+    "statement": ["bold", "statement", "luxury", "gemstone", "rare"],
+}
+
+# A price this far outside the budget, relative to the nearest edge, scores
+# about a third of an in-budget price.
+BUDGET_FALLOFF = 0.25
+
+
+def style_tags(style: str) -> List[str]:
+    tags: List[str] = []
+    for token in tokenize(style):
+        tags.extend(STYLE_TAGS.get(token, [token]))
+    return list(dict.fromkeys(tags))
+
+
+def budget_score(price: np.ndarray, budget: Sequence[float]) -> np.ndarray:
+    if not budget:
+        return np.ones_like(price)
+    low, high = min(budget[0], budget[-1]), max(budget[0], budget[-1])
+    below = np.maximum(low - price, 0.0) / max(low, 1.0)
+    above = np.maximum(price - high, 0.0) / max(high, 1.0)
+    score = np.exp(-(below + above) / BUDGET_FALLOFF)
+    return np.nan_to_num(score, nan=0.0)
+
+
+def score_quiz(
+    snapshot: CatalogSnapshot,
+    occasion: Optional[str],
+    budget: Sequence[float],
+    style: Optional[str],
+    metal: Optional[str],
+) -> np.ndarray:
+    score = WEIGHTS["budget"] * budget_score(snapshot.price, budget)
+    if occasion:
+        score += WEIGHTS["occasion"] * snapshot.contains("occasion", occasion)
+    if metal:
+        code = snapshot.vocab["metal"].get(metal, -2)
+        score += WEIGHTS["metal"] * (snapshot.codes["metal"] == code)
+    tags = style_tags(style or "")
+    if tags:
+        overlap = np.zeros(snapshot.size, dtype=np.float64)
+        for tag in tags:
+            overlap += snapshot.contains("tags", tag)
+        # Two matching style tags count as a full style match.
+        score += WEIGHTS["style"] * np.minimum(overlap, 2.0) / 2.0
+    score += WEIGHTS["rating"] * np.nan_to_num(snapshot.rating, nan=0.0) / 5.0
+    return score
+
+
+def recommend(
+    snapshot: CatalogSnapshot,
+    occasion: Optional[str],
+    budget: Sequence[float],
+    style: Optional[str],
+    metal: Optional[str],
+    limit: int = 12,
+) -> List[Dict[str, Any]]:
+    """Top ``limit`` products by quiz score; always full unless the catalog is smaller."""
+    if snapshot.size == 0:
+        return []
+    score = score_quiz(snapshot, occasion, budget, style, metal)
+    limit = min(limit, snapshot.size)
+    top = np.argpartition(-score, limit - 1)[:limit]
+    # Ties break on the featured order so equal scores stay deterministic.
+    top = top[np.lexsort((snapshot.ranks["featured"][top], -score[top]))]
+    return [snapshot.docs[i] for i in top]
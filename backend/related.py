@@ -0,0 +1,182 @@
+"""Precomputed related-products neighbour table.
+
+Every product's top-K neighbours are computed from a weighted similarity over
+tags, occasion, category, metal, purity and price proximity. Scores are
+computed in row blocks of a catalog x catalog matrix, so the batch stays
+vectorized without materializing the whole matrix. When products change, only
+the rows that can be affected are recomputed, in a worker thread when the
+catalog engine reloads. Serving is a dictionary lookup.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+WEIGHTS = {
+    "tags": 0.3,
+    "occasion": 0.15,
+    "category": 0.3,
+    "metal": 0.1,
+    "purity": 0.05,
+    "price": 0.1,
+}
+# Price similarity halves for every doubling of the price ratio.
+BLOCK_SIZE = 512
+# Above this share of changed products a full rebuild is cheaper than patching.
+FULL_REBUILD_RATIO = 0.1
+
+
+def _multi_hot(values: Sequence[Sequence[str]]) -> np.ndarray:
+    vocab: Dict[str, int] = {}
+    for items in values:
+        for item in items:
+            vocab.setdefault(item, len(vocab))
+    matrix = np.zeros((len(values), max(1, len(vocab))), dtype=np.float32)
+    for i, items in enumerate(values):
+        for item in items:
+            matrix[i, vocab[item]] = 1.0
+    return matrix
+
+
+def _one_hot(values: Sequence[Optional[str]]) -> np.ndarray:
+    return _multi_hot([[] if v is None else [v] for v in values])
+
+
+class _Features:
+    def __init__(self, docs: List[Dict[str, Any]]):
+        self.tags = _multi_hot([doc.get("tags") or [] for doc in docs])
+        self.occasion = _multi_hot([doc.get("occasion") or [] for doc in docs])
+        self.tag_counts = self.tags.sum(axis=1)
+        self.occasion_counts = self.occasion.sum(axis=1)
+        # Exact-match fields collapse into one weighted one-hot matrix, so their
+        # combined score is a single matrix product.
+        self.exact = np.hstack([_one_hot([doc.get(field) for doc in docs]) for field in ("category", "metal", "purity")])
+        self.exact_weighted = np.hstack([
+            WEIGHTS[field] * _one_hot([doc.get(field) for doc in docs])
+            for field in ("category", "metal", "purity")
+        ])
+        # 2^-|log2(1 + a) - log2(1 + b)| == min((1 + a) / (1 + b), (1 + b) / (1 + a)),
+        # which turns the price term into two outer products instead of n^2 powers.
+        prices = np.array([doc.get("price") or 0.0 for doc in docs], dtype=np.float64)
+        shifted = 1.0 + np.maximum(prices, 0.0)
+        self.price_up = shifted.astype(np.float32)
+        self.price_down = (1.0 / shifted).astype(np.float32)
+
+    @staticmethod
+    def _jaccard(matrix: np.ndarray, counts: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        inter = matrix[rows] @ matrix[cols].T
+        union = counts[rows][:, None] + counts[cols][None, :] - inter
+        return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+    def similarity(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        score = self.exact_weighted[rows] @ self.exact[cols].T
+        score += WEIGHTS["tags"] * self._jaccard(self.tags, self.tag_counts, rows, cols)
+        score += WEIGHTS["occasion"] * self._jaccard(self.occasion, self.occasion_counts, rows, cols)
+        price = np.minimum(
+            np.outer(self.price_up[rows], self.price_down[cols]),
+            np.outer(self.price_down[rows], self.price_up[cols]),
+        )
+        score += WEIGHTS["price"] * price
+        return score
+
+
+class RelatedIndex:
+    """Top-K neighbour table maintained from catalog change notifications."""
+
+    def __init__(self, k: int = 8):
+        self.k = k
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._neighbours: Dict[str, List[str]] = {}
+        self._scores: Dict[str, List[float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._neighbours)
+
+    def neighbours(self, product_id: str) -> Optional[List[str]]:
+        return self._neighbours.get(product_id)
+
+    def apply(self, upserted: Iterable[Dict[str, Any]], removed: Iterable[str]) -> None:
+        """Catalog engine listener: patch the rows a change can affect."""
+        self.prepare(upserted, removed)()
+
+    def prepare(self, upserted: Iterable[Dict[str, Any]], removed: Iterable[str]) -> Callable[[], None]:
+        """Compute the patched table without touching the served one.
+
+        Safe to run in a worker thread; returns the callable that swaps it in.
+        """
+        upserted = [doc for doc in upserted if doc.get("id") is not None]
+        removed = list(removed)
+        had_table = bool(self._neighbours)
+        docs = dict(self._docs)
+        for doc_id in removed:
+            docs.pop(doc_id, None)
+        for doc in upserted:
+            docs[doc["id"]] = doc
+
+        ids = sorted(docs)
+        position = {doc_id: i for i, doc_id in enumerate(ids)}
+        features = _Features([docs[doc_id] for doc_id in ids])
+        changed = {doc["id"] for doc in upserted} | set(removed)
+
+        def swap() -> None:
+            self._docs, self._neighbours, self._scores = docs, neighbours, scores
+
+        if not had_table or len(changed) > FULL_REBUILD_RATIO * max(1, len(ids)):
+            neighbours, scores = {}, {}
+            self._compute_rows(features, ids, np.arange(len(ids)), neighbours, scores)
+            return swap
+
+        neighbours = {doc_id: self._neighbours[doc_id] for doc_id in ids if doc_id in self._neighbours}
+        scores = {doc_id: self._scores[doc_id] for doc_id in neighbours}
+        # A row must be recomputed if it is new or changed, or if it currently
+        # lists a changed product whose score may have dropped.
+        dirty = {
+            doc_id for doc_id in ids
+            if doc_id in changed or doc_id not in neighbours or changed.intersection(neighbours[doc_id])
+        }
+        clean = np.array([position[doc_id] for doc_id in ids if doc_id not in dirty], dtype=np.int64)
+        moved = np.array([position[doc["id"]] for doc in upserted], dtype=np.int64)
+        if clean.size and moved.size:
+            # Clean rows can only gain a changed product as a new neighbour.
+            gains = features.similarity(clean, moved)
+            for r, row in enumerate(clean):
+                row_id = ids[row]
+                pairs = list(zip(scores[row_id], neighbours[row_id]))
+                pairs += [(float(gains[r, c]), ids[col]) for c, col in enumerate(moved)]
+                pairs.sort(key=lambda pair: (-pair[0], pair[1]))
+                neighbours[row_id] = [doc_id for _, doc_id in pairs[:self.k]]
+                scores[row_id] = [score for score, _ in pairs[:self.k]]
+        rows = np.array(sorted(position[doc_id] for doc_id in dirty), dtype=np.int64)
+        self._compute_rows(features, ids, rows, neighbours, scores)
+        return swap
+
+    def _compute_rows(
+        self,
+        features: _Features,
+        ids: List[str],
+        rows: np.ndarray,
+        neighbours: Dict[str, List[str]],
+        scores: Dict[str, List[float]],
+    ) -> None:
+        n = len(ids)
+        if n == 0 or rows.size == 0:
+            return
+        cols = np.arange(n)
+        id_rank = np.arange(n)  # ids are sorted, so position doubles as the id tiebreak
+        k = min(self.k, n - 1)
+        for start in range(0, rows.size, BLOCK_SIZE):
+            block = rows[start:start + BLOCK_SIZE]
+            sim = features.similarity(block, cols)
+            sim[np.arange(block.size), block] = -np.inf
+            if k <= 0:
+                top = np.empty((block.size, 0), dtype=np.int64)
+            elif k < n - 1:
+                top = np.argpartition(-sim, k, axis=1)[:, :k + 1]
+            else:
+                top = np.tile(cols, (block.size, 1))
+            candidate_scores = np.take_along_axis(sim, top, axis=1)
+            order = np.lexsort((id_rank[top], -candidate_scores), axis=-1)
+            ranked = np.take_along_axis(top, order, axis=1)
+            for r, row in enumerate(block):
+                best = ranked[r][ranked[r] != row][:k]
+                neighbours[ids[row]] = [ids[c] for c in best]
+                scores[ids[row]] = sim[r, best].tolist()
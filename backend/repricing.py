@@ -0,0 +1,163 @@
+"""Bulk repricing from a metal-rate table.
+
+A rate table maps each metal to a per-gram rate for the pure metal, scaled by
+the product's purity, or to explicit per-purity rates::
+
+    {"Gold": 7200, "Silver": {"925": 88, "999": 95}}
+
+The whole catalog is repriced in one vectorized pass:
+``metalCost = grossWeight x rate``, GST on metal + stone + making charges, and
+``price`` as the sum. The storefront must never show a mix of old and new
+prices, yet one transaction over a large catalog can outgrow Mongo's
+transaction limits. So the live collection is copied server-side to a staging
+collection, only products whose numbers change are updated there in
+``bulk_write`` batches, and the staging collection is renamed over
+``products`` in one step. A run that fails leaves the live catalog untouched
+and is simply run again. Products written while a run is in progress are
+overwritten by the swap, so run it after a catalog sync, not during one.
+"""
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from cache import bump_catalog_version
+from catalog_sync import promote_staging
+
+logger = logging.getLogger(__name__)
+
+GST_RATE = 0.03
+
+RateTable = Dict[str, Union[float, Dict[str, float]]]
+
+_PROJECTION = {"_id": 0, "id": 1, "metal": 1, "purity": 1, "grossWeight": 1, "price": 1, "priceBreakup": 1}
+
+
+def purity_fraction(purity: str) -> Optional[float]:
+    """``"22K"`` -> 22/24, ``"925"`` -> 0.925; ``None`` if unrecognised."""
+    value = (purity or "").strip().upper()
+    try:
+        if value.endswith("K"):
+            return float(value[:-1]) / 24.0
+        return float(value) / 1000.0
+    except ValueError:
+        return None
+
+
+def resolve_rate(table: RateTable, metal: str, purity: str) -> Optional[float]:
+    rates = table.get(metal)
+    if isinstance(rates, dict):
+        rate = rates.get(purity)
+        return None if rate is None else float(rate)
+    if rates is None:
+        return None
+    fraction = purity_fraction(purity)
+    return None if fraction is None else float(rates) * fraction
+
+
+@dataclass
+class RepriceReport:
+    products: int = 0
+    changed: int = 0
+    skipped: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+
+def compute_prices(
+    docs: List[Dict[str, Any]], table: RateTable, gst_rate: float = GST_RATE
+) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """Return priceable and changed row masks and the new metalCost/gst/price columns."""
+    rate_cache: Dict[Tuple[str, str], float] = {}
+    rates = np.empty(len(docs), dtype=np.float64)
+    for i, doc in enumerate(docs):
+        key = (doc.get("metal"), doc.get("purity"))
+        if key not in rate_cache:
+            rate = resolve_rate(table, *key)
+            rate_cache[key] = np.nan if rate is None else rate
+        rates[i] = rate_cache[key]
+
+    def column(values) -> np.ndarray:
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+    breakups = [doc.get("priceBreakup") or {} for doc in docs]
+    weight = column(doc.get("grossWeight") for doc in docs)
+    stone = np.nan_to_num(column(b.get("stoneCost") for b in breakups))
+    making = np.nan_to_num(column(b.get("makingCharges") for b in breakups))
+    metal_cost = np.round(weight * rates)
+    gst = np.round(gst_rate * (metal_cost + stone + making))
+    price = metal_cost + stone + making + gst
+
+    priceable = np.isfinite(metal_cost) & np.array([bool(b) for b in breakups])
+    changed = priceable & (
+        (metal_cost != column(b.get("metalCost") for b in breakups))
+        | (gst != column(b.get("gst") for b in breakups))
+        | (price != column(doc.get("price") for doc in docs))
+    )
+    return priceable, changed, {"metalCost": metal_cost, "gst": gst, "price": price}
+
+
+def _plan(docs: List[Dict[str, Any]], table: RateTable, gst_rate: float) -> Tuple[RepriceReport, List[UpdateOne]]:
+    priceable, changed, columns = compute_prices(docs, table, gst_rate)
+    report = RepriceReport(
+        products=len(docs),
+        changed=int(changed.sum()),
+        skipped=[doc["id"] for doc, ok in zip(docs, priceable) if not ok],
+    )
+    now = datetime.now(timezone.utc)
+    updates = [
+        UpdateOne({"id": docs[i]["id"]}, {"$set": {
+            "price": float(columns["price"][i]),
+            "priceBreakup.metalCost": float(columns["metalCost"][i]),
+            "priceBreakup.gst": float(columns["gst"][i]),
+            "updatedAt": now,
+        }})
+        for i in np.flatnonzero(changed)
+    ]
+    return report, updates
+
+
+async def reprice_catalog(
+    db,
+    table: RateTable,
+    gst_rate: float = GST_RATE,
+    batch_size: int = 1000,
+    dry_run: bool = False,
+) -> RepriceReport:
+    started = time.perf_counter()
+    docs = await db.products.find({}, _PROJECTION).to_list(None)
+    report, updates = _plan(docs, table, gst_rate)
+    if dry_run or not updates:
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    staging_name = f"products_reprice_{int(time.time())}"
+    staging = db[staging_name]
+    try:
+        # Price the copy itself, so the swap installs exactly what was priced
+        await db.products.aggregate([{"$out": staging_name}]).to_list(None)
+        docs = await staging.find({}, _PROJECTION).to_list(None)
+        report, updates = _plan(docs, table, gst_rate)
+        if updates:
+            for start in range(0, len(updates), batch_size):
+                await staging.bulk_write(updates[start:start + batch_size], ordered=False)
+            await promote_staging(db.client, db, staging_name)
+    except BaseException:
+        await staging.drop()
+        raise
+    if not updates:
+        await staging.drop()
+        report.elapsed = time.perf_counter() - started
+        return report
+    try:
+        await bump_catalog_version(db)
+    except PyMongoError as exc:
+        # The prices are live; workers' change streams still reload the catalog
+        logger.warning("Repriced catalog is live but the catalog version bump failed: %s", exc)
+
+    report.elapsed = time.perf_counter() - started
+    return report
@@ -0,0 +1,193 @@
+"""Workload-aware read routing.
+
+Catalog, category and store reads tolerate a little lag, so by default they go
+to secondaries (``secondaryPreferred``) with a bounded ``maxStalenessSeconds``
+and keep the primary free for cart and order writes. A shopper's own data
+(cart, wishlist, orders) is read in a causally consistent session. Every
+response from those routes carries the session's operation time in the
+``X-Causal-Token`` header, signed with ``CAUSAL_TOKEN_SECRET``. A request that
+sends the token back has its reads wait (``afterClusterTime``) until the member
+serving them has caught up, so a shopper always sees their own writes wherever
+the read is routed. A request without a valid token reads from the primary.
+
+Route names are dotted (``products.list``, ``orders``). A name without its own
+mode falls back to its first segment, then to the primary, and
+``READ_PREFERENCES`` overrides any of them, e.g.
+``products.export=secondary,orders=primary``.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import logging
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Optional
+
+import bson
+from bson import Timestamp
+from bson.errors import BSONError
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+
+logger = logging.getLogger(__name__)
+
+CAUSAL_HEADER = "X-Causal-Token"
+
+DEFAULT_ROUTES: Dict[str, str] = {
+    "products": "secondaryPreferred",
+    "search": "secondaryPreferred",
+    "quiz": "secondaryPreferred",
+    "categories": "secondaryPreferred",
+    "stores": "secondaryPreferred",
+    "cart": "secondaryPreferred",
+    "wishlist": "secondaryPreferred",
+    "orders": "secondaryPreferred",
+}
+
+_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def parse_read_preferences(spec: str) -> Dict[str, str]:
+    """``route=mode`` pairs, comma separated; raises ``ValueError`` for unknown modes."""
+    routes = {}
+    for pair in spec.split(","):
+        if not pair.strip():
+            continue
+        route, _, mode = pair.partition("=")
+        if mode.strip() not in _MODES:
+            raise ValueError(f"Unknown read preference {mode.strip()!r} for {route.strip()!r}")
+        routes[route.strip()] = mode.strip()
+    return routes
+
+
+def read_preference(mode: str, max_staleness: int = -1):
+    if mode == "primary":
+        return Primary()
+    # Mongo accepts maxStalenessSeconds of 90 or more, or -1 for no bound
+    return _MODES[mode](max_staleness=max_staleness)
+
+
+class ReadRouter:
+    def __init__(
+        self,
+        client,
+        db_name: str,
+        routes: Optional[Dict[str, str]] = None,
+        max_staleness: int = 90,
+        secret: Optional[bytes] = None,
+    ):
+        self.client = client
+        self.db_name = db_name
+        self.routes = {**DEFAULT_ROUTES, **(routes or {})}
+        self.max_staleness = max_staleness
+        if secret is None:
+            # Tokens then only verify in this process; other workers read
+            # such requests from the primary.
+            logger.warning("CAUSAL_TOKEN_SECRET is not set; causal tokens are signed with a per-process key")
+            secret = os.urandom(32)
+        self.secret = secret
+        self._databases: Dict[str, Any] = {}
+        # Highest cluster time this process has seen, from shopper sessions
+        self._cluster_time: Optional[Timestamp] = None
+
+    def mode(self, route: str) -> str:
+        return self.routes.get(route) or self.routes.get(route.split(".")[0]) or "primary"
+
+    def database(self, route: str):
+        """Database handle whose reads follow ``route``'s read preference."""
+        return self._database(self.mode(route))
+
+    def primary(self):
+        """Database handle that always reads from the primary."""
+        return self._database("primary")
+
+    def _database(self, mode: str):
+        db = self._databases.get(mode)
+        if db is None:
+            db = self._databases[mode] = self.client.get_database(
+                self.db_name, read_preference=read_preference(mode, self.max_staleness)
+            )
+        return db
+
+    def issue_token(self, session) -> Optional[str]:
+        """Signed token carrying the session's operation time."""
+        if session.cluster_time is not None:
+            seen = session.cluster_time["clusterTime"]
+            if self._cluster_time is None or seen > self._cluster_time:
+                self._cluster_time = seen
+        if session.operation_time is None:
+            return None
+        return sign_causal_token(session.operation_time, self.secret)
+
+    def resume_time(self, token: Optional[str]) -> Optional[Timestamp]:
+        """The operation time to read after, or ``None`` to read from the primary.
+
+        Tokens that fail the signature check, or carry a time ahead of the
+        cluster time this process has seen, are ignored; waiting on them
+        could hold a read until the request deadline.
+        """
+        operation_time = verify_causal_token(token, self.secret)
+        if operation_time is None or self._cluster_time is None or operation_time > self._cluster_time:
+            return None
+        return operation_time
+
+
+def sign_causal_token(operation_time: Timestamp, secret: bytes) -> str:
+    payload = base64.urlsafe_b64encode(bson.encode({"operationTime": operation_time})).rstrip(b"=")
+    signature = base64.urlsafe_b64encode(hmac.new(secret, payload, hashlib.sha256).digest()).rstrip(b"=")
+    return (payload + b"." + signature).decode("ascii")
+
+
+def verify_causal_token(token: Optional[str], secret: bytes) -> Optional[Timestamp]:
+    """The token's operation time, or ``None`` if it is missing, malformed or forged."""
+    if not token:
+        return None
+    try:
+        payload, _, signature = token.encode("ascii").partition(b".")
+        expected = base64.urlsafe_b64encode(hmac.new(secret, payload, hashlib.sha256).digest()).rstrip(b"=")
+        if not hmac.compare_digest(signature, expected):
+            return None
+        times = bson.decode(base64.urlsafe_b64decode(payload + b"=" * (-len(payload) % 4)))
+    except (BSONError, binascii.Error, ValueError, UnicodeEncodeError):
+        return None
+    operation_time = times.get("operationTime")
+    return operation_time if isinstance(operation_time, Timestamp) else None
+
+
+@dataclass
+class UserSession:
+    """A causally consistent session plus the database its reads should use."""
+    session: Any
+    db: Any
+    router: ReadRouter
+
+    @property
+    def token(self) -> Optional[str]:
+        return self.router.issue_token(self.session)
+
+
+@asynccontextmanager
+async def user_session(router: ReadRouter, route: str, token: Optional[str]) -> AsyncIterator[UserSession]:
+    """Causally consistent session, resumed from ``token`` when the client sent a valid one."""
+    async with await router.client.start_session(causal_consistency=True) as session:
+        operation_time = router.resume_time(token)
+        if operation_time is None:
+            yield UserSession(session, router.primary(), router)
+            return
+        # Only the operation time is taken from the client: it becomes the
+        # reads' afterClusterTime. Cluster time is never gossiped from a token.
+        session.advance_operation_time(operation_time)
+        yield UserSession(session, router.database(route), router)
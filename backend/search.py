@@ -0,0 +1,176 @@
+"""Inverted-index full-text search over the product catalog.
+
+Documents are tokenized per field into a normalized inverted index and ranked
+with BM25F-style scoring, so a search never scans the collection. The index is
+maintained incrementally from the catalog engine's change notifications.
+"""
+import math
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+FIELD_BOOSTS = {
+    "name": 3.0,
+    "sku": 4.0,
+    "category": 2.0,
+    "tags": 2.0,
+    "occasion": 1.5,
+    "description": 1.0,
+}
+
+# Prefix expansions (e.g. "neck" -> "necklace") score below exact term hits.
+PREFIX_WEIGHT = 0.5
+MIN_PREFIX_LENGTH = 2
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def literal_pattern(text: str) -> str:
+    """User text as a ``$regex`` that matches it literally, whitespace collapsed."""
+    return re.escape(" ".join(text.split()))
+
+
+def regex_filter(search: str) -> Dict[str, Any]:
+    """Mongo fallback filter used while the in-memory index is cold."""
+    pattern = literal_pattern(search)
+    return {"$or": [
+        {"name": {"$regex": pattern, "$options": "i"}},
+        {"sku": {"$regex": pattern, "$options": "i"}},
+        {"category": {"$regex": pattern, "$options": "i"}},
+        {"tags": {"$in": [search]}}
+    ]}
+
+
+def _field_terms(doc: Dict[str, Any], field: str) -> List[str]:
+    value = doc.get(field)
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        value = " ".join(str(v) for v in value)
+    terms = tokenize(str(value))
+    if field == "sku" and value:
+        # Keep the whole code searchable as one term as well as its parts.
+        whole = "".join(terms)
+        if whole and whole not in terms:
+            terms.append(whole)
+    return terms
+
+
+class SearchIndex:
+    """BM25F inverted index keyed by product id."""
+
+    def __init__(self, boosts: Optional[Dict[str, float]] = None, k1: float = 1.2, b: float = 0.75):
+        self.boosts = boosts or FIELD_BOOSTS
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, Dict[str, int]]] = {field: {} for field in self.boosts}
+        self._lengths: Dict[str, Dict[str, int]] = {field: {} for field in self.boosts}
+        self._length_totals: Dict[str, int] = {field: 0 for field in self.boosts}
+        self._doc_terms: Dict[str, Dict[str, Counter]] = {}
+        self._df: Counter = Counter()
+        self._sorted_terms: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def add(self, doc: Dict[str, Any]) -> None:
+        doc_id = doc.get("id")
+        if doc_id is None:
+            return
+        self.remove(doc_id)
+        per_field: Dict[str, Counter] = {}
+        for field in self.boosts:
+            counts = Counter(_field_terms(doc, field))
+            per_field[field] = counts
+            postings = self._postings[field]
+            for term, tf in counts.items():
+                postings.setdefault(term, {})[doc_id] = tf
+            length = sum(counts.values())
+            self._lengths[field][doc_id] = length
+            self._length_totals[field] += length
+        for term in set().union(*per_field.values()):
+            if self._df[term] == 0:
+                self._sorted_terms = None
+            self._df[term] += 1
+        self._doc_terms[doc_id] = per_field
+
+    def remove(self, doc_id: str) -> None:
+        per_field = self._doc_terms.pop(doc_id, None)
+        if per_field is None:
+            return
+        for field, counts in per_field.items():
+            postings = self._postings[field]
+            for term in counts:
+                docs = postings.get(term)
+                if docs is not None:
+                    docs.pop(doc_id, None)
+                    if not docs:
+                        del postings[term]
+            self._length_totals[field] -= self._lengths[field].pop(doc_id, 0)
+        for term in set().union(*per_field.values()):
+            self._df[term] -= 1
+            if self._df[term] <= 0:
+                del self._df[term]
+                self._sorted_terms = None
+
+    def apply(self, upserted: Iterable[Dict[str, Any]], removed: Iterable[str]) -> None:
+        """Catalog engine listener: index changed products, drop deleted ones."""
+        for doc_id in removed:
+            self.remove(doc_id)
+        for doc in upserted:
+            self.add(doc)
+
+    def _expand(self, token: str) -> List[Tuple[str, float]]:
+        expansions = [(token, 1.0)] if token in self._df else []
+        if len(token) < MIN_PREFIX_LENGTH:
+            return expansions
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._df)
+        terms = self._sorted_terms
+        i = bisect_left(terms, token)
+        while i < len(terms) and terms[i].startswith(token):
+            if terms[i] != token:
+                expansions.append((terms[i], PREFIX_WEIGHT))
+            i += 1
+        return expansions
+
+    def search(self, query: str) -> List[Tuple[str, float]]:
+        """Return ``(product_id, score)`` pairs matching every query token, best first."""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        n = len(self._doc_terms)
+        scores: Optional[Dict[str, float]] = None
+        for token in tokens:
+            token_scores: Dict[str, float] = {}
+            for term, weight in self._expand(token):
+                df = self._df[term]
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                for field, boost in self.boosts.items():
+                    docs = self._postings[field].get(term)
+                    if not docs:
+                        continue
+                    avg_length = self._length_totals[field] / n or 1.0
+                    lengths = self._lengths[field]
+                    for doc_id, tf in docs.items():
+                        norm = self.k1 * (1 - self.b + self.b * lengths[doc_id] / avg_length)
+                        score = weight * boost * idf * tf * (self.k1 + 1) / (tf + norm)
+                        token_scores[doc_id] = token_scores.get(doc_id, 0.0) + score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {doc_id: scores[doc_id] + s for doc_id, s in token_scores.items() if doc_id in scores}
+            if not scores:
+                return []
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
@@ -0,0 +1,83 @@
+"""Fast JSON responses for trusted catalog documents.
+
+Catalog documents are validated when they are written (see
+``catalog_sync``), so read routes skip Pydantic and ``jsonable_encoder`` and
+return a :class:`FastJSONResponse` directly. Each product is encoded with
+orjson once per version and view: :class:`FragmentCache` keeps the encoded
+bytes next to the document object they were made from. A new catalog
+snapshot carries new document objects, so a changed product is re-encoded on
+its next use. Routes keep their ``response_model`` so the OpenAPI schema is
+unchanged.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+from starlette.responses import Response
+
+from fields import FieldSet, project
+
+
+class RawJSON:
+    """Already-encoded JSON spliced verbatim into a response."""
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+def _default(value: Any) -> Any:
+    return str(value)
+
+
+def dumps(value: Any) -> bytes:
+    """orjson.dumps that splices :class:`RawJSON` values into dicts and lists."""
+    if isinstance(value, RawJSON):
+        return value.data
+    if isinstance(value, dict):
+        return b"{" + b",".join(orjson.dumps(str(key)) + b":" + dumps(item) for key, item in value.items()) + b"}"
+    if isinstance(value, (list, tuple)):
+        return b"[" + b",".join(dumps(item) for item in value) + b"]"
+    return orjson.dumps(value, default=_default)
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class FragmentCache:
+    """Encoded JSON per product and view, reused while the document object is unchanged."""
+
+    def __init__(self):
+        self._fragments: Dict[str, Dict[str, Tuple[Dict[str, Any], RawJSON]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._fragments)
+
+    def encode(self, doc: Dict[str, Any], fieldset: Optional[FieldSet] = None) -> RawJSON:
+        if fieldset is not None and not fieldset.cacheable:
+            return RawJSON(orjson.dumps(project(doc, fieldset), default=_default))
+        doc_id = doc.get("id")
+        view = fieldset.name if fieldset is not None else ""
+        views = self._fragments.get(doc_id)
+        entry = views.get(view) if views is not None else None
+        if entry is not None and entry[0] is doc:
+            return entry[1]
+        fragment = RawJSON(orjson.dumps(project(doc, fieldset), default=_default))
+        if doc_id is not None:
+            if views is None or next(iter(views.values()))[0] is not doc:
+                views = self._fragments[doc_id] = {}
+            views[view] = (doc, fragment)
+        return fragment
+
+    def encode_many(self, docs: Iterable[Dict[str, Any]], fieldset: Optional[FieldSet] = None) -> List[RawJSON]:
+        return [self.encode(doc, fieldset) for doc in docs]
+
+    def apply(self, upserted: Iterable[Dict[str, Any]], removed: Iterable[str]) -> None:
+        """Catalog engine listener: drop fragments of changed and deleted products."""
+        for doc in upserted:
+            self._fragments.pop(doc.get("id"), None)
+        for doc_id in removed:
+            self._fragments.pop(doc_id, None)
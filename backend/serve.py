@@ -0,0 +1,71 @@
+"""Production entrypoint: uvicorn with one worker process per available CPU.
+
+    python serve.py
+
+WEB_CONCURRENCY overrides the worker count, which otherwise follows the CPUs
+this process may use (affinity mask and cgroup CPU quota). Each worker imports
+server:app and opens its own Mongo client and pool in the app lifespan, so
+MONGO_MAX_POOL_SIZE is per worker. On SIGTERM uvicorn stops accepting
+connections and gives in-flight requests GRACEFUL_SHUTDOWN_SECONDS to finish
+before the lifespan shutdown flushes queued writes and closes the client.
+
+With more than one worker, each worker's metrics live in its own process, so
+workers write snapshots to METRICS_MULTIPROC_DIR (a fresh temporary directory
+unless set) and /metrics sums them; the directory is emptied on startup.
+"""
+import math
+import os
+import tempfile
+from pathlib import Path
+
+import uvicorn
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+
+def available_cpus() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    # Containers limited with --cpus expose a quota rather than fewer cores
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+def prepare_metrics_dir() -> str:
+    directory = os.environ.get('METRICS_MULTIPROC_DIR')
+    if not directory:
+        directory = os.environ['METRICS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix="metrics-")
+    os.makedirs(directory, exist_ok=True)
+    # Snapshots left by a previous run would be summed into this one
+    for path in Path(directory).glob("*.json"):
+        path.unlink()
+    return directory
+
+
+def main() -> None:
+    workers = int(os.environ.get('WEB_CONCURRENCY', '0')) or available_cpus()
+    if workers > 1:
+        prepare_metrics_dir()
+    uvicorn.run(
+        "server:app",
+        host=os.environ.get('HOST', '0.0.0.0'),
+        port=int(os.environ.get('PORT', '8000')),
+        workers=workers,
+        timeout_graceful_shutdown=int(os.environ.get('GRACEFUL_SHUTDOWN_SECONDS', '30')),
+        proxy_headers=True,
+        log_level=os.environ.get('LOG_LEVEL', 'info'),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,147 +1,202 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError, PyMongoError
+import asyncio
+from contextlib import asynccontextmanager
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Dict, Any
-import uuid
+from typing import List, Optional, Dict, Any, Literal
 from datetime import datetime, timezone
+from catalog import CatalogEngine, ProductFilters, SORT_OPTIONS
+from admission import AdmissionMiddleware, AdmissionPool, CostGuard, QueryTooExpensive, query_cost_response
+from cache import (
+    CatalogVersion,
+    LRUTier,
+    MemorySharedTier,
+    MongoSharedTier,
+    ResponseCache,
+    ResponseCacheMiddleware,
+    SignatureCache,
+)
+from cart import CartConflict, apply_batch, batch_writes
+from compression import CompressionMiddleware
+from export import FORMATS, stream_export
+from deadlines import TIMEOUT_ERRORS, RequestDeadlineMiddleware, timeout_response
+from facets import mongo_facet_pipeline, parse_mongo_facets, snapshot_facets
+from fields import mongo_projection, resolve_fieldset
+from health import Readiness
+from hydrate import LINE_PRODUCT_FIELDS, cart_summary, expand_lines, fetch_products
+from indexes import reconcile_indexes
+from ingest import IngestPipeline, QueueFull
+from locator import DEFAULT_CENTROIDS, StoreLocator, geo_near_pipeline, load_centroids
+from metrics import CallbackGauge, MetricsMiddleware, MongoCommandListener, MultiProcessMetrics, registry as metrics_registry
+from models import (
+    Appointment,
+    CartBatch,
+    CartItem,
+    ContactForm,
+    ExchangeLead,
+    NewsletterSubscription,
+    Order,
+    Product,
+    QuizResponse,
+    Store,
+    StoreQuery,
+    WishlistItem,
+)
+from orders import (
+    ORDER_SORT,
+    ORDER_VIEWS,
+    decode_order_cursor,
+    encode_order_cursor,
+    order_history_filter,
+    order_item_count,
+)
+from pagination import cursor_after, decode_cursor, encode_cursor, keyset_filter, parse_datetime, Cursor
+from recommend import recommend
+from related import RelatedIndex
+from routing import CAUSAL_HEADER, ReadRouter, parse_read_preferences, user_session
+from search import SearchIndex, literal_pattern, regex_filter
+from serialize import FastJSONResponse, FragmentCache
+from singleflight import SingleFlight, query_key
+from typeahead import TypeaheadIndex
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection; one client per worker process, opened and closed by the
+# app lifespan (connect=False defers the pool and monitor threads until then)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# The command listener times every Mongo command for the metrics endpoint
+client = AsyncIOMotorClient(
+    mongo_url,
+    tz_aware=True,
+    connect=False,
+    maxPoolSize=int(os.environ.get('MONGO_MAX_POOL_SIZE', '50')),
+    minPoolSize=int(os.environ.get('MONGO_MIN_POOL_SIZE', '0')),
+    maxIdleTimeMS=int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '60000')),
+    waitQueueTimeoutMS=int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '2000')),
+    connectTimeoutMS=int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000')),
+    serverSelectionTimeoutMS=int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+    event_listeners=[MongoCommandListener()],
+)
 db = client[os.environ['DB_NAME']]
 
-app = FastAPI()
+# Catalog, store and category reads go to secondaries with bounded staleness;
+# shopper data is read in causally consistent sessions (see routing)
+read_router = ReadRouter(
+    client,
+    os.environ['DB_NAME'],
+    parse_read_preferences(os.environ.get('READ_PREFERENCES', '')),
+    max_staleness=int(os.environ.get('READ_MAX_STALENESS_SECONDS', '90')),
+    secret=os.environ.get('CAUSAL_TOKEN_SECRET', '').encode() or None,
+)
+
+def reads(route: str):
+    """Database handle for a route's reads, following its read preference."""
+    return read_router.database(route)
+
+@asynccontextmanager
+async def shopper_session(route: str, request: Request, response: Response):
+    """Session for a shopper's own data; the response carries the causal token."""
+    async with user_session(read_router, route, request.headers.get(CAUSAL_HEADER)) as user:
+        yield user
+        token = user.token
+        if token:
+            response.headers[CAUSAL_HEADER] = token
+
+# In-memory catalog engine and indexes; reads fall back to Mongo until warm
+search_index = SearchIndex()
+typeahead = TypeaheadIndex()
+related_index = RelatedIndex(k=8)
+fragments = FragmentCache()
+
+# Identical concurrent catalog reads share one in-flight Mongo operation
+flights = SingleFlight()
+metrics_registry.register(CallbackGauge(
+    "singleflight_hot_key_followers",
+    "Requests coalesced onto another request's operation, for the busiest keys.",
+    ("operation", "key"),
+    flights.hot_keys,
+))
+# serve.py points worker processes at a shared directory so /metrics sums them
+metrics_dir = os.environ.get('METRICS_MULTIPROC_DIR')
+shared_metrics = MultiProcessMetrics(
+    metrics_registry, metrics_dir, interval=float(os.environ.get('METRICS_WRITE_SECONDS', '5'))
+) if metrics_dir else None
+listing_totals = SignatureCache(
+    ttl=float(os.environ.get('LISTING_TOTALS_TTL_SECONDS', '30')), flights=flights, name="products.count"
+)
+facet_cache = SignatureCache(
+    ttl=float(os.environ.get('FACET_CACHE_TTL_SECONDS', '300')), flights=flights, name="products.facets"
+)
+
+# Response cache for read-only catalog routes, keyed by the catalog version
+response_cache_ttl = float(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', '300'))
+shared_tiers = {
+    'mongo': lambda: MongoSharedTier(db.response_cache, ttl=response_cache_ttl),
+    'memory': lambda: MemorySharedTier(ttl=response_cache_ttl),
+}
+shared_tier = shared_tiers.get(os.environ.get('RESPONSE_CACHE_SHARED', ''), lambda: None)()
+response_cache = ResponseCache(
+    LRUTier(max_entries=int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '2048')), ttl=response_cache_ttl),
+    shared_tier,
+)
+catalog_version = CatalogVersion(db.catalog_meta)
+CACHED_ROUTES = [
+    r"/api/products",
+    r"/api/products/facets",
+    r"/api/products/related/[^/]+",
+    r"/api/products/(?!export$)[^/]+",
+    r"/api/categories",
+    r"/api/stores",
+]
+
+# Write-behind ingestion for lead and form submissions
+ingest = IngestPipeline(
+    db,
+    max_size=int(os.environ.get('INGEST_QUEUE_SIZE', '10000')),
+    batch_size=int(os.environ.get('INGEST_BATCH_SIZE', '500')),
+    flush_interval=float(os.environ.get('INGEST_FLUSH_SECONDS', '0.5')),
+)
+
+def enqueue(collection: str, doc: Dict[str, Any]) -> None:
+    try:
+        ingest.submit(collection, doc)
+    except QueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="We're receiving a lot of requests, please try again shortly",
+            headers={"Retry-After": "5"}
+        )
+
+catalog = CatalogEngine(
+    refresh_interval=float(os.environ.get('CATALOG_REFRESH_SECONDS', '60')),
+    listeners=[search_index, typeahead, related_index, listing_totals, facet_cache, response_cache, fragments],
+)
+
+store_locator = StoreLocator(load_centroids(Path(os.environ.get('PINCODE_CENTROIDS', DEFAULT_CENTROIDS))))
+
+# Rejects Mongo queries that would examine too many documents (e.g. an
+# unindexed $regex over a large catalog) before they are sent
+cost_guard = CostGuard(max_docs_examined=int(os.environ.get('QUERY_MAX_DOCS_EXAMINED', '10000')))
+
+readiness = Readiness(client, {"catalog": lambda: catalog.warm, "stores": lambda: store_locator.warm})
+
 api_router = APIRouter(prefix="/api")
 
-# Models
-class StoneDetails(BaseModel):
-    type: Optional[str] = None
-    carat: Optional[float] = None
-    clarity: Optional[str] = None
-    color: Optional[str] = None
-
-class Availability(BaseModel):
-    ship: bool = True
-    storePickup: bool = False
-
-class Product(BaseModel):
-    model_config = ConfigDict(extra="ignore")
-    id: str
-    name: str
-    sku: str
-    category: str
-    metal: str
-    purity: str
-    metalColor: str
-    grossWeight: float
-    price: float
-    description: str
-    images: List[str]
-    tags: List[str]
-    occasion: List[str]
-    gender: str
-    stoneDetails: Optional[StoneDetails] = None
-    availability: Availability
-    rating: float
-    reviewCount: int
-    dimensions: Optional[Dict[str, Any]] = None
-    priceBreakup: Optional[Dict[str, float]] = None
-
-class CartItem(BaseModel):
-    model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    productId: str
-    quantity: int = 1
-    size: Optional[str] = None
-    userId: str = "guest"
-
-class WishlistItem(BaseModel):
-    model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    productId: str
-    userId: str = "guest"
-
-class Appointment(BaseModel):
-    model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    name: str
-    phone: str
-    city: str
-    preferredStore: str
-    date: str
-    time: str
-    purpose: str
-    createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-
-class ExchangeLead(BaseModel):
-    model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    name: str
-    phone: str
-    email: str
-    city: str
-    goldType: str
-    approximateWeight: str
-    createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-
-class Store(BaseModel):
-    model_config = ConfigDict(extra="ignore")
-    id: str
-    name: str
-    address: str
-    city: str
-    pincode: str
-    phone: str
-    hours: str
-
-class Order(BaseModel):
-    model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    userId: str = "guest"
-    items: List[Dict[str, Any]]
-    total: float
-    address: Dict[str, str]
-    paymentMethod: str
-    status: str = "pending"
-    createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-
-class QuizResponse(BaseModel):
-    occasion: str
-    budget: List[int]
-    style: str
-    metal: str
-
-class NewsletterSubscription(BaseModel):
-    model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    email: str
-    createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-
-class ContactForm(BaseModel):
-    model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    name: str
-    email: str
-    phone: Optional[str] = None
-    message: str
-    createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-
-class StoreQuery(BaseModel):
-    model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    name: str
-    phone: str
-    pincode: str
-    productId: str
-    createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+# Product fields plus the sync timestamp; the allowed names for ?fields=
+PRODUCT_FIELDS = list(Product.model_fields) + ["updatedAt"]
+
+def requested_fieldset(view: Optional[str], fields: Optional[str]):
+    try:
+        return resolve_fieldset(view, fields, PRODUCT_FIELDS)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 # API Routes
 @api_router.get("/")
@@ -161,102 +216,250 @@ async def get_products(
     maxPrice: Optional[float] = None,
     availability: Optional[str] = None,
     sort: Optional[str] = "featured",
-    search: Optional[str] = None,
+    search: Optional[str] = Query(None, max_length=100),
     page: int = Query(1, ge=1),
-    limit: int = Query(12, ge=1, le=50)
+    limit: int = Query(12, ge=1, le=50),
+    cursor: Optional[str] = None,
+    view: Optional[Literal["card", "detail"]] = None,
+    fields: Optional[str] = None
 ):
-    query = {}
-    
-    if category:
-        query["category"] = category
-    if metal:
-        query["metal"] = metal
-    if purity:
-        query["purity"] = purity
-    if metalColor:
-        query["metalColor"] = metalColor
-    if occasion:
-        query["occasion"] = {"$in": [occasion]}
-    if gender:
-        query["gender"] = gender
-    if minPrice is not None or maxPrice is not None:
-        query["price"] = {}
-        if minPrice is not None:
-            query["price"]["$gte"] = minPrice
-        if maxPrice is not None:
-            query["price"]["$lte"] = maxPrice
-    if availability:
-        if availability == "ship":
-            query["availability.ship"] = True
-        elif availability == "storePickup":
-            query["availability.storePickup"] = True
-    if search:
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"sku": {"$regex": search, "$options": "i"}},
-            {"category": {"$regex": search, "$options": "i"}},
-            {"tags": {"$in": [search]}}
-        ]
+    fieldset = requested_fieldset(view, fields)
+    filters = ProductFilters(
+        category=category,
+        metal=metal,
+        purity=purity,
+        metalColor=metalColor,
+        occasion=occasion,
+        gender=gender,
+        minPrice=minPrice,
+        maxPrice=maxPrice,
+        availability=availability,
+    )
+    sort = sort if sort in SORT_OPTIONS else "featured"
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if after.sort != sort:
+            raise HTTPException(status_code=400, detail="Cursor does not match sort")
+    skip = (page - 1) * limit
+    if after is not None and after.offset is not None:
+        skip = after.offset
     
-    sort_options = {
-        "featured": [("rating", -1)],
-        "newest": [("id", -1)],
-        "price_low": [("price", 1)],
-        "price_high": [("price", -1)]
-    }
+    # Relevance-ranked search pages by offset; every other listing by keyset.
+    relevance = bool(search) and sort == "featured" and catalog.warm
     
-    sort_by = sort_options.get(sort, [("rating", -1)])
+    if catalog.warm:
+        # A keyset cursor seeks instead of skipping
+        keyset = after is not None and after.id is not None and not relevance
+        cost_guard.check_depth("search", 0 if keyset else skip, limit)
+        ranked = search_index.search(search) if search else None
+        products, total = catalog.query(filters, sort, skip, limit, ranked, after)
+    else:
+        query = filters.to_mongo()
+        if search:
+            query.update(regex_filter(search))
+        
+        find_query = query
+        if after is not None and after.id is not None:
+            find_query = {"$and": [query, keyset_filter(after)]}
+            skip = 0
+        
+        await cost_guard.check("search", db.products, find_query, skip, limit)
+        # The cursor needs the sort keys even when the fieldset leaves them out
+        projection = mongo_projection(fieldset, extra=[field for field, _ in SORT_OPTIONS[sort]])
+        products = await flights.do(
+            "products.list",
+            query_key(find_query, projection, SORT_OPTIONS[sort], skip, limit),
+            lambda: reads("products.list").products.find(find_query, projection).sort(SORT_OPTIONS[sort]).skip(skip).limit(limit).to_list(limit)
+        )
+        total = await listing_totals.get(
+            (filters.signature(), search),
+            lambda: reads("products.list").products.count_documents(query)
+        )
     
-    skip = (page - 1) * limit
+    next_cursor = None
+    if len(products) == limit:
+        if relevance:
+            next_cursor = encode_cursor(Cursor(sort=sort, offset=skip + limit))
+        else:
+            next_cursor = encode_cursor(cursor_after(sort, products[-1]))
     
-    products = await db.products.find(query, {"_id": 0}).sort(sort_by).skip(skip).limit(limit).to_list(limit)
-    total = await db.products.count_documents(query)
+    if after is not None:
+        return FastJSONResponse({
+            "products": fragments.encode_many(products, fieldset),
+            "total": total,
+            "limit": limit,
+            "nextCursor": next_cursor
+        })
     
-    return {
-        "products": products,
+    return FastJSONResponse({
+        "products": fragments.encode_many(products, fieldset),
         "total": total,
         "page": page,
         "limit": limit,
-        "pages": (total + limit - 1) // limit
+        "pages": (total + limit - 1) // limit,
+        "nextCursor": next_cursor
+    })
+
+@api_router.get("/products/facets")
+async def get_product_facets(
+    category: Optional[str] = None,
+    metal: Optional[str] = None,
+    purity: Optional[str] = None,
+    metalColor: Optional[str] = None,
+    occasion: Optional[str] = None,
+    gender: Optional[str] = None,
+    minPrice: Optional[float] = None,
+    maxPrice: Optional[float] = None,
+    availability: Optional[str] = None,
+    search: Optional[str] = Query(None, max_length=100)
+):
+    filters = ProductFilters(
+        category=category,
+        metal=metal,
+        purity=purity,
+        metalColor=metalColor,
+        occasion=occasion,
+        gender=gender,
+        minPrice=minPrice,
+        maxPrice=maxPrice,
+        availability=availability,
+    )
+    
+    async def compute():
+        if catalog.warm:
+            ranked = search_index.search(search) if search else None
+            return snapshot_facets(catalog.snapshot, filters, ranked)
+        if search:
+            await cost_guard.check("search", db.products, regex_filter(search))
+        pipeline = mongo_facet_pipeline(filters, regex_filter(search) if search else None)
+        rows = await reads("products.facets").products.aggregate(pipeline).to_list(1)
+        return parse_mongo_facets(rows[0] if rows else {})
+    
+    return await facet_cache.get((filters.signature(), search, catalog.warm), compute)
+
+@api_router.get("/products/batch")
+async def get_products_batch(ids: List[str] = Query(...)):
+    # Accept both ?ids=a,b and ?ids=a&ids=b
+    product_ids = [product_id for value in ids for product_id in value.split(",") if product_id]
+    if len(product_ids) > 100:
+        raise HTTPException(status_code=400, detail="At most 100 ids per request")
+    products = await fetch_products(reads("products.batch").products, catalog, product_ids)
+    return FastJSONResponse(
+        fragments.encode_many(products[product_id] for product_id in dict.fromkeys(product_ids) if product_id in products)
+    )
+
+@api_router.get("/products/export")
+async def export_products(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    fields: Optional[str] = None,
+    since: Optional[str] = None,
+    batch_size: int = Query(500, ge=1, le=5000)
+):
+    if fields:
+        selected = [field for field in fields.split(",") if field]
+        unknown = [field for field in selected if field not in PRODUCT_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        selected = ["id"] + [field for field in dict.fromkeys(selected) if field != "id"]
+    else:
+        selected = PRODUCT_FIELDS
+    try:
+        checkpoint_from = parse_datetime(since) if since else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid since checkpoint")
+    
+    # Taken before the cursor opens, so products updated mid-export are
+    # picked up again by the next incremental run.
+    checkpoint = datetime.now(timezone.utc).isoformat()
+    compress = "gzip" in request.headers.get("accept-encoding", "")
+    headers = {
+        "Content-Disposition": f'attachment; filename="products.{format}"',
+        "X-Export-Checkpoint": checkpoint,
+        "Vary": "Accept-Encoding",
     }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        stream_export(reads("products.export").products, selected, format, checkpoint_from, batch_size, compress),
+        media_type=FORMATS[format],
+        headers=headers,
+    )
 
 @api_router.get("/products/{product_id}", response_model=Product)
 async def get_product(product_id: str):
-    product = await db.products.find_one({"id": product_id}, {"_id": 0})
+    # Catalog documents are validated on write; serve them without re-validating
+    if catalog.warm:
+        snapshot = catalog.snapshot
+        position = snapshot.position.get(product_id)
+        product = snapshot.docs[position] if position is not None else None
+    else:
+        product = await flights.do(
+            "products.detail", product_id, lambda: reads("products.detail").products.find_one({"id": product_id}, {"_id": 0})
+        )
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    return FastJSONResponse(fragments.encode(product))
 
 @api_router.get("/products/related/{product_id}")
-async def get_related_products(product_id: str):
-    product = await db.products.find_one({"id": product_id}, {"_id": 0})
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
+async def get_related_products(
+    product_id: str,
+    view: Optional[Literal["card", "detail"]] = None,
+    fields: Optional[str] = None
+):
+    fieldset = requested_fieldset(view, fields)
+    if catalog.warm:
+        snapshot = catalog.snapshot
+        neighbours = related_index.neighbours(product_id)
+        if neighbours is None or product_id not in snapshot.position:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return FastJSONResponse(fragments.encode_many(
+            (snapshot.docs[snapshot.position[doc_id]] for doc_id in neighbours if doc_id in snapshot.position),
+            fieldset
+        ))
+    
+    async def fetch_related():
+        product = await reads("products.related").products.find_one({"id": product_id}, {"_id": 0, "category": 1, "tags": 1})
+        if not product:
+            return None
+        return await reads("products.related").products.find(
+            {
+                "id": {"$ne": product_id},
+                "$or": [
+                    {"category": product["category"]},
+                    {"tags": {"$in": product.get("tags", [])}}
+                ]
+            },
+            mongo_projection(fieldset)
+        ).limit(8).to_list(8)
     
-    related = await db.products.find(
-        {
-            "id": {"$ne": product_id},
-            "$or": [
-                {"category": product["category"]},
-                {"tags": {"$in": product.get("tags", [])}}
-            ]
-        },
-        {"_id": 0}
-    ).limit(8).to_list(8)
+    related = await flights.do("products.related", (product_id, fieldset), fetch_related)
+    if related is None:
+        raise HTTPException(status_code=404, detail="Product not found")
     
-    return related
+    return FastJSONResponse(fragments.encode_many(related, fieldset))
 
 @api_router.get("/search/suggestions")
-async def search_suggestions(q: str):
+async def search_suggestions(q: str = Query(..., max_length=64)):
     if not q or len(q) < 2:
         return []
     
-    products = await db.products.find(
-        {"$or": [
-            {"name": {"$regex": q, "$options": "i"}},
-            {"sku": {"$regex": q, "$options": "i"}},
-            {"category": {"$regex": q, "$options": "i"}}
-        ]},
+    if catalog.warm:
+        return typeahead.suggest(q, limit=5)
+    
+    pattern = literal_pattern(q)
+    query = {"$or": [
+        {"name": {"$regex": pattern, "$options": "i"}},
+        {"sku": {"$regex": pattern, "$options": "i"}},
+        {"category": {"$regex": pattern, "$options": "i"}}
+    ]}
+    await cost_guard.check("search", db.products, query)
+    products = await reads("search.suggestions").products.find(
+        query,
         {"_id": 0, "name": 1, "category": 1, "id": 1, "images": 1, "price": 1}
     ).limit(5).to_list(5)
     
@@ -264,63 +467,115 @@ async def search_suggestions(q: str):
 
 # Cart
 @api_router.get("/cart")
-async def get_cart(userId: str = "guest"):
-    cart_items = await db.cart.find({"userId": userId}, {"_id": 0}).to_list(100)
+async def get_cart(
+    request: Request,
+    response: Response,
+    userId: str = "guest",
+    expand: Optional[Literal["product"]] = None
+):
+    async with shopper_session("cart", request, response) as user:
+        cart_items = await user.db.cart.find({"userId": userId}, {"_id": 0}, session=user.session).to_list(100)
+    if expand == "product":
+        products = await fetch_products(
+            reads("products.lines").products, catalog, [item["productId"] for item in cart_items], LINE_PRODUCT_FIELDS
+        )
+        return cart_summary(expand_lines(cart_items, products))
     return cart_items
 
 @api_router.post("/cart")
-async def add_to_cart(item: CartItem):
-    existing = await db.cart.find_one({"userId": item.userId, "productId": item.productId, "size": item.size})
+async def add_to_cart(item: CartItem, request: Request, response: Response):
+    key = {"userId": item.userId, "productId": item.productId, "size": item.size}
+    update = {"$inc": {"quantity": item.quantity}, "$setOnInsert": {"id": item.id}}
+    async with shopper_session("cart", request, response) as user:
+        try:
+            result = await db.cart.update_one(key, update, upsert=True, session=user.session)
+        except DuplicateKeyError:
+            # A concurrent request inserted the line first; it exists now.
+            result = await db.cart.update_one(key, {"$inc": {"quantity": item.quantity}}, session=user.session)
     
-    if existing:
-        await db.cart.update_one(
-            {"userId": item.userId, "productId": item.productId, "size": item.size},
-            {"$inc": {"quantity": item.quantity}}
-        )
-        return {"message": "Cart updated"}
-    else:
-        doc = item.model_dump()
-        await db.cart.insert_one(doc)
+    if result.upserted_id is not None:
         return {"message": "Added to cart"}
+    return {"message": "Cart updated"}
+
+@api_router.post("/cart/batch")
+async def batch_update_cart(batch: CartBatch, request: Request, response: Response):
+    try:
+        writes = batch_writes(batch.userId, batch.operations)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    async with shopper_session("cart", request, response) as user:
+        if writes:
+            try:
+                await apply_batch(db.cart, writes, session=user.session)
+            except CartConflict as exc:
+                # The first ``applied`` operations are in; a retry sends the rest
+                raise HTTPException(status_code=409, detail={
+                    "message": "Cart changed concurrently, please retry the remaining operations",
+                    "applied": exc.applied,
+                })
+        
+        # Same session, so this read sees the writes above wherever it is routed
+        cart_items = await user.db.cart.find({"userId": batch.userId}, {"_id": 0}, session=user.session).to_list(100)
+    return cart_items
 
 @api_router.put("/cart/{item_id}")
-async def update_cart_item(item_id: str, quantity: int):
-    result = await db.cart.update_one({"id": item_id}, {"$set": {"quantity": quantity}})
-    if result.modified_count == 0:
+async def update_cart_item(item_id: str, quantity: int, request: Request, response: Response):
+    async with shopper_session("cart", request, response) as user:
+        result = await db.cart.update_one({"id": item_id}, {"$set": {"quantity": quantity}}, session=user.session)
+    if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Item not found")
     return {"message": "Cart updated"}
 
 @api_router.delete("/cart/{item_id}")
-async def remove_from_cart(item_id: str):
-    result = await db.cart.delete_one({"id": item_id})
+async def remove_from_cart(item_id: str, request: Request, response: Response):
+    async with shopper_session("cart", request, response) as user:
+        result = await db.cart.delete_one({"id": item_id}, session=user.session)
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Item not found")
     return {"message": "Item removed"}
 
 @api_router.delete("/cart")
-async def clear_cart(userId: str = "guest"):
-    await db.cart.delete_many({"userId": userId})
+async def clear_cart(request: Request, response: Response, userId: str = "guest"):
+    async with shopper_session("cart", request, response) as user:
+        await db.cart.delete_many({"userId": userId}, session=user.session)
     return {"message": "Cart cleared"}
 
 # Wishlist
 @api_router.get("/wishlist")
-async def get_wishlist(userId: str = "guest"):
-    wishlist = await db.wishlist.find({"userId": userId}, {"_id": 0}).to_list(100)
+async def get_wishlist(
+    request: Request,
+    response: Response,
+    userId: str = "guest",
+    expand: Optional[Literal["product"]] = None
+):
+    async with shopper_session("wishlist", request, response) as user:
+        wishlist = await user.db.wishlist.find({"userId": userId}, {"_id": 0}, session=user.session).to_list(100)
+    if expand == "product":
+        products = await fetch_products(
+            reads("products.lines").products, catalog, [item["productId"] for item in wishlist], LINE_PRODUCT_FIELDS
+        )
+        return expand_lines(wishlist, products)
     return wishlist
 
 @api_router.post("/wishlist")
-async def add_to_wishlist(item: WishlistItem):
-    existing = await db.wishlist.find_one({"userId": item.userId, "productId": item.productId})
-    if existing:
-        return {"message": "Already in wishlist"}
-    
-    doc = item.model_dump()
-    await db.wishlist.insert_one(doc)
+async def add_to_wishlist(item: WishlistItem, request: Request, response: Response):
+    async with shopper_session("wishlist", request, response) as user:
+        # Checked on the primary: this read decides a write
+        existing = await db.wishlist.find_one(
+            {"userId": item.userId, "productId": item.productId}, session=user.session
+        )
+        if existing:
+            return {"message": "Already in wishlist"}
+        
+        doc = item.model_dump()
+        await db.wishlist.insert_one(doc, session=user.session)
     return {"message": "Added to wishlist"}
 
 @api_router.delete("/wishlist/{item_id}")
-async def remove_from_wishlist(item_id: str):
-    result = await db.wishlist.delete_one({"id": item_id})
+async def remove_from_wishlist(item_id: str, request: Request, response: Response):
+    async with shopper_session("wishlist", request, response) as user:
+        result = await db.wishlist.delete_one({"id": item_id}, session=user.session)
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Item not found")
     return {"message": "Item removed"}
@@ -330,7 +585,7 @@ async def remove_from_wishlist(item_id: str):
 async def create_appointment(appointment: Appointment):
     doc = appointment.model_dump()
     doc['createdAt'] = doc['createdAt'].isoformat()
-    await db.appointments.insert_one(doc)
+    enqueue("appointments", doc)
     return {"message": "Appointment booked successfully", "id": appointment.id}
 
 # Exchange Leads
@@ -338,19 +593,45 @@ async def create_appointment(appointment: Appointment):
 async def create_exchange_lead(lead: ExchangeLead):
     doc = lead.model_dump()
     doc['createdAt'] = doc['createdAt'].isoformat()
-    await db.exchange_leads.insert_one(doc)
+    enqueue("exchange_leads", doc)
     return {"message": "Request submitted successfully", "id": lead.id}
 
 # Stores
+async def nearest_stores(origin, limit: int, radius_km: Optional[float] = None) -> List[Dict[str, Any]]:
+    if store_locator.warm:
+        return [
+            {**store, "distanceKm": round(distance, 2)}
+            for store, distance in store_locator.nearest(origin, limit, radius_km)
+        ]
+    stores = await reads("stores").stores.aggregate(geo_near_pipeline(origin, limit, radius_km)).to_list(limit)
+    for store in stores:
+        store["distanceKm"] = round(store["distanceKm"], 2)
+    return stores
+
 @api_router.get("/stores")
-async def get_stores(city: Optional[str] = None, pincode: Optional[str] = None):
+async def get_stores(
+    city: Optional[str] = Query(None, max_length=64),
+    pincode: Optional[str] = Query(None, max_length=16),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lng: Optional[float] = Query(None, ge=-180, le=180),
+    limit: int = Query(5, ge=1, le=50),
+    radius_km: Optional[float] = Query(None, gt=0)
+):
+    # Coordinates or a known pincode return the nearest stores with distances
+    if (lat is None) != (lng is None):
+        raise HTTPException(status_code=400, detail="lat and lng must be given together")
+    origin = (lat, lng) if lat is not None else store_locator.resolve_pincode(pincode) if pincode else None
+    if origin is not None:
+        return await nearest_stores(origin, limit, radius_km)
+    
     query = {}
     if city:
-        query["city"] = {"$regex": city, "$options": "i"}
+        query["city"] = {"$regex": literal_pattern(city), "$options": "i"}
     if pincode:
         query["pincode"] = pincode
     
-    stores = await db.stores.find(query, {"_id": 0}).to_list(100)
+    await cost_guard.check("stores", db.stores, query)
+    stores = await reads("stores").stores.find(query, {"_id": 0, "location": 0}).to_list(100)
     return stores
 
 # Store Queries
@@ -358,28 +639,93 @@ async def get_stores(city: Optional[str] = None, pincode: Optional[str] = None):
 async def create_store_query(query: StoreQuery):
     doc = query.model_dump()
     doc['createdAt'] = doc['createdAt'].isoformat()
-    await db.store_queries.insert_one(doc)
-    return {"message": "We'll contact you soon", "id": query.id}
+    store = None
+    if doc["storeId"] is None:
+        origin = store_locator.resolve_pincode(query.pincode)
+        nearest = await nearest_stores(origin, 1) if origin is not None else []
+        if nearest:
+            store = {"id": nearest[0]["id"], "name": nearest[0]["name"], "distanceKm": nearest[0]["distanceKm"]}
+            doc["storeId"] = store["id"]
+            doc["distanceKm"] = store["distanceKm"]
+    enqueue("store_queries", doc)
+    return {"message": "We'll contact you soon", "id": query.id, "store": store}
 
 # Orders
 @api_router.post("/orders")
-async def create_order(order: Order):
+async def create_order(order: Order, request: Request, response: Response):
+    # createdAt is stored as a BSON date so history queries sort and range on it
     doc = order.model_dump()
-    doc['createdAt'] = doc['createdAt'].isoformat()
-    await db.orders.insert_one(doc)
+    doc["itemCount"] = order_item_count(order.items)
+    async with shopper_session("orders", request, response) as user:
+        await db.orders.insert_one(doc, session=user.session)
     return {"message": "Order placed successfully", "orderId": order.id}
 
 @api_router.get("/orders")
-async def get_orders(userId: str = "guest"):
-    orders = await db.orders.find({"userId": userId}, {"_id": 0}).to_list(100)
-    for order in orders:
-        if isinstance(order.get('createdAt'), str):
-            order['createdAt'] = datetime.fromisoformat(order['createdAt'])
-    return orders
+async def get_orders(
+    request: Request,
+    response: Response,
+    userId: str = "guest",
+    view: Literal["summary", "full"] = "full",
+    status: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    expand: Optional[Literal["product"]] = None
+):
+    if expand == "product" and view != "full":
+        raise HTTPException(status_code=400, detail="expand=product requires view=full")
+    try:
+        since_at = parse_datetime(since) if since else None
+        until_at = parse_datetime(until) if until else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date range")
+    try:
+        after = decode_order_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    query = order_history_filter(
+        userId,
+        [value for value in status.split(",") if value] if status else None,
+        since_at,
+        until_at,
+        after
+    )
+    # Fetch one extra row to learn whether another page exists
+    async with shopper_session("orders", request, response) as user:
+        orders = await user.db.orders.find(
+            query, ORDER_VIEWS[view], session=user.session
+        ).sort(ORDER_SORT).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_order_cursor(orders[limit - 1]) if len(orders) > limit else None
+    orders = orders[:limit]
+    if expand == "product":
+        products = await fetch_products(
+            reads("products.lines").products,
+            catalog,
+            [item.get("productId") for order in orders for item in order.get("items", []) if item.get("productId")],
+            LINE_PRODUCT_FIELDS
+        )
+        for order in orders:
+            order["items"] = expand_lines(order.get("items", []), products)
+    return {
+        "orders": orders,
+        "limit": limit,
+        "nextCursor": next_cursor
+    }
 
 # Quiz
 @api_router.post("/quiz-results")
-async def get_quiz_results(quiz: QuizResponse):
+async def get_quiz_results(
+    quiz: QuizResponse,
+    view: Optional[Literal["card", "detail"]] = None,
+    fields: Optional[str] = None
+):
+    fieldset = requested_fieldset(view, fields)
+    if catalog.warm:
+        products = recommend(catalog.snapshot, quiz.occasion, quiz.budget, quiz.style, quiz.metal, limit=12)
+        return FastJSONResponse(fragments.encode_many(products, fieldset))
+    
     query = {}
     
     if quiz.occasion:
@@ -389,19 +735,25 @@ async def get_quiz_results(quiz: QuizResponse):
     if quiz.metal:
         query["metal"] = quiz.metal
     
-    products = await db.products.find(query, {"_id": 0}).limit(12).to_list(12)
-    return products
+    products = await reads("quiz").products.find(query, mongo_projection(fieldset)).limit(12).to_list(12)
+    return FastJSONResponse(fragments.encode_many(products, fieldset))
 
 # Newsletter
 @api_router.post("/newsletter")
 async def subscribe_newsletter(subscription: NewsletterSubscription):
-    existing = await db.newsletter.find_one({"email": subscription.email})
-    if existing:
-        return {"message": "Already subscribed"}
-    
-    doc = subscription.model_dump()
+    # Written directly rather than queued, so the reply can say whether the
+    # address was new; one upsert against the unique email index decides it
+    doc = subscription.model_dump(exclude={"email"})
     doc['createdAt'] = doc['createdAt'].isoformat()
-    await db.newsletter.insert_one(doc)
+    try:
+        result = await db.newsletter.update_one(
+            {"email": subscription.email}, {"$setOnInsert": doc}, upsert=True
+        )
+    except DuplicateKeyError:
+        # A concurrent request subscribed the same address first
+        return {"message": "Already subscribed"}
+    if result.upserted_id is None:
+        return {"message": "Already subscribed"}
     return {"message": "Subscribed successfully"}
 
 # Contact
@@ -409,31 +761,164 @@ async def subscribe_newsletter(subscription: NewsletterSubscription):
 async def submit_contact(form: ContactForm):
     doc = form.model_dump()
     doc['createdAt'] = doc['createdAt'].isoformat()
-    await db.contact_forms.insert_one(doc)
+    enqueue("contact_forms", doc)
     return {"message": "Message sent successfully", "id": form.id}
 
 # Categories
 @api_router.get("/categories")
 async def get_categories():
-    categories = await db.products.distinct("category")
+    categories = await flights.do("products.categories", None, lambda: reads("categories").products.distinct("category"))
     return categories
 
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+background_tasks: List[asyncio.Task] = []
+
+async def reconcile_startup_indexes():
+    try:
+        report = await reconcile_indexes(db)
+        report.log()
+    except PyMongoError as exc:
+        logger.warning("Index reconciliation failed: %s", exc)
+
+async def reload_catalog():
+    await catalog.reload(db.products)
+    await store_locator.reload(db.stores)
+
+async def watch_catalog_version():
+    """Invalidate caches and reload the catalog whenever the version is bumped."""
+    interval = float(os.environ.get('CATALOG_VERSION_POLL_SECONDS', '5'))
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # Publishing the version only after the reload keeps requests in
+            # between from caching old bodies under the new version's keys
+            if await catalog_version.follow(reload_catalog):
+                logger.info("Catalog version changed to %s", catalog_version.value)
+                response_cache.invalidate()
+        except PyMongoError as exc:
+            logger.warning("Catalog version check failed: %s", exc)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background_tasks.append(asyncio.create_task(reconcile_startup_indexes()))
+    ingest.start()
+    try:
+        await catalog_version.refresh()
+        if isinstance(shared_tier, MongoSharedTier):
+            await shared_tier.ensure_index()
+    except PyMongoError as exc:
+        logger.warning("Catalog cache setup failed: %s", exc)
+    # Until the locator is warm, /stores falls back to the geo index and
+    # /readyz reports not ready
+    background_tasks.append(asyncio.create_task(store_locator.warm_up(db.stores)))
+    background_tasks.append(asyncio.create_task(catalog.run(db.products)))
+    background_tasks.append(asyncio.create_task(watch_catalog_version()))
+    if shared_metrics:
+        background_tasks.append(asyncio.create_task(shared_metrics.run()))
+    yield
+    # Uvicorn has stopped accepting connections and finished in-flight requests
+    readiness.draining = True
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await ingest.drain()
+    client.close()
+    if shared_metrics:
+        shared_metrics.write()
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(api_router)
 
+# Prometheus scrape target; served outside /api so it is not proxied publicly
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    if shared_metrics:
+        body = await asyncio.to_thread(shared_metrics.render)
+    else:
+        body = metrics_registry.render()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+# Orchestrator probes: live while the event loop serves requests, ready once
+# Mongo answers and the in-memory catalog and store locator are loaded
+@app.get("/livez", include_in_schema=False)
+async def get_liveness():
+    return {"status": "live"}
+
+@app.get("/readyz", include_in_schema=False)
+async def get_readiness():
+    ready, checks = await readiness.check()
+    return JSONResponse({"status": "ready" if ready else "unavailable", "checks": checks}, status_code=200 if ready else 503)
+
+for error in TIMEOUT_ERRORS:
+    app.add_exception_handler(error, timeout_response)
+app.add_exception_handler(QueryTooExpensive, query_cost_response)
+
+# Mongo time budget per request; search-as-you-type gets a tight one and
+# long-running exports none
+app.add_middleware(
+    RequestDeadlineMiddleware,
+    default_ms=int(os.environ.get('MONGO_MAX_TIME_MS', '5000')),
+    budgets={
+        r"/api/products/export": 0,
+        r"/api/search/suggestions": int(os.environ.get('MONGO_MAX_TIME_MS_SEARCH', '500')),
+    },
+)
+
+# Per-pool concurrency limits with a bounded queue; cart, checkout and order
+# routes belong to no pool, so search floods cannot queue them
+app.add_middleware(
+    AdmissionMiddleware,
+    pools=[
+        AdmissionPool(
+            "export",
+            routes=(r"/api/products/export",),
+            concurrency=int(os.environ.get('ADMISSION_EXPORT_CONCURRENCY', '2')),
+            queue=0,
+            retry_after=30,
+        ),
+        AdmissionPool(
+            "search",
+            routes=(r"/api/search/suggestions", r"/api/products", r"/api/products/facets", r"/api/stores"),
+            params=("q", "search", "city"),
+            concurrency=int(os.environ.get('ADMISSION_SEARCH_CONCURRENCY', '32')),
+            queue=int(os.environ.get('ADMISSION_SEARCH_QUEUE', '64')),
+        ),
+        AdmissionPool(
+            "catalog",
+            routes=(r"/api/products(/.*)?", r"/api/categories", r"/api/stores", r"/api/quiz-results"),
+            concurrency=int(os.environ.get('ADMISSION_CATALOG_CONCURRENCY', '256')),
+            queue=int(os.environ.get('ADMISSION_CATALOG_QUEUE', '512')),
+        ),
+    ],
+)
+
+app.add_middleware(
+    ResponseCacheMiddleware,
+    cache=response_cache,
+    version=catalog_version,
+    routes=CACHED_ROUTES,
+)
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.environ.get('COMPRESSION_MIN_BYTES', '1024')),
+)
+
+app.add_middleware(
+    MetricsMiddleware,
+    slow_request_seconds=float(os.environ.get('SLOW_REQUEST_SECONDS', '1.0')),
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[CAUSAL_HEADER],
 )
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
@@ -0,0 +1,69 @@
+"""Single-flight coalescing of identical concurrent reads.
+
+The first request for a key runs the Mongo operation as its own task; requests
+for the same key that arrive while it is in flight await that task instead of
+issuing their own. Nothing is kept once the operation finishes, so a request
+never gets a result that was already complete when it arrived. The shared task
+is shielded, so a leader whose client disconnects does not cancel the result
+its followers are waiting for.
+"""
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+from metrics import Counter, registry
+
+FLIGHT_CALLS = registry.register(Counter(
+    "singleflight_calls_total",
+    "Coalescable reads; leaders ran the operation, followers shared a leader's result.",
+    ("operation", "role"),
+))
+# Label values for hot keys are cut to this length.
+MAX_KEY_LABEL = 200
+
+
+def query_key(*parts: Any) -> str:
+    """Canonical JSON of a query's parts, so equal queries get equal keys."""
+    return json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+
+
+class SingleFlight:
+    def __init__(self, max_tracked_keys: int = 1000):
+        self.max_tracked_keys = max_tracked_keys
+        self._inflight: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+        self._followers: Dict[Tuple[str, Hashable], int] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, operation: str, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = (operation, key)
+        task = self._inflight.get(flight)
+        if task is None or task.done():
+            FLIGHT_CALLS.inc(operation, "leader")
+            task = asyncio.ensure_future(fn())
+            self._inflight[flight] = task
+            task.add_done_callback(lambda done: self._land(flight, done))
+        else:
+            FLIGHT_CALLS.inc(operation, "follower")
+            self._count_follower(flight)
+        return await asyncio.shield(task)
+
+    def _land(self, flight: Tuple[str, Hashable], task: asyncio.Future) -> None:
+        if self._inflight.get(flight) is task:
+            del self._inflight[flight]
+        # Mark the exception retrieved; every waiter has already been handed it.
+        if not task.cancelled():
+            task.exception()
+
+    def _count_follower(self, flight: Tuple[str, Hashable]) -> None:
+        self._followers[flight] = self._followers.get(flight, 0) + 1
+        if len(self._followers) > self.max_tracked_keys:
+            # Keep the busiest half so a long tail of one-off keys cannot grow it.
+            ranked = sorted(self._followers.items(), key=lambda item: -item[1])
+            self._followers = dict(ranked[: self.max_tracked_keys // 2])
+
+    def hot_keys(self, n: int = 20) -> List[Tuple[Tuple[str, str], int]]:
+        """The ``n`` keys with the most coalesced followers, as metric samples."""
+        ranked = sorted(self._followers.items(), key=lambda item: -item[1])[:n]
+        return [((operation, str(key)[:MAX_KEY_LABEL]), count) for (operation, key), count in ranked]
@@ -0,0 +1,216 @@
+"""Prefix index for search-as-you-type suggestions.
+
+Terms from product names, SKUs, categories and tags are kept in a sorted list
+so a keystroke resolves to a contiguous prefix range with one bisect. Typos are
+tolerated through a deletion index (edit distance 1) over term prefixes, and
+matches are ranked by popularity, so the top-5 lookup never touches Mongo.
+A few changed products are patched into the index in place; a full build only
+happens on a cold start or a large change, off the event loop.
+"""
+import heapq
+import math
+from bisect import bisect_left, insort
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set
+
+from search import tokenize
+
+SUGGESTION_FIELDS = ("id", "name", "category", "images", "price")
+INDEXED_FIELDS = ("name", "sku", "category", "tags")
+
+# Typo tolerance only kicks in for tokens long enough to make it meaningful.
+MIN_FUZZY_LENGTH = 4
+CACHE_SIZE = 1024
+# Above this share of changed products a fresh build is cheaper than patching.
+FULL_REBUILD_RATIO = 0.1
+
+
+def _deletes(term: str) -> Set[str]:
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _fuzzy_prefixes(term: str) -> List[str]:
+    """Prefixes of ``term`` that typo-tolerant lookups can land on."""
+    return [term[:length] for length in range(MIN_FUZZY_LENGTH - 1, len(term) + 1)]
+
+
+def _terms(doc: Dict[str, Any]) -> FrozenSet[str]:
+    terms: Set[str] = set()
+    for field in INDEXED_FIELDS:
+        value = doc.get(field)
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            value = " ".join(str(v) for v in value)
+        tokens = tokenize(str(value))
+        terms.update(tokens)
+        if field == "sku" and len(tokens) > 1:
+            terms.add("".join(tokens))
+    return frozenset(terms)
+
+
+def popularity(doc: Dict[str, Any]) -> float:
+    return (doc.get("rating") or 0.0) * math.log1p(doc.get("reviewCount") or 0)
+
+
+class TypeaheadIndex:
+    """Sorted-prefix suggestion index, maintained from catalog change notifications."""
+
+    def __init__(self):
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._doc_terms: Dict[str, FrozenSet[str]] = {}
+        self._terms: List[str] = []
+        self._postings: Dict[str, Set[str]] = {}
+        # Number of terms each fuzzy prefix comes from, so a prefix leaves the
+        # deletion index only when its last term goes.
+        self._prefix_counts: Dict[str, int] = {}
+        self._fuzzy: Dict[str, Set[str]] = {}
+        self._suggestions: Dict[str, Dict[str, Any]] = {}
+        self._scores: Dict[str, float] = {}
+        self._cache: Dict[str, FrozenSet[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def apply(self, upserted: Iterable[Dict[str, Any]], removed: Iterable[str]) -> None:
+        """Catalog engine listener."""
+        self.prepare(upserted, removed)()
+
+    def prepare(self, upserted: Iterable[Dict[str, Any]], removed: Iterable[str]) -> Callable[[], None]:
+        """Work out a change without touching the served index; returns the swap.
+
+        A few changed products are patched in place. A cold start or a large
+        change builds a new index here, in the catalog engine's worker thread.
+        """
+        upserted = [doc for doc in upserted if doc.get("id") is not None]
+        removed = list(removed)
+        terms = {doc["id"]: _terms(doc) for doc in upserted}
+        if len(upserted) + len(removed) <= FULL_REBUILD_RATIO * len(self._docs):
+            return lambda: self._patch(upserted, removed, terms)
+        docs = dict(self._docs)
+        for doc_id in removed:
+            docs.pop(doc_id, None)
+        for doc in upserted:
+            docs[doc["id"]] = doc
+        built = TypeaheadIndex()
+        for doc_id, doc in docs.items():
+            built._index(doc, terms[doc_id] if doc_id in terms else self._doc_terms.get(doc_id) or _terms(doc))
+        built._terms = sorted(built._postings)
+        return lambda: self._swap(built)
+
+    def _swap(self, built: "TypeaheadIndex") -> None:
+        self._docs = built._docs
+        self._doc_terms = built._doc_terms
+        self._terms = built._terms
+        self._postings = built._postings
+        self._prefix_counts = built._prefix_counts
+        self._fuzzy = built._fuzzy
+        self._suggestions = built._suggestions
+        self._scores = built._scores
+        self._cache = {}
+
+    def _patch(self, upserted: List[Dict[str, Any]], removed: List[str], terms: Dict[str, FrozenSet[str]]) -> None:
+        for doc_id in removed:
+            self._unindex(doc_id)
+        for doc in upserted:
+            self._unindex(doc["id"])
+            for term in self._index(doc, terms[doc["id"]]):
+                insort(self._terms, term)
+        self._cache = {}
+
+    def _index(self, doc: Dict[str, Any], terms: FrozenSet[str]) -> List[str]:
+        """Add one product; returns the terms that are new to the index."""
+        doc_id = doc["id"]
+        self._docs[doc_id] = doc
+        self._doc_terms[doc_id] = terms
+        self._suggestions[doc_id] = {field: doc[field] for field in SUGGESTION_FIELDS if field in doc}
+        self._scores[doc_id] = popularity(doc)
+        new_terms = []
+        for term in terms:
+            ids = self._postings.get(term)
+            if ids is None:
+                ids = self._postings[term] = set()
+                new_terms.append(term)
+                for prefix in _fuzzy_prefixes(term):
+                    count = self._prefix_counts.get(prefix, 0)
+                    self._prefix_counts[prefix] = count + 1
+                    if not count:
+                        for key in _deletes(prefix) | {prefix}:
+                            self._fuzzy.setdefault(key, set()).add(prefix)
+            ids.add(doc_id)
+        return new_terms
+
+    def _unindex(self, doc_id: str) -> None:
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        del self._docs[doc_id]
+        del self._suggestions[doc_id]
+        del self._scores[doc_id]
+        for term in terms:
+            ids = self._postings[term]
+            ids.discard(doc_id)
+            if ids:
+                continue
+            del self._postings[term]
+            del self._terms[bisect_left(self._terms, term)]
+            for prefix in _fuzzy_prefixes(term):
+                self._prefix_counts[prefix] -= 1
+                if self._prefix_counts[prefix]:
+                    continue
+                del self._prefix_counts[prefix]
+                for key in _deletes(prefix) | {prefix}:
+                    prefixes = self._fuzzy[key]
+                    prefixes.discard(prefix)
+                    if not prefixes:
+                        del self._fuzzy[key]
+
+    def _prefix_ids(self, prefix: str) -> FrozenSet[str]:
+        cached = self._cache.get(prefix)
+        if cached is not None:
+            return cached
+        ids: Set[str] = set()
+        i = bisect_left(self._terms, prefix)
+        while i < len(self._terms) and self._terms[i].startswith(prefix):
+            ids |= self._postings[self._terms[i]]
+            i += 1
+        result = frozenset(ids)
+        if len(self._cache) >= CACHE_SIZE:
+            self._cache.pop(next(iter(self._cache)))
+        self._cache[prefix] = result
+        return result
+
+    def _fuzzy_ids(self, token: str) -> FrozenSet[str]:
+        if len(token) < MIN_FUZZY_LENGTH:
+            return frozenset()
+        prefixes: Set[str] = set()
+        for key in _deletes(token) | {token}:
+            prefixes |= self._fuzzy.get(key, set())
+        ids: Set[str] = set()
+        for prefix in prefixes:
+            ids |= self._prefix_ids(prefix)
+        return frozenset(ids)
+
+    def suggest(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Top ``limit`` products whose terms start with every query token.
+
+        Exact prefix matches rank ahead of typo-tolerant ones; within each
+        tier products are ordered by popularity.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        exact: Optional[FrozenSet[str]] = None
+        loose: Optional[FrozenSet[str]] = None
+        for token in tokens:
+            token_exact = self._prefix_ids(token)
+            token_loose = token_exact | self._fuzzy_ids(token)
+            exact = token_exact if exact is None else exact & token_exact
+            loose = token_loose if loose is None else loose & token_loose
+            if not loose:
+                return []
+        ranked = heapq.nsmallest(
+            limit,
+            loose,
+            key=lambda doc_id: (doc_id not in exact, -self._scores[doc_id], doc_id),
+        )
+        return [self._suggestions[doc_id] for doc_id in ranked]
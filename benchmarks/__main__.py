@@ -0,0 +1,168 @@
+"""Load-test the API and compare against a stored baseline.
+
+    python -m benchmarks                                  # 20k products, default mix
+    python -m benchmarks --catalog-size 100000 --users 64 --duration 60
+    python -m benchmarks --mix write --save-baseline
+    python -m benchmarks --mongo-url mongodb://localhost:27017 --workers 4
+
+Starts a throwaway local mongod (unless --mongo-url is given), seeds it with a
+synthetic catalog scaled up from data/products.json, boots server:app with
+uvicorn and drives the chosen traffic mix. It prints p50/p95/p99 latency and
+throughput per endpoint. Against a baseline recorded with the same settings,
+the run fails if any endpoint's p95 or throughput regresses beyond the
+tolerance or its error rate exceeds 1%.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+import numpy as np
+
+from benchmarks.dataset import ROOT_DIR, seed_catalog
+from benchmarks.standin import LocalMongo, free_port
+from benchmarks.traffic import MIXES, Recorder, run_mix
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+MAX_ERROR_RATE = 0.01
+
+
+def summarize(recorder: Recorder, duration: float) -> Dict[str, Dict[str, float]]:
+    summary = {}
+    for label, samples in sorted(recorder.latencies.items()):
+        latencies = np.array(samples) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        summary[label] = {
+            "count": len(samples),
+            "errors": recorder.errors.get(label, 0),
+            "rps": round(len(samples) / duration, 2),
+            "p50": round(float(p50), 2),
+            "p95": round(float(p95), 2),
+            "p99": round(float(p99), 2),
+        }
+    return summary
+
+
+def print_summary(summary: Dict[str, Dict[str, float]]) -> None:
+    print(f"\n{'endpoint':<22} {'count':>8} {'errors':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for label, row in summary.items():
+        print(f"{label:<22} {row['count']:>8} {row['errors']:>7} {row['rps']:>9.1f} "
+              f"{row['p50']:>9.2f} {row['p95']:>9.2f} {row['p99']:>9.2f}")
+
+
+def compare(summary: Dict[str, Dict[str, float]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    failures = []
+    for label, row in summary.items():
+        if row["errors"] > MAX_ERROR_RATE * row["count"]:
+            failures.append(f"{label}: {row['errors']} errors in {row['count']} requests")
+    for label, expected in baseline["endpoints"].items():
+        row = summary.get(label)
+        if row is None:
+            failures.append(f"{label}: no requests recorded")
+            continue
+        if row["p95"] > expected["p95"] * (1 + tolerance):
+            failures.append(f"{label}: p95 {row['p95']:.2f}ms vs baseline {expected['p95']:.2f}ms")
+        if row["rps"] < expected["rps"] * (1 - tolerance):
+            failures.append(f"{label}: {row['rps']:.1f} req/s vs baseline {expected['rps']:.1f} req/s")
+    return failures
+
+
+@contextlib.contextmanager
+def api_server(mongo_url: str, db_name: str, workers: int):
+    port = free_port()
+    env = {**os.environ, "MONGO_URL": mongo_url, "DB_NAME": db_name, "CORS_ORIGINS": "*"}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT_DIR / "backend",
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"API exited with status {process.returncode}")
+            try:
+                # Ready once Mongo answers and the in-memory catalog is loaded
+                if httpx.get(f"{base_url}/readyz", timeout=2).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("API did not start in time")
+            time.sleep(0.5)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog-size", type=int, default=20000)
+    parser.add_argument("--mix", choices=sorted(MIXES), default="default")
+    parser.add_argument("--users", type=int, default=32, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="recorded seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unrecorded seconds before measuring")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mongo-url", help="use this server instead of a throwaway local mongod")
+    parser.add_argument("--mongod", default="mongod", help="mongod binary for the local stand-in")
+    parser.add_argument("--db-name", default="golden_era_bench")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression vs. baseline")
+    args = parser.parse_args()
+
+    settings = {
+        "catalogSize": args.catalog_size,
+        "mix": args.mix,
+        "users": args.users,
+        "duration": args.duration,
+        "workers": args.workers,
+    }
+    with contextlib.ExitStack() as stack:
+        mongo_url = args.mongo_url or stack.enter_context(LocalMongo(args.mongod)).url
+        print(f"Seeding {args.catalog_size} products into {args.db_name}...")
+        seed_catalog(mongo_url, args.db_name, args.catalog_size, args.seed)
+        base_url = stack.enter_context(api_server(mongo_url, args.db_name, args.workers))
+        print(f"Running the {args.mix} mix with {args.users} users for {args.duration:.0f}s against {base_url}...")
+        recorder = asyncio.run(run_mix(base_url, MIXES[args.mix], args.users, args.duration, args.warmup, args.seed))
+
+    summary = summarize(recorder, args.duration)
+    print_summary(summary)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"settings": settings, "endpoints": summary}, f, indent=2)
+        print(f"\n✓ Saved baseline to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != settings:
+        print(f"\n✗ Baseline was recorded with {baseline.get('settings')}, this run used {settings}")
+        return 1
+    failures = compare(summary, baseline, args.tolerance)
+    for failure in failures:
+        print(f"✗ {failure}")
+    if not failures:
+        print(f"\n✓ Within {args.tolerance:.0%} of baseline")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Synthetic catalog scaled up from ``data/products.json``.
+
+Every synthetic product is a copy of a seed product with a new id and SKU, a
+numbered name and jittered price, weight and rating, so filters, facets,
+search and sorts see realistic value distributions at any catalog size.
+"""
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+from pymongo import MongoClient
+
+ROOT_DIR = Path(__file__).parent.parent
+SEED_FILE = ROOT_DIR / "data" / "products.json"
+
+
+def load_seed() -> List[Dict[str, Any]]:
+    with open(SEED_FILE, "r") as f:
+        return json.load(f)
+
+
+def scaled_products(size: int, seed: int = 1) -> Iterator[Dict[str, Any]]:
+    base = load_seed()
+    rng = random.Random(seed)
+    for i in range(size):
+        product = json.loads(json.dumps(base[i % len(base)]))
+        scale = rng.uniform(0.8, 1.25)
+        product["id"] = f"prod_{i:06d}"
+        product["sku"] = f"{product['sku']}-{i:06d}"
+        if i >= len(base):
+            product["name"] = f"{product['name']} {i // len(base)}"
+        product["price"] = round(product["price"] * scale)
+        product["grossWeight"] = round(product["grossWeight"] * scale, 2)
+        product["rating"] = round(min(5.0, max(1.0, product["rating"] + rng.uniform(-0.6, 0.4))), 1)
+        product["reviewCount"] = rng.randint(0, 400)
+        breakup = product.get("priceBreakup")
+        if breakup:
+            product["priceBreakup"] = {key: round(value * scale) for key, value in breakup.items()}
+        yield product
+
+
+def seed_catalog(mongo_url: str, db_name: str, size: int, seed: int = 1, batch_size: int = 5000) -> None:
+    """Replace the benchmark database with a synthetic catalog and the API's indexes."""
+    sys.path.insert(0, str(ROOT_DIR / "backend"))
+    from indexes import INDEX_SPEC
+
+    client = MongoClient(mongo_url)
+    try:
+        client.drop_database(db_name)
+        db = client[db_name]
+        batch = []
+        for product in scaled_products(size, seed):
+            batch.append(product)
+            if len(batch) >= batch_size:
+                db.products.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            db.products.insert_many(batch, ordered=False)
+        for name, indexes in INDEX_SPEC.items():
+            for index in indexes:
+                db[name].create_index(list(index.keys), name=index.name, unique=index.unique, **index.options)
+        db.catalog_meta.update_one({"_id": "catalog"}, {"$inc": {"version": 1}}, upsert=True)
+    finally:
+        client.close()
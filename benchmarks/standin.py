@@ -0,0 +1,104 @@
+"""Ephemeral local MongoDB for benchmarks.
+
+Starts a throwaway ``mongod`` on a free port with a temporary data directory,
+initiated as a single-node replica set so change streams, transactions and
+read preferences behave as they do in production.
+"""
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalMongo:
+    def __init__(self, binary: str = "mongod", replica_set: str = "rs0", timeout: float = 30.0):
+        self.binary = binary
+        self.replica_set = replica_set
+        self.timeout = timeout
+        self.port = free_port()
+        self._dbpath: Optional[str] = None
+        self._process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"mongodb://127.0.0.1:{self.port}/?replicaSet={self.replica_set}"
+
+    def start(self) -> str:
+        if shutil.which(self.binary) is None:
+            raise RuntimeError(f"{self.binary} not found; install MongoDB or pass --mongo-url")
+        self._dbpath = tempfile.mkdtemp(prefix="bench-mongo-")
+        self._process = subprocess.Popen(
+            [
+                self.binary,
+                "--dbpath", self._dbpath,
+                "--port", str(self.port),
+                "--bind_ip", "127.0.0.1",
+                "--replSet", self.replica_set,
+                "--logpath", str(Path(self._dbpath) / "mongod.log"),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        client = MongoClient("127.0.0.1", self.port, directConnection=True, serverSelectionTimeoutMS=500)
+        try:
+            self._wait(lambda: client.admin.command("ping"))
+            try:
+                client.admin.command("replSetInitiate", {
+                    "_id": self.replica_set,
+                    "members": [{"_id": 0, "host": f"127.0.0.1:{self.port}"}],
+                })
+            except OperationFailure as exc:
+                if exc.code != 23:  # AlreadyInitialized
+                    raise
+            self._wait(lambda: client.admin.command("hello")["isWritablePrimary"] or None)
+        except BaseException:
+            self.stop()
+            raise
+        finally:
+            client.close()
+        return self.url
+
+    def _wait(self, probe) -> None:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"mongod exited with status {self._process.returncode}")
+            try:
+                if probe():
+                    return
+            except PyMongoError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("mongod did not become ready in time")
+            time.sleep(0.2)
+
+    def stop(self) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
+        if self._dbpath is not None:
+            shutil.rmtree(self._dbpath, ignore_errors=True)
+            self._dbpath = None
+
+    def __enter__(self) -> "LocalMongo":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
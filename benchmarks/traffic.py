@@ -0,0 +1,163 @@
+"""Concurrent traffic mixes against a running API.
+
+Each virtual user repeatedly picks a session by the mix weights and runs it
+back to back (a closed workload). Sessions mirror what the storefront does:
+browsing listings and product pages, filtering with facets, search-as-you-type,
+cart edits and checkout. Every request is recorded under a stable endpoint
+label.
+"""
+import asyncio
+import random
+import re
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+import httpx
+
+MIXES: Dict[str, Dict[str, int]] = {
+    "default": {"browse": 40, "filter": 20, "search": 20, "cart": 15, "checkout": 5},
+    "read": {"browse": 50, "filter": 25, "search": 25},
+    "write": {"browse": 20, "cart": 50, "checkout": 30},
+}
+
+SORTS = ["featured", "newest", "price_low", "price_high"]
+
+
+@dataclass
+class Recorder:
+    latencies: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    # Requests started before this monotonic time are warm-up and not recorded.
+    record_from: float = 0.0
+
+    def record(self, label: str, started: float, seconds: float, ok: bool) -> None:
+        if started < self.record_from:
+            return
+        self.latencies[label].append(seconds)
+        if not ok:
+            self.errors[label] += 1
+
+
+@dataclass
+class Context:
+    """Catalog facts sessions draw their parameters from."""
+    product_ids: List[str]
+    categories: List[str]
+    metals: List[str]
+    terms: List[str]
+
+
+class User:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, context: Context, rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.context = context
+        self.rng = rng
+        self.user_id = f"bench-{uuid.uuid4().hex[:12]}"
+
+    async def call(self, label: str, method: str, url: str, **kwargs) -> Any:
+        started = time.monotonic()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        self.recorder.record(label, started, time.monotonic() - started, ok)
+        if ok and response.headers.get("content-type", "").startswith("application/json"):
+            return response.json()
+        return None
+
+    def product(self) -> str:
+        return self.rng.choice(self.context.product_ids)
+
+    async def browse(self) -> None:
+        sort = self.rng.choice(SORTS)
+        for page in range(1, self.rng.randint(1, 3) + 1):
+            await self.call("products.list", "GET", "/api/products", params={"page": page, "limit": 24, "sort": sort})
+        product_id = self.product()
+        await self.call("products.detail", "GET", f"/api/products/{product_id}")
+        await self.call("products.related", "GET", f"/api/products/related/{product_id}")
+
+    async def filter(self) -> None:
+        params = {"category": self.rng.choice(self.context.categories), "limit": 24}
+        if self.rng.random() < 0.5:
+            params["metal"] = self.rng.choice(self.context.metals)
+        if self.rng.random() < 0.5:
+            params["minPrice"], params["maxPrice"] = sorted(self.rng.sample([0, 10000, 25000, 50000, 100000, 200000], 2))
+        await self.call("products.facets", "GET", "/api/products/facets", params=params)
+        await self.call("products.filter", "GET", "/api/products", params=params)
+
+    async def search(self) -> None:
+        term = self.rng.choice(self.context.terms)
+        # One request per keystroke once the prefix is long enough to suggest.
+        for length in range(2, len(term) + 1):
+            await self.call("search.suggestions", "GET", "/api/search/suggestions", params={"q": term[:length]})
+        await self.call("products.search", "GET", "/api/products", params={"search": term, "limit": 24})
+
+    async def cart(self) -> None:
+        for _ in range(self.rng.randint(1, 3)):
+            await self.call("cart.add", "POST", "/api/cart", json={"productId": self.product(), "userId": self.user_id})
+        items = await self.call("cart.get", "GET", "/api/cart", params={"userId": self.user_id, "expand": "product"})
+        lines = (items or {}).get("items", [])
+        if lines:
+            line = self.rng.choice(lines)
+            await self.call("cart.update", "PUT", f"/api/cart/{line['id']}", params={"quantity": self.rng.randint(1, 3)})
+
+    async def checkout(self) -> None:
+        await self.cart()
+        items = await self.call("cart.get", "GET", "/api/cart", params={"userId": self.user_id, "expand": "product"})
+        lines = (items or {}).get("items", [])
+        await self.call("orders.create", "POST", "/api/orders", json={
+            "userId": self.user_id,
+            "items": [{"productId": line["productId"], "quantity": line["quantity"]} for line in lines],
+            "total": (items or {}).get("subtotal", 0),
+            "address": {"line1": "1 Bench Street", "city": "Mumbai", "pincode": "400001"},
+            "paymentMethod": "cod",
+        })
+        await self.call("cart.clear", "DELETE", "/api/cart", params={"userId": self.user_id})
+        await self.call("orders.list", "GET", "/api/orders", params={"userId": self.user_id, "view": "summary"})
+
+
+async def load_context(client: httpx.AsyncClient) -> Context:
+    products = {}
+    for sort in SORTS:
+        listing = (await client.get("/api/products", params={"limit": 50, "sort": sort})).json()
+        products.update((product["id"], product) for product in listing["products"])
+    products = list(products.values())
+    categories = (await client.get("/api/categories")).json()
+    terms = sorted({word.lower() for product in products for word in re.findall(r"[A-Za-z]{4,}", product["name"])})
+    return Context(
+        product_ids=[product["id"] for product in products],
+        categories=categories,
+        metals=sorted({product["metal"] for product in products}),
+        terms=terms,
+    )
+
+
+async def run_mix(
+    base_url: str,
+    mix: Dict[str, int],
+    users: int,
+    duration: float,
+    warmup: float = 5.0,
+    seed: int = 1,
+) -> Recorder:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        context = await load_context(client)
+        sessions = list(mix)
+        weights = [mix[name] for name in sessions]
+        recorder.record_from = time.monotonic() + warmup
+        deadline = recorder.record_from + duration
+
+        async def virtual_user(index: int) -> None:
+            user = User(client, recorder, context, random.Random(seed * 1000 + index))
+            while time.monotonic() < deadline:
+                await getattr(user, user.rng.choices(sessions, weights)[0])()
+
+        await asyncio.gather(*(virtual_user(i) for i in range(users)))
+    return recorder
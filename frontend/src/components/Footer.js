@@ -19,8 +19,12 @@ const Footer = () => {
 
     setIsSubmitting(true);
     try {
-      await api.post('/newsletter', { email });
-      toast.success('Successfully subscribed to our newsletter!');
+      const response = await api.post('/newsletter', { email });
+      if (response.data?.message === 'Already subscribed') {
+        toast.info("You're already subscribed to our newsletter.");
+      } else {
+        toast.success('Successfully subscribed to our newsletter!');
+      }
       setEmail('');
     } catch (error) {
       console.error('Error subscribing to newsletter:', error);
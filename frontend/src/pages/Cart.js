@@ -18,11 +18,10 @@ const Cart = () => {
     }
     try {
       const productIds = cart.map(item => item.productId);
-      const promises = productIds.map(id => api.get(`/products/${id}`));
-      const responses = await Promise.all(promises);
+      const res = await api.get(`/products/batch`, { params: { ids: productIds.join(',') } });
       const productsMap = {};
-      responses.forEach(res => {
-        productsMap[res.data.id] = res.data;
+      res.data.forEach(product => {
+        productsMap[product.id] = product;
       });
       setProducts(productsMap);
       setLoading(false);
@@ -32,7 +32,7 @@ const ProductDetail = () => {
 
   const fetchRelated = useCallback(async () => {
     try {
-      const res = await api.get(`/products/related/${id}`);
+      const res = await api.get(`/products/related/${id}`, { params: { view: 'card' } });
       setRelated(res.data);
     } catch (error) {
       console.error('Error fetching related products:', error);
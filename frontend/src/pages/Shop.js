@@ -45,6 +45,7 @@ const Shop = () => {
       if (filters.minPrice) params.append('minPrice', filters.minPrice);
       if (filters.maxPrice < 1000000) params.append('maxPrice', filters.maxPrice);
       params.append('sort', sort);
+      params.append('view', 'card');
 
       const res = await api.get(`/products?${params}`);
       setProducts(res.data.products || []);
@@ -24,8 +24,10 @@ const Stores = () => {
     setLoading(true);
     setError(null);
     try {
-      const params = search ? `?city=${search}` : '';
-      const res = await api.get(`/stores${params}`);
+      // A 6-digit pincode returns the nearest stores with distances
+      const term = search.trim();
+      const params = /^\d{6}$/.test(term) ? { pincode: term } : term ? { city: term } : {};
+      const res = await api.get('/stores', { params });
       setStores(res.data);
     } catch (err) {
       console.error('Error fetching stores:', err);
@@ -84,6 +86,9 @@ const Stores = () => {
             {stores.map(store => (
               <div key={store.id} className="bg-white p-6 rounded-lg shadow-sm" data-testid={`store-card-${store.id}`}>
                 <h3 className="text-xl font-semibold mb-4">{store.name}</h3>
+                {store.distanceKm !== undefined && (
+                  <p className="text-sm text-[#C9A961] -mt-3 mb-4">{store.distanceKm.toFixed(1)} km away</p>
+                )}
                 <div className="space-y-3 text-gray-600">
                   <div className="flex items-start">
                     <MapPin className="h-5 w-5 mr-2 flex-shrink-0 mt-0.5" />
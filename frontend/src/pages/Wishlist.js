@@ -17,14 +17,9 @@ const Wishlist = () => {
     }
     try {
       const productIds = wishlist.map(item => item.productId);
-      const promises = productIds.map(id =>
-        api.get(`/products/${id}`).catch(err => {
-          console.warn(`Product ${id} not found`);
-          return null;
-        })
-      );
-      const responses = await Promise.all(promises);
-      setProducts(responses.filter(res => res !== null).map(res => res.data));
+      // Missing products are simply left out of the batch response
+      const res = await api.get(`/products/batch`, { params: { ids: productIds.join(',') } });
+      setProducts(res.data);
       setLoading(false);
     } catch (error) {
       console.error('Error fetching wishlist products:', error);
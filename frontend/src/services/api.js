@@ -30,6 +30,11 @@ apiClient.interceptors.request.use(
     if (token) {
       config.headers.Authorization = `Bearer ${token}`;
     }
+    // Lets cart, wishlist and order reads see this shopper's latest writes
+    const causalToken = localStorage.getItem('causalToken');
+    if (causalToken) {
+      config.headers['X-Causal-Token'] = causalToken;
+    }
     return config;
   },
   (error) => {
@@ -39,7 +44,13 @@ apiClient.interceptors.request.use(
 
 // Response interceptor with retry logic
 apiClient.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    const causalToken = response.headers['x-causal-token'];
+    if (causalToken) {
+      localStorage.setItem('causalToken', causalToken);
+    }
+    return response;
+  },
   async (error) => {
     const config = error.config;
 
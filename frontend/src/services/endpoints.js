@@ -13,6 +13,7 @@ export const AUTH_ENDPOINTS = {
 export const PRODUCT_ENDPOINTS = {
   LIST: '/products',
   DETAIL: (id) => `/products/${id}`,
+  BATCH: '/products/batch',
   SEARCH: '/search/suggestions',
 };
 
@@ -23,6 +24,7 @@ export const CART_ENDPOINTS = {
   UPDATE: (itemId) => `/cart/${itemId}`,
   DELETE: (itemId) => `/cart/${itemId}`,
   CLEAR: '/cart/clear',
+  BATCH: '/cart/batch',
 };
 
 // Wishlist
@@ -0,0 +1,61 @@
+"""Reconcile the API's index spec and report query-shape coverage.
+
+    python scripts/check_indexes.py              # reconcile, then explain
+    python scripts/check_indexes.py --no-reconcile --strict
+
+With --strict the command exits non-zero if any query shape still needs a
+collection scan or an in-memory sort.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).parent.parent / 'backend'
+load_dotenv(ROOT_DIR / '.env')
+sys.path.insert(0, str(ROOT_DIR))
+
+from indexes import explain_query_shapes, reconcile_indexes  # noqa: E402
+
+
+async def main(args):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    
+    if args.reconcile:
+        report = await reconcile_indexes(db)
+        print(f"✓ Indexes: {len(report.created)} created, {len(report.present)} present")
+        for name in report.created:
+            print(f"  + {name}")
+        for name in report.extra:
+            print(f"  ? not in spec: {name}")
+        for name in report.conflicts + report.failed:
+            print(f"  ! {name}")
+    
+    results = await explain_query_shapes(db)
+    flagged = 0
+    print(f"\n{'shape':45} {'plan':40} {'keys':>6} {'docs':>6} {'n':>5}")
+    for result in results:
+        problems = [label for label, hit in (("COLLSCAN", result["collscan"]), ("SORT", result["inMemorySort"])) if hit]
+        flagged += bool(problems)
+        marker = "✗" if problems else "✓"
+        plan = " <- ".join(result["stages"])
+        print(
+            f"{marker} {result['shape']:43} {plan[:40]:40} "
+            f"{result['keysExamined'] or 0:>6} {result['docsExamined'] or 0:>6} {result['returned'] or 0:>5}"
+        )
+    
+    client.close()
+    print(f"\n{flagged} of {len(results)} query shapes need a collection scan or in-memory sort")
+    return 1 if args.strict and flagged else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--no-reconcile", dest="reconcile", action="store_false", help="only report, create nothing")
+    parser.add_argument("--strict", action="store_true", help="exit 1 if any shape is flagged")
+    sys.exit(asyncio.run(main(parser.parse_args())))
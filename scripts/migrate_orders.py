@@ -0,0 +1,42 @@
+"""Bring stored orders up to the order-history conventions.
+
+    python scripts/migrate_orders.py
+
+Order history sorts and range-filters on createdAt, which only works when
+every order stores it as a date, and summaries read a stored itemCount.
+Both conversions run server-side as pipeline updates and are safe to re-run.
+"""
+import asyncio
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).parent.parent / 'backend'
+load_dotenv(ROOT_DIR / '.env')
+
+
+async def main():
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    result = await db.orders.update_many(
+        {"createdAt": {"$type": "string"}},
+        [{"$set": {"createdAt": {"$toDate": "$createdAt"}}}],
+    )
+    print(f"✓ Converted createdAt on {result.modified_count} orders")
+
+    result = await db.orders.update_many(
+        {"itemCount": {"$exists": False}},
+        [{"$set": {"itemCount": {"$sum": {
+            "$map": {"input": {"$ifNull": ["$items", []]}, "in": {"$ifNull": ["$$this.quantity", 1]}},
+        }}}}],
+    )
+    print(f"✓ Backfilled itemCount on {result.modified_count} orders")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
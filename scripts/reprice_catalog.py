@@ -0,0 +1,60 @@
+"""Reprice the catalog from a metal-rate table.
+
+    python scripts/reprice_catalog.py rates.json
+    python scripts/reprice_catalog.py rates.json --dry-run
+
+rates.json maps each metal to a per-gram rate for the pure metal (scaled by
+purity) or to per-purity rates, e.g.
+{"Gold": 7200, "Silver": {"925": 88, "999": 95}}. The new prices are written
+to a copy of the catalog that replaces the live collection in one step, and
+API workers pick them up when the catalog version is bumped. A failed run
+changes nothing; run it again.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
+
+ROOT_DIR = Path(__file__).parent.parent / 'backend'
+load_dotenv(ROOT_DIR / '.env')
+sys.path.insert(0, str(ROOT_DIR))
+
+from repricing import GST_RATE, reprice_catalog  # noqa: E402
+
+
+async def main(args):
+    with open(args.rates, 'r') as f:
+        table = json.load(f)
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        report = await reprice_catalog(db, table, args.gst_rate, args.batch_size, args.dry_run)
+    except (PyMongoError, RuntimeError) as exc:
+        print(f"✗ Repricing stopped: {exc}")
+        print("  The live catalog is unchanged; run again to reprice it")
+        sys.exit(1)
+    finally:
+        client.close()
+
+    verb = "would change" if args.dry_run else "changed"
+    print(f"✓ Repriced {report.products} products in {report.elapsed:.2f}s: {report.changed} {verb}")
+    if report.skipped:
+        print(f"  {len(report.skipped)} skipped (no rate or no price breakup): {', '.join(report.skipped[:10])}")
+    if report.changed and not args.dry_run:
+        print("✓ Bumped catalog version")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("rates", type=Path, help="JSON rate table")
+    parser.add_argument("--gst-rate", type=float, default=GST_RATE)
+    parser.add_argument("--batch-size", type=int, default=1000, help="updates per bulk write")
+    parser.add_argument("--dry-run", action="store_true", help="report changes without writing")
+    asyncio.run(main(parser.parse_args()))
@@ -1,32 +1,24 @@
-import json
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
 ROOT_DIR = Path(__file__).parent.parent / 'backend'
 load_dotenv(ROOT_DIR / '.env')
+sys.path.insert(0, str(ROOT_DIR))
 
-mongo_url = os.environ['MONGO_URL']
-db_name = os.environ['DB_NAME']
+from indexes import reconcile_indexes  # noqa: E402
+from locator import geo_point  # noqa: E402
+from sync_catalog import DEFAULT_SOURCE, print_report, validate_product  # noqa: E402
+from cache import bump_catalog_version  # noqa: E402
+from catalog_sync import sync_catalog  # noqa: E402
 
-async def seed_database():
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[db_name]
-    
-    # Load products data
-    products_file = Path(__file__).parent.parent / 'data' / 'products.json'
-    with open(products_file, 'r') as f:
-        products = json.load(f)
-    
-    # Clear existing products
-    await db.products.delete_many({})
-    
-    # Insert products
-    if products:
-        await db.products.insert_many(products)
-        print(f"✓ Inserted {len(products)} products")
+async def seed(db, source=DEFAULT_SOURCE):
+    # Sync products: only changed products are written, missing ones deleted
+    sync_report = await sync_catalog(db, source, validate_product)
+    print_report(sync_report, "Products")
     
     # Seed stores
     stores = [
@@ -36,6 +28,8 @@ async def seed_database():
             "address": "123 Fashion Street, Fort, Mumbai",
             "city": "Mumbai",
             "pincode": "400001",
+            "latitude": 18.934,
+            "longitude": 72.8356,
             "phone": "+91 22 1234 5678",
             "hours": "10:00 AM - 8:00 PM (All days)"
         },
@@ -45,6 +39,8 @@ async def seed_database():
             "address": "45 Connaught Place, New Delhi",
             "city": "Delhi",
             "pincode": "110001",
+            "latitude": 28.6315,
+            "longitude": 77.2167,
             "phone": "+91 11 1234 5678",
             "hours": "10:00 AM - 8:00 PM (All days)"
         },
@@ -54,6 +50,8 @@ async def seed_database():
             "address": "78 MG Road, Bangalore",
             "city": "Bangalore",
             "pincode": "560001",
+            "latitude": 12.9755,
+            "longitude": 77.606,
             "phone": "+91 80 1234 5678",
             "hours": "10:00 AM - 8:00 PM (All days)"
         },
@@ -63,6 +61,8 @@ async def seed_database():
             "address": "12 FC Road, Pune",
             "city": "Pune",
             "pincode": "411004",
+            "latitude": 18.5236,
+            "longitude": 73.8413,
             "phone": "+91 20 1234 5678",
             "hours": "10:00 AM - 8:00 PM (All days)"
         },
@@ -72,25 +72,36 @@ async def seed_database():
             "address": "89 Banjara Hills, Hyderabad",
             "city": "Hyderabad",
             "pincode": "500034",
+            "latitude": 17.4156,
+            "longitude": 78.4347,
             "phone": "+91 40 1234 5678",
             "hours": "10:00 AM - 8:00 PM (All days)"
         }
     ]
     
+    for store in stores:
+        store["location"] = geo_point(store["latitude"], store["longitude"])
+    
     await db.stores.delete_many({})
     await db.stores.insert_many(stores)
     print(f"✓ Inserted {len(stores)} stores")
     
-    # Create indexes
-    await db.products.create_index("category")
-    await db.products.create_index("metal")
-    await db.products.create_index("price")
-    await db.products.create_index("tags")
-    await db.stores.create_index("city")
-    await db.stores.create_index("pincode")
-    print("✓ Created indexes")
+    # Create indexes from the API's declarative spec
+    index_report = await reconcile_indexes(db)
+    print(f"✓ Created {len(index_report.created)} indexes ({len(index_report.present)} already present)")
     
-    client.close()
+    # The product sync bumps the catalog version when products changed; bump it
+    # otherwise too, so API workers reload the stores rewritten above
+    if not sync_report.changed:
+        await bump_catalog_version(db)
+        print("✓ Bumped catalog version")
+
+async def seed_database():
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        await seed(client[os.environ['DB_NAME']])
+    finally:
+        client.close()
     print("\n✅ Database seeded successfully!")
 
 if __name__ == "__main__":
@@ -0,0 +1,75 @@
+"""Sync the product catalog from a JSON array or NDJSON feed.
+
+    python scripts/sync_catalog.py                          # data/products.json
+    python scripts/sync_catalog.py feed.ndjson.gz --keep-missing
+    python scripts/sync_catalog.py feed.json --swap
+
+By default only products whose content changed are written and products
+missing from the feed are deleted. --swap loads the feed into a fresh
+collection and renames it over ``products`` (blue/green full reload).
+Items that fail validation are skipped and reported; the command then exits
+non-zero.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).parent.parent / 'backend'
+load_dotenv(ROOT_DIR / '.env')
+sys.path.insert(0, str(ROOT_DIR))
+
+from catalog_sync import swap_catalog, sync_catalog  # noqa: E402
+from models import Product  # noqa: E402
+
+DEFAULT_SOURCE = Path(__file__).parent.parent / 'data' / 'products.json'
+
+
+def validate_product(item):
+    return Product.model_validate(item).model_dump()
+
+
+def print_report(report, mode):
+    print(f"✓ {mode}: read {report.read} items in {report.elapsed:.2f}s ({report.rate:,.0f} items/s)")
+    print(f"  {report.upserted} written, {report.unchanged} unchanged, "
+          f"{report.deleted} deleted, {report.invalid} invalid")
+    for error in report.errors:
+        print(f"  ! {error}")
+
+
+async def run(source, batch_size=1000, delete_missing=True, swap=False):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        if swap:
+            report = await swap_catalog(client, db, source, validate_product, batch_size)
+        else:
+            report = await sync_catalog(db, source, validate_product, batch_size, delete_missing)
+    finally:
+        client.close()
+    print_report(report, "Swapped" if swap else "Synced")
+    if report.changed:
+        print("✓ Bumped catalog version")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", nargs="?", type=Path, default=DEFAULT_SOURCE,
+                        help="JSON array or NDJSON file, optionally .gz")
+    parser.add_argument("--batch-size", type=int, default=1000, help="operations per bulk write")
+    parser.add_argument("--keep-missing", action="store_true",
+                        help="partial feed: do not delete products missing from it")
+    parser.add_argument("--swap", action="store_true",
+                        help="full reload into a new collection, then rename it over products")
+    args = parser.parse_args()
+    report = asyncio.run(run(args.source, args.batch_size, not args.keep_missing, args.swap))
+    sys.exit(1 if report.invalid else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionMiddleware, AdmissionPool, CostGuard, QueryTooExpensive, _Gate
+
+
+class SizedCollection:
+    def __init__(self, size, name="products"):
+        self.size = size
+        self.name = name
+        self.counts = 0
+
+    async def estimated_document_count(self):
+        self.counts += 1
+        return self.size
+
+
+def test_indexed_queries_are_never_rejected():
+    async def scenario():
+        guard = CostGuard(max_docs_examined=100)
+        collection = SizedCollection(1_000_000)
+        await guard.check("catalog", collection, {"category": "Ring", "price": {"$gte": 10}})
+        await guard.check("catalog", collection, {"$or": [{"price": {"$lt": 5}}, {"price": 5, "id": {"$gt": "a"}}]})
+        return collection.counts
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_unindexed_scans_are_rejected_above_the_limit():
+    async def scenario():
+        guard = CostGuard(max_docs_examined=100)
+        await guard.check("search", SizedCollection(100), {"name": {"$regex": "ring"}})
+        with pytest.raises(QueryTooExpensive) as caught:
+            await guard.check("search", SizedCollection(101, name="big"), {"$or": [{"name": {"$regex": "ring"}}]})
+        return caught.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert error.retry_after == 5
+    assert "limit of 100" in error.detail
+
+
+def test_deep_offset_pages_are_rejected_even_when_indexed():
+    async def scenario():
+        guard = CostGuard(max_docs_examined=100)
+        collection = SizedCollection(1_000_000)
+        await guard.check("search", collection, {"category": "Ring"}, skip=88, limit=12)
+        with pytest.raises(QueryTooExpensive) as caught:
+            await guard.check("search", collection, {"category": "Ring"}, skip=100, limit=12)
+        return caught.value, collection.counts
+
+    error, counts = asyncio.run(scenario())
+    assert error.status_code == 400
+    assert error.retry_after is None
+    assert "examine 112 documents" in error.detail and "nextCursor" in error.detail
+    assert counts == 0
+
+
+def test_collection_size_is_cached():
+    async def scenario():
+        guard = CostGuard(max_docs_examined=100)
+        collection = SizedCollection(10)
+        for _ in range(3):
+            await guard.check("search", collection, {"name": {"$regex": "a"}})
+        return collection.counts
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_gate_queues_then_sheds():
+    async def scenario():
+        gate = _Gate(AdmissionPool("search", (), concurrency=1, queue=1, queue_timeout=0.05))
+        assert await gate.acquire() is None
+        waiter = asyncio.ensure_future(gate.acquire())
+        await asyncio.sleep(0)
+        assert await gate.acquire() == "queue_full"
+        gate.release()
+        assert await waiter is None
+        assert gate.active == 1
+        assert await gate.acquire() == "queue_timeout"
+        gate.release()
+        return gate.active
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_pool_selection_by_path_and_params():
+    middleware = AdmissionMiddleware(None, [
+        AdmissionPool("search", (r"/api/products",), 1, 1, params=("search",)),
+        AdmissionPool("catalog", (r"/api/products",), 1, 1),
+    ])
+    assert middleware.pool_for("/api/products", b"search=ring").name == "search"
+    assert middleware.pool_for("/api/products", b"category=Ring").name == "catalog"
+    assert middleware.pool_for("/api/cart", b"") is None
+
+
+def test_rejected_requests_get_503_with_retry_after():
+    sent = []
+
+    async def app(scope, receive, send):
+        await asyncio.sleep(0.05)
+
+    async def send(message):
+        sent.append(message)
+
+    async def scenario():
+        middleware = AdmissionMiddleware(app, [AdmissionPool("search", (r"/s",), 1, 0, retry_after=3)])
+        scope = {"type": "http", "path": "/s", "query_string": b"", "headers": []}
+        await asyncio.gather(middleware(scope, None, send), middleware(scope, None, send))
+
+    asyncio.run(scenario())
+    start = next(message for message in sent if message["type"] == "http.response.start")
+    assert start["status"] == 503
+    assert (b"retry-after", b"3") in start["headers"]
@@ -0,0 +1,41 @@
+from benchmarks.__main__ import compare, summarize
+from benchmarks.dataset import load_seed, scaled_products
+from benchmarks.traffic import Recorder
+
+
+def test_scaled_catalog_is_reproducible_with_unique_ids():
+    size = len(load_seed()) * 3
+    first = list(scaled_products(size, seed=5))
+    assert first == list(scaled_products(size, seed=5))
+    assert first != list(scaled_products(size, seed=6))
+    assert len({product["id"] for product in first}) == size
+    assert len({product["sku"] for product in first}) == size
+    assert all(1.0 <= product["rating"] <= 5.0 for product in first)
+
+
+def test_warm_up_requests_are_not_recorded():
+    recorder = Recorder(record_from=10.0)
+    recorder.record("products", started=9.0, seconds=5.0, ok=False)
+    for i in range(100):
+        recorder.record("products", started=11.0, seconds=(i + 1) / 1000, ok=i != 0)
+    summary = summarize(recorder, duration=10.0)["products"]
+    assert (summary["count"], summary["errors"], summary["rps"]) == (100, 1, 10.0)
+    assert summary["p50"] == 50.5
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {"endpoints": {
+        "products": {"p95": 10.0, "rps": 100.0},
+        "search": {"p95": 10.0, "rps": 100.0},
+        "cart": {"p95": 10.0, "rps": 100.0},
+    }}
+    summary = {
+        "products": {"count": 1000, "errors": 0, "rps": 95.0, "p95": 10.5},
+        "search": {"count": 1000, "errors": 20, "rps": 70.0, "p95": 13.0},
+    }
+    assert compare(summary, baseline, tolerance=0.1) == [
+        "search: 20 errors in 1000 requests",
+        "search: p95 13.00ms vs baseline 10.00ms",
+        "search: 70.0 req/s vs baseline 100.0 req/s",
+        "cart: no requests recorded",
+    ]
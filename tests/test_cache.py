@@ -0,0 +1,159 @@
+import asyncio
+
+from cache import (
+    CatalogVersion,
+    CachedResponse,
+    LRUTier,
+    ResponseCache,
+    ResponseCacheMiddleware,
+    SignatureCache,
+    etag_matches,
+    normalize_query,
+)
+
+
+class Version:
+    value = 3
+
+
+class Route:
+    """A catalog route that sets its own headers and counts its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", b"2"),
+            (b"vary", b"Accept-Encoding"),
+            (b"x-catalog-source", b"memory"),
+            (b"set-cookie", b"session=abc"),
+        ]})
+        await send({"type": "http.response.body", "body": b"[]"})
+
+
+def request(middleware, if_none_match=None, query=b"b=2&a=1"):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    scope = {"type": "http", "method": "GET", "path": "/api/products", "query_string": query, "headers": headers}
+    asyncio.run(middleware(scope, None, send))
+    start, body = messages
+    return start["status"], dict(start["headers"]), body["body"]
+
+
+def make_middleware():
+    route = Route()
+    return route, ResponseCacheMiddleware(route, ResponseCache(LRUTier()), Version(), [r"/api/products"])
+
+
+def test_miss_and_hit_send_the_same_headers():
+    route, middleware = make_middleware()
+    miss = request(middleware)
+    hit = request(middleware, query=b"a=1&b=2")
+    assert route.calls == 1
+    assert miss == hit
+    status, headers, body = hit
+    assert status == 200 and body == b"[]"
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert headers[b"x-catalog-source"] == b"memory"
+    assert headers[b"cache-control"] == b"no-cache"
+    assert headers[b"content-length"] == b"2"
+    assert b"set-cookie" not in headers
+
+
+def test_matching_etag_gets_304_with_the_route_headers():
+    _, middleware = make_middleware()
+    _, headers, _ = request(middleware)
+    status, not_modified, body = request(middleware, if_none_match=headers[b"etag"].decode())
+    assert status == 304 and body == b""
+    assert not_modified[b"etag"] == headers[b"etag"]
+    assert not_modified[b"vary"] == b"Accept-Encoding"
+
+
+def test_etag_matching_and_query_normalization():
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abd"', '"abc"')
+    assert normalize_query(b"sort=price_low&category=Ring&tag=b&tag=a") == "category=Ring&sort=price_low&tag=b&tag=a"
+
+
+def test_lru_tier_evicts_least_recently_used():
+    async def scenario():
+        tier = LRUTier(max_entries=2)
+        for key in ("a", "b"):
+            await tier.set(key, CachedResponse(b"", key, "application/json"))
+        await tier.get("a")
+        await tier.set("c", CachedResponse(b"", "c", "application/json"))
+        return [await tier.get(key) is not None for key in ("a", "b", "c")]
+
+    assert asyncio.run(scenario()) == [True, False, True]
+
+
+def test_signature_cache_is_cleared_by_catalog_changes():
+    async def scenario():
+        cache = SignatureCache(ttl=60)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return len(calls)
+
+        first = await cache.get("k", compute)
+        second = await cache.get("k", compute)
+        cache.apply([{"id": "p1"}], [])
+        third = await cache.get("k", compute)
+        return first, second, third
+
+    assert asyncio.run(scenario()) == (1, 1, 2)
+
+
+class VersionCollection:
+    def __init__(self):
+        self.version = 1
+
+    async def find_one(self, filter):
+        return {"_id": filter["_id"], "version": self.version}
+
+
+def test_version_is_published_only_after_the_reload():
+    async def scenario():
+        meta = VersionCollection()
+        version = CatalogVersion(meta)
+        await version.refresh()
+        snapshot = {"body": b"old"}
+
+        async def route(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+            await send({"type": "http.response.body", "body": snapshot["body"]})
+
+        middleware = ResponseCacheMiddleware(route, ResponseCache(LRUTier()), version, [r"/api/products"])
+
+        async def get():
+            messages = []
+
+            async def send(message):
+                messages.append(message)
+
+            scope = {"type": "http", "method": "GET", "path": "/api/products", "query_string": b"", "headers": []}
+            await middleware(scope, None, send)
+            return messages[1]["body"]
+
+        async def reload():
+            await asyncio.sleep(0.02)
+            snapshot["body"] = b"new"
+
+        meta.version = 2
+        follow = asyncio.create_task(version.follow(reload))
+        await asyncio.sleep(0.01)
+        during = await get()
+        assert await follow
+        return during, await get(), version.value
+
+    during, after, value = asyncio.run(scenario())
+    assert (during, after, value) == (b"old", b"new", 2)
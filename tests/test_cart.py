@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+from pymongo import DeleteOne
+from pymongo.errors import BulkWriteError
+
+from cart import CartConflict, apply_batch, batch_writes
+from models import CartOperation
+
+
+def apply_writes(lines, writes):
+    """Apply bulk writes to a list of cart lines the way Mongo would."""
+    for write in writes:
+        match = [line for line in lines if all(line.get(k) == v for k, v in write._filter.items())][:1]
+        if isinstance(write, DeleteOne):
+            for line in match:
+                lines.remove(line)
+            continue
+        update = write._doc
+        if not match:
+            if not write._upsert:
+                continue
+            line = dict(write._filter, **update.get("$setOnInsert", {}))
+            lines.append(line)
+            match = [line]
+        for line in match:
+            for field, amount in update.get("$inc", {}).items():
+                line[field] = line.get(field, 0) + amount
+            line.update(update.get("$set", {}))
+    return lines
+
+
+def ops(*operations):
+    return [CartOperation(**op) for op in operations]
+
+
+def test_batch_adds_merge_into_one_line_per_product_and_size():
+    lines = apply_writes([], batch_writes("u1", ops(
+        {"op": "add", "productId": "p1", "size": "7", "quantity": 1},
+        {"op": "add", "productId": "p1", "size": "7", "quantity": 2},
+        {"op": "add", "productId": "p1", "size": "8"},
+    )))
+    assert sorted((line["size"], line["quantity"]) for line in lines) == [("7", 3), ("8", 1)]
+    assert len({line["id"] for line in lines}) == 2
+
+
+def test_set_and_remove_by_product_or_line_id():
+    lines = [
+        {"id": "l1", "userId": "u1", "productId": "p1", "size": None, "quantity": 2},
+        {"id": "l2", "userId": "u1", "productId": "p2", "size": None, "quantity": 1},
+        {"id": "l3", "userId": "u2", "productId": "p1", "size": None, "quantity": 5},
+    ]
+    apply_writes(lines, batch_writes("u1", ops(
+        {"op": "set", "itemId": "l1", "quantity": 4},
+        {"op": "set", "productId": "p2", "quantity": 0},
+        {"op": "set", "productId": "p3", "quantity": 2},
+        {"op": "remove", "itemId": "l3"},
+    )))
+    assert sorted((line["userId"], line["productId"], line["quantity"]) for line in lines) == [
+        ("u1", "p1", 4), ("u1", "p3", 2), ("u2", "p1", 5),
+    ]
+
+
+@pytest.mark.parametrize("operation", [{"op": "remove"}, {"op": "add", "itemId": "l1"}])
+def test_invalid_operations_are_rejected(operation):
+    with pytest.raises(ValueError):
+        batch_writes("u1", ops(operation))
+
+
+class RacingCart:
+    """Cart collection where another request inserts lines just before ours."""
+
+    def __init__(self, lines, races):
+        self.lines = lines
+        self.races = list(races)
+        self.calls = 0
+
+    async def bulk_write(self, requests, ordered=True, session=None):
+        self.calls += 1
+        for index, write in enumerate(requests):
+            race = self.races[0] if self.races else None
+            if race is not None and write._filter.get("productId") == race["productId"]:
+                self.races.pop(0)
+                self.lines.append(dict(write._filter, id="theirs", quantity=race["quantity"]))
+                raise BulkWriteError({"writeErrors": [{"index": index, "code": 11000, "errmsg": "E11000"}]})
+            apply_writes(self.lines, [write])
+
+
+def test_duplicate_key_race_retries_only_the_unapplied_operations():
+    cart = RacingCart([], races=[{"productId": "p2", "quantity": 5}])
+    writes = batch_writes("u1", ops(
+        {"op": "add", "productId": "p1", "quantity": 1},
+        {"op": "add", "productId": "p2", "quantity": 2},
+        {"op": "add", "productId": "p3", "quantity": 1},
+    ))
+    asyncio.run(apply_batch(cart, writes))
+    assert cart.calls == 2
+    assert sorted((line["productId"], line["quantity"]) for line in cart.lines) == [("p1", 1), ("p2", 7), ("p3", 1)]
+
+
+def test_persistent_conflicts_report_how_many_operations_were_applied():
+    cart = RacingCart([], races=[{"productId": "p2", "quantity": 1}] * 3)
+    writes = batch_writes("u1", ops({"op": "add", "productId": "p1"}, {"op": "add", "productId": "p2"}))
+    with pytest.raises(CartConflict) as excinfo:
+        asyncio.run(apply_batch(cart, writes))
+    assert excinfo.value.applied == 1
+    assert [line["productId"] for line in cart.lines].count("p1") == 1
+
+
+def test_other_write_errors_are_raised():
+    class Failing:
+        async def bulk_write(self, requests, ordered=True, session=None):
+            raise BulkWriteError({"writeErrors": [{"index": 0, "code": 121, "errmsg": "validation"}]})
+
+    with pytest.raises(BulkWriteError):
+        asyncio.run(apply_batch(Failing(), batch_writes("u1", ops({"op": "add", "productId": "p1"}))))
@@ -0,0 +1,232 @@
+import asyncio
+import random
+import time
+
+import pytest
+
+from catalog import SORT_OPTIONS, CatalogEngine, CatalogSnapshot, ProductFilters
+from pagination import SORT_KEYS, cursor_after
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return [dict(doc) for doc in self.docs]
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, filter=None, projection=None):
+        return FakeCursor(self.docs)
+
+
+class FakeStream:
+    """Change stream that reports its events, then an invalidate, then dies."""
+
+    def __init__(self, events):
+        self.events = list(events) + [{"operationType": "invalidate"}]
+        self.alive = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def try_next(self):
+        await asyncio.sleep(0)
+        if self.events:
+            event = self.events.pop(0)
+            if event["operationType"] == "invalidate":
+                self.alive = False
+            return event
+        return None
+
+
+class WatchedCollection(FakeCollection):
+    def __init__(self, docs):
+        super().__init__(docs)
+        self.streams = []
+
+    def watch(self, max_await_time_ms=None):
+        stream = FakeStream([{"operationType": "update"}] if not self.streams else [])
+        self.streams.append(stream)
+        return stream
+
+
+class RecordingListener:
+    def __init__(self):
+        self.calls = []
+
+    def apply(self, upserted, removed):
+        self.calls.append((sorted(doc["id"] for doc in upserted), sorted(removed)))
+
+
+class SlowListener:
+    """Prepares for a while in its thread, like a large related-products build."""
+
+    def __init__(self):
+        self.applied = []
+
+    def prepare(self, upserted, removed):
+        time.sleep(0.2)
+        return lambda: self.applied.append(len(upserted))
+
+
+DOCS = [
+    {"id": "a", "name": "Ring", "price": 100.0, "rating": 4.5, "category": "Rings"},
+    {"id": "b", "name": "Chain", "price": 250.0, "rating": 4.0, "category": "Necklaces"},
+]
+
+
+def test_reload_reports_changes_once():
+    async def scenario():
+        listener = RecordingListener()
+        engine = CatalogEngine(listeners=[listener])
+        collection = FakeCollection(list(DOCS))
+        await engine.reload(collection)
+        await engine.reload(collection)
+        collection.docs = [dict(DOCS[0], price=120.0), {"id": "c", "name": "Bangle", "price": 90.0}]
+        await engine.reload(collection)
+        return engine, listener.calls
+
+    engine, calls = asyncio.run(scenario())
+    assert calls == [(["a", "b"], []), (["a", "c"], ["b"])]
+    assert engine.snapshot.size == 2
+
+
+def test_reload_prepares_listeners_off_the_event_loop():
+    async def scenario():
+        slow = SlowListener()
+        engine = CatalogEngine(listeners=[slow])
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await engine.reload(FakeCollection(list(DOCS)))
+        task.cancel()
+        return slow.applied, ticks, engine.warm
+
+    applied, ticks, warm = asyncio.run(scenario())
+    assert applied == [2]
+    assert warm
+    assert ticks >= 5
+
+
+def random_catalog(count=120, seed=7):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"p{i:03d}",
+            "price": float(rng.choice([900, 1500, 1500, 4200, 12000, 56000])),
+            "rating": rng.choice([3.5, 4.0, 4.0, 4.5, 5.0]),
+            "category": rng.choice(["Rings", "Earrings", "Necklaces"]),
+            "metal": rng.choice(["Gold", "Silver", "Platinum"]),
+            "purity": rng.choice(["18K", "22K", "925"]),
+            "metalColor": rng.choice(["Yellow", "White", "Rose"]),
+            "gender": rng.choice(["Women", "Men", "Unisex"]),
+            "occasion": rng.sample(["Wedding", "Daily Wear", "Party", "Office"], rng.randint(0, 2)),
+            "availability": {"ship": rng.random() < 0.7, "storePickup": rng.random() < 0.4},
+        }
+        for i in rng.sample(range(count), count)
+    ]
+
+
+def brute_force(docs, filters, sort):
+    def matches(doc):
+        for field in ("category", "metal", "purity", "metalColor", "gender"):
+            value = getattr(filters, field)
+            if value and doc[field] != value:
+                return False
+        if filters.occasion and filters.occasion not in doc["occasion"]:
+            return False
+        if filters.minPrice is not None and doc["price"] < filters.minPrice:
+            return False
+        if filters.maxPrice is not None and doc["price"] > filters.maxPrice:
+            return False
+        if filters.availability and not doc["availability"][filters.availability]:
+            return False
+        return True
+
+    hits = sorted((doc for doc in docs if matches(doc)), key=lambda doc: doc["id"])
+    if sort == "newest":
+        return hits[::-1]
+    field, direction = SORT_KEYS[sort]
+    return sorted(hits, key=lambda doc: direction * doc[field])
+
+
+FILTERS = [
+    ProductFilters(),
+    ProductFilters(category="Rings"),
+    ProductFilters(metal="Gold", purity="22K"),
+    ProductFilters(occasion="Wedding", gender="Women"),
+    ProductFilters(minPrice=1500, maxPrice=12000),
+    ProductFilters(availability="storePickup", metalColor="Rose"),
+    ProductFilters(category="Anklets"),
+]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+@pytest.mark.parametrize("sort", list(SORT_OPTIONS))
+def test_query_matches_a_brute_force_scan(filters, sort):
+    docs = random_catalog()
+    snapshot = CatalogSnapshot(docs)
+    expected = [doc["id"] for doc in brute_force(docs, filters, sort)]
+
+    page, total = snapshot.query(filters, sort, skip=5, limit=10)
+    assert total == len(expected)
+    assert [doc["id"] for doc in page] == expected[5:15]
+
+
+def test_keyset_cursor_walks_every_row_once():
+    docs = random_catalog()
+    snapshot = CatalogSnapshot(docs)
+    for sort in SORT_OPTIONS:
+        seen, after = [], None
+        while True:
+            page, _ = snapshot.query(ProductFilters(metal="Gold"), sort, 0, 7, after=after)
+            if not page:
+                break
+            seen.extend(doc["id"] for doc in page)
+            after = cursor_after(sort, page[-1])
+        assert seen == [doc["id"] for doc in brute_force(docs, ProductFilters(metal="Gold"), sort)]
+
+
+def test_search_hits_keep_relevance_order_unless_sorted():
+    snapshot = CatalogSnapshot(random_catalog())
+    ranked = [("p010", 3.0), ("missing", 2.5), ("p002", 2.0), ("p050", 1.0)]
+    page, total = snapshot.query(ProductFilters(), "featured", 0, 10, ranked=ranked)
+    assert [doc["id"] for doc in page] == ["p010", "p002", "p050"]
+    assert total == 3
+    page, _ = snapshot.query(ProductFilters(), "price_low", 0, 10, ranked=ranked)
+    prices = [doc["price"] for doc in page]
+    assert prices == sorted(prices)
+
+
+def test_invalidated_change_stream_is_reopened():
+    async def scenario():
+        listener = RecordingListener()
+        engine = CatalogEngine(listeners=[listener])
+        collection = WatchedCollection(list(DOCS))
+        task = asyncio.create_task(engine.run(collection))
+        while not engine.warm:
+            await asyncio.sleep(0)
+        # e.g. a blue/green swap renamed a new collection over the old one
+        collection.docs = [DOCS[0]]
+        while len(collection.streams) < 2:
+            await asyncio.sleep(0)
+        task.cancel()
+        return listener.calls, collection.streams[0].alive
+
+    calls, first_alive = asyncio.run(asyncio.wait_for(scenario(), 5))
+    assert calls == [(["a", "b"], []), ([], ["b"])]
+    assert not first_alive
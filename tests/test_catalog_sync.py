@@ -0,0 +1,91 @@
+import asyncio
+import io
+import json
+
+import pytest
+from pymongo import DeleteOne
+
+from catalog_sync import iter_items, sync_catalog
+
+ITEMS = [{"id": f"p{i}", "name": f"Item {i}", "tags": ["a, b", "[c]"], "price": i * 100} for i in range(40)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 16])
+@pytest.mark.parametrize("layout", ["array", "pretty", "ndjson"])
+def test_iter_items_streams_arrays_and_ndjson(layout, chunk_size):
+    if layout == "array":
+        text = json.dumps(ITEMS)
+    elif layout == "pretty":
+        text = "\n\n  " + json.dumps(ITEMS, indent=2) + "\n"
+    else:
+        text = "\n".join(json.dumps(item) for item in ITEMS) + "\n\n"
+    assert list(iter_items(io.StringIO(text), chunk_size=chunk_size)) == ITEMS
+
+
+def test_iter_items_rejects_a_truncated_array():
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_items(io.StringIO(json.dumps(ITEMS)[:-20]), chunk_size=16))
+
+
+class Products:
+    def __init__(self, docs):
+        self.docs = {doc["id"]: dict(doc) for doc in docs}
+        self.writes = []
+
+    def find(self, filter, projection):
+        async def rows():
+            for doc in list(self.docs.values()):
+                yield dict(doc)
+        return rows()
+
+    async def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            self.writes.append(request)
+            if isinstance(request, DeleteOne):
+                self.docs.pop(request._filter["id"], None)
+            else:
+                self.docs[request._filter["id"]] = dict(request._doc)
+
+
+class CatalogMeta:
+    def __init__(self):
+        self.version = 0
+
+    async def find_one_and_update(self, filter, update, upsert, return_document):
+        self.version += 1
+        return {"version": self.version}
+
+
+class DB:
+    def __init__(self, docs):
+        self.products = Products(docs)
+        self.catalog_meta = CatalogMeta()
+
+
+def validate(item):
+    if not isinstance(item.get("price"), (int, float)):
+        raise ValueError("price is required")
+    return {key: item[key] for key in ("id", "name", "price")}
+
+
+def test_sync_writes_only_changes_and_keeps_invalid_rows(tmp_path):
+    live = [{"id": "keep", "name": "Keep", "price": 1}, {"id": "edit", "name": "Edit", "price": 2},
+            {"id": "bad", "name": "Bad", "price": 3}, {"id": "drop", "name": "Drop", "price": 4}]
+    feed = [{"id": "keep", "name": "Keep", "price": 1}, {"id": "edit", "name": "Edit", "price": 20},
+            {"id": "bad", "name": "Bad"}, {"id": "new", "name": "New", "price": 5}]
+    source = tmp_path / "feed.ndjson"
+    source.write_text("\n".join(json.dumps(item) for item in feed))
+    db = DB([dict(doc, updatedAt="2024-01-01") for doc in live])
+
+    report = asyncio.run(sync_catalog(db, source, validate, batch_size=2))
+    assert (report.read, report.invalid, report.unchanged, report.upserted, report.deleted) == (4, 1, 1, 2, 1)
+    assert sorted(db.products.docs) == ["bad", "edit", "keep", "new"]
+    assert db.products.docs["edit"]["price"] == 20
+    assert db.catalog_meta.version == 1
+
+    # A second run with the same feed finds nothing to do.
+    db.products.writes.clear()
+    report = asyncio.run(sync_catalog(db, source, validate))
+    assert not report.changed
+    assert db.products.writes == []
+    assert db.catalog_meta.version == 1
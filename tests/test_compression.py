@@ -0,0 +1,66 @@
+import asyncio
+import gzip
+
+import pytest
+
+import compression
+from compression import CompressionMiddleware, choose_encoding, parse_accept_encoding
+
+BODY = b'{"products": [' + b'{"id": "p1", "name": "Ring"},' * 100 + b"]}"
+
+
+def test_accept_encoding_qualities():
+    assert parse_accept_encoding("gzip;q=0.5, br , *;q=0") == {"gzip": 0.5, "br": 1.0, "*": 0.0}
+    assert parse_accept_encoding("gzip;q=bad") == {"gzip": 0.0}
+
+
+def test_brotli_is_preferred_when_installed(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", object())
+    assert choose_encoding("gzip, br") == "br"
+    assert choose_encoding("gzip, br;q=0") == "gzip"
+    monkeypatch.setattr(compression, "brotli", None)
+    assert choose_encoding("br, *") == "gzip"
+    assert choose_encoding("identity") is None
+
+
+def respond(body, content_type=b"application/json", accept=b"gzip", extra_headers=(), more_body=False):
+    async def app(scope, receive, send):
+        headers = [(b"content-type", content_type), (b"content-length", str(len(body)).encode()), *extra_headers]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", accept)]}
+    asyncio.run(CompressionMiddleware(app, minimum_size=1024)(scope, None, send))
+    return dict(messages[0]["headers"]), messages[1]["body"]
+
+
+@pytest.fixture(autouse=True)
+def gzip_only(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+
+
+def test_large_json_is_gzipped_with_weak_etag_and_vary():
+    headers, body = respond(BODY, extra_headers=[(b"etag", b'"v1"'), (b"vary", b"Origin")])
+    assert gzip.decompress(body) == BODY
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"content-length"] == str(len(body)).encode()
+    assert headers[b"etag"] == b'W/"v1"'
+    assert headers[b"vary"] == b"Origin, Accept-Encoding"
+
+
+@pytest.mark.parametrize("options", [
+    {"body": b"{}"},
+    {"body": BODY, "content_type": b"image/png"},
+    {"body": BODY, "accept": b"identity"},
+    {"body": BODY, "more_body": True},
+    {"body": BODY, "extra_headers": [(b"content-encoding", b"br")]},
+])
+def test_ineligible_responses_pass_through(options):
+    headers, body = respond(**options)
+    assert body == options["body"]
+    assert headers.get(b"content-encoding", b"br") == b"br"
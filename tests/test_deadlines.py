@@ -0,0 +1,37 @@
+import asyncio
+
+from pymongo import _csot
+
+from deadlines import RequestDeadlineMiddleware
+
+
+def middleware():
+    async def app(scope, receive, send):
+        pass
+
+    return RequestDeadlineMiddleware(app, default_ms=2000, budgets={
+        r"/api/search/suggestions": 300,
+        r"/api/export/.*": 0,
+    })
+
+
+def test_route_budgets_override_the_default():
+    deadlines = middleware()
+    assert deadlines.budget("/api/products") == 2.0
+    assert deadlines.budget("/api/search/suggestions") == 0.3
+    assert deadlines.budget("/api/search/suggestions/extra") == 2.0
+    assert deadlines.budget("/api/export/products.csv") is None
+    assert RequestDeadlineMiddleware(None, default_ms=0).budget("/api/products") is None
+
+
+def test_requests_run_inside_their_budget():
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(_csot.remaining())
+
+    deadlines = RequestDeadlineMiddleware(app, default_ms=2000, budgets={r"/api/export/.*": 0})
+    asyncio.run(deadlines({"type": "http", "path": "/api/products"}, None, None))
+    asyncio.run(deadlines({"type": "http", "path": "/api/export/products.csv"}, None, None))
+    assert 1.9 < seen[0] <= 2.0
+    assert seen[1] is None
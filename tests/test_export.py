@@ -0,0 +1,86 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timezone
+
+from export import stream_export
+
+DOCS = [
+    {"id": "p1", "name": "Ring, gold", "price": 1000.0, "tags": ["gift", "daily"],
+     "updatedAt": datetime(2024, 5, 1, 12, 0)},
+    {"id": "p2", "name": 'Chain "22K"', "price": None, "tags": [{"k": 1}],
+     "updatedAt": datetime(2024, 5, 2, tzinfo=timezone.utc)},
+    {"id": "p3", "name": "Studs", "price": 800.0, "tags": [], "updatedAt": datetime(2024, 5, 3, tzinfo=timezone.utc)},
+]
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+        self.calls = {}
+
+    def sort(self, keys):
+        self.calls["sort"] = keys
+        return self
+
+    def batch_size(self, size):
+        self.calls["batch_size"] = size
+        return self
+
+    async def __aiter__(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.cursors = []
+
+    def find(self, filter, projection):
+        since = filter.get("updatedAt", {}).get("$gte")
+        fields = [field for field in projection if field != "_id"]
+        cursor = FakeCursor([
+            {field: doc[field] for field in fields if field in doc}
+            for doc in self.docs
+            if since is None or doc["updatedAt"].replace(tzinfo=timezone.utc) >= since
+        ])
+        self.cursors.append((filter, cursor))
+        return cursor
+
+
+def export(collection, fields, **options):
+    async def collect():
+        return [chunk async for chunk in stream_export(collection, fields, **options)]
+    return asyncio.run(collect())
+
+
+def test_ndjson_streams_one_chunk_per_batch():
+    chunks = export(FakeCollection(DOCS), ["id", "updatedAt"], batch_size=2)
+    assert len(chunks) == 2
+    rows = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+    assert rows[0] == {"id": "p1", "updatedAt": "2024-05-01T12:00:00+00:00"}
+    assert [row["id"] for row in rows] == ["p1", "p2", "p3"]
+
+
+def test_csv_flattens_lists_and_quotes_cells():
+    chunks = export(FakeCollection(DOCS), ["id", "name", "price", "tags"], fmt="csv", compress=True)
+    rows = list(csv.reader(io.StringIO(gzip.decompress(b"".join(chunks)).decode())))
+    assert rows == [
+        ["id", "name", "price", "tags"],
+        ["p1", "Ring, gold", "1000.0", "gift|daily"],
+        ["p2", 'Chain "22K"', "", '[{"k":1}]'],
+        ["p3", "Studs", "800.0", ""],
+    ]
+
+
+def test_incremental_export_filters_and_orders_by_checkpoint():
+    collection = FakeCollection(DOCS)
+    since = datetime(2024, 5, 2, tzinfo=timezone.utc)
+    chunks = export(collection, ["id"], since=since)
+    assert b"".join(chunks).decode().split() == ['{"id":"p2"}', '{"id":"p3"}']
+    filter, cursor = collection.cursors[0]
+    assert filter == {"updatedAt": {"$gte": since}}
+    assert cursor.calls["sort"] == [("updatedAt", 1), ("id", 1)]
@@ -0,0 +1,59 @@
+from catalog import CatalogSnapshot, ProductFilters
+from facets import FACETS, mongo_facet_pipeline, parse_mongo_facets, snapshot_facets
+
+DOCS = [
+    {"id": "a", "price": 8000.0, "category": "Rings", "metal": "Gold", "occasion": ["Wedding"],
+     "availability": {"ship": True}},
+    {"id": "b", "price": 30000.0, "category": "Rings", "metal": "Silver", "occasion": ["Party", "Wedding"],
+     "availability": {"ship": True, "storePickup": True}},
+    {"id": "c", "price": 250000.0, "category": "Necklaces", "metal": "Gold", "occasion": [],
+     "availability": {"storePickup": True}},
+    {"id": "d", "price": 12000.0, "category": "Earrings", "metal": "Gold", "availability": {}},
+]
+
+
+def counts(facet):
+    return {row["value"]: row["count"] for row in facet}
+
+
+def test_each_facet_ignores_its_own_filter():
+    result = snapshot_facets(CatalogSnapshot(DOCS), ProductFilters(category="Rings", metal="Gold"))
+    assert result["total"] == 1
+    # Categories are counted over gold products, metals over rings.
+    assert counts(result["category"]) == {"Rings": 1, "Necklaces": 1, "Earrings": 1}
+    assert counts(result["metal"]) == {"Gold": 1, "Silver": 1}
+    assert counts(result["occasion"]) == {"Wedding": 1}
+
+
+def test_price_buckets_and_availability():
+    result = snapshot_facets(CatalogSnapshot(DOCS), ProductFilters(minPrice=10000))
+    assert [bucket["count"] for bucket in result["price"]] == [1, 1, 1, 0, 0, 1]
+    assert result["price"][-1] == {"min": 200000, "max": None, "count": 1}
+    assert counts(result["availability"]) == {"ship": 1, "storePickup": 2}
+
+
+def test_search_hits_restrict_every_facet():
+    ranked = [("b", 2.0), ("c", 1.0), ("gone", 0.5)]
+    result = snapshot_facets(CatalogSnapshot(DOCS), ProductFilters(), ranked=ranked)
+    assert result["total"] == 2
+    assert counts(result["category"]) == {"Rings": 1, "Necklaces": 1}
+
+
+def test_mongo_pipeline_has_one_branch_per_facet_and_parses_back():
+    stages = mongo_facet_pipeline(ProductFilters(category="Rings"), search={"name": "x"})[0]["$facet"]
+    assert set(stages) == {"total", *FACETS}
+    assert stages["total"][0]["$match"] == {"category": "Rings", "name": "x"}
+    assert stages["category"][0]["$match"] == {"name": "x"}
+
+    row = {
+        "total": [{"count": 2}],
+        "category": [{"_id": "Rings", "count": 2}, {"_id": None, "count": 4}],
+        "availability": [{"_id": None, "ship": 2, "storePickup": 0}],
+        "price": [{"_id": 0, "count": 1}, {"_id": 25000, "count": 1}],
+    }
+    result = parse_mongo_facets(row)
+    assert result["total"] == 2
+    assert result["category"] == [{"value": "Rings", "count": 2}]
+    assert result["availability"] == [{"value": "ship", "count": 2}]
+    assert [bucket["count"] for bucket in result["price"]] == [1, 0, 1, 0, 0, 0]
+    assert result["metal"] == []
@@ -0,0 +1,35 @@
+import pytest
+
+from fields import VIEWS, mongo_projection, project, resolve_fieldset
+
+ALLOWED = ("id", "name", "price", "images", "rating")
+DOC = {"id": "p1", "name": "Ring", "price": 10.0, "images": ["a", "b", "c"], "rating": 4.5, "description": "x"}
+
+
+def test_field_lists_always_include_the_id_once():
+    fieldset = resolve_fieldset(None, "price,id,name,price,", ALLOWED)
+    assert fieldset.fields == ("id", "price", "name")
+    assert not fieldset.cacheable
+    assert project(DOC, fieldset) == {"id": "p1", "price": 10.0, "name": "Ring"}
+
+
+def test_views_resolve_by_name():
+    assert resolve_fieldset("card", None, ALLOWED) is VIEWS["card"]
+    assert resolve_fieldset("detail", None, ALLOWED) is None
+    assert resolve_fieldset(None, None, ALLOWED) is None
+
+
+@pytest.mark.parametrize("view, fields", [("thumbnail", None), (None, "id,secret")])
+def test_unknown_names_are_rejected(view, fields):
+    with pytest.raises(ValueError):
+        resolve_fieldset(view, fields, ALLOWED)
+
+
+def test_projection_and_in_memory_projection_agree():
+    card = VIEWS["card"]
+    projection = mongo_projection(card, extra=("id", "createdAt"))
+    assert projection["_id"] == 0
+    assert projection["images"] == {"$slice": 1}
+    assert projection["createdAt"] == 1
+    assert project(DOC, card) == {"id": "p1", "name": "Ring", "price": 10.0, "images": ["a"], "rating": 4.5}
+    assert mongo_projection(None) == {"_id": 0}
@@ -0,0 +1,37 @@
+import asyncio
+
+from pymongo.errors import ServerSelectionTimeoutError
+
+from health import Readiness
+
+
+class Admin:
+    def __init__(self, error=None):
+        self.error = error
+
+    async def command(self, name):
+        if self.error is not None:
+            raise self.error
+        return {"ok": 1}
+
+
+class Client:
+    def __init__(self, error=None):
+        self.admin = Admin(error)
+
+
+def test_ready_needs_mongo_and_warm_caches():
+    warm = {"catalog": False}
+    readiness = Readiness(Client(), {"catalog": lambda: warm["catalog"]})
+    assert asyncio.run(readiness.check()) == (False, {"mongo": True, "catalog": False, "draining": False})
+    warm["catalog"] = True
+    assert asyncio.run(readiness.check())[0]
+
+
+def test_unreachable_mongo_or_draining_is_not_ready():
+    readiness = Readiness(Client(ServerSelectionTimeoutError("no servers")), {})
+    assert asyncio.run(readiness.check()) == (False, {"mongo": False, "draining": False})
+
+    readiness = Readiness(Client(), {})
+    readiness.draining = True
+    assert asyncio.run(readiness.check()) == (False, {"mongo": True, "draining": True})
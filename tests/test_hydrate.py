@@ -0,0 +1,66 @@
+import asyncio
+
+from catalog import CatalogEngine
+from hydrate import cart_summary, expand_lines, fetch_products
+
+PRODUCTS = [
+    {"id": "p1", "name": "Ring", "price": 1000.0, "description": "long text"},
+    {"id": "p2", "name": "Chain", "price": None},
+]
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs if length is None else self.docs[:length]
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, filter, projection):
+        if not filter:
+            return FakeCursor([dict(doc) for doc in self.docs])
+        self.queries.append((filter, projection))
+        ids = filter["id"]["$in"]
+        fields = [field for field in projection if field != "_id"]
+        return FakeCursor([
+            {field: doc[field] for field in fields or doc if field in doc}
+            for doc in self.docs if doc["id"] in ids
+        ])
+
+
+def test_cold_catalog_fetches_all_lines_in_one_query():
+    collection = FakeCollection(PRODUCTS)
+    products = asyncio.run(fetch_products(collection, CatalogEngine(), ["p1", "p1", "gone"], ("id", "name")))
+    assert products == {"p1": {"id": "p1", "name": "Ring"}}
+    assert collection.queries == [({"id": {"$in": ["p1", "gone"]}}, {"_id": 0, "id": 1, "name": 1})]
+
+
+def test_warm_catalog_answers_without_mongo():
+    engine = CatalogEngine()
+    collection = FakeCollection(PRODUCTS)
+    asyncio.run(engine.reload(collection))
+    products = asyncio.run(fetch_products(collection, engine, ["p2", "p1"], ("id", "price")))
+    assert products == {"p2": {"id": "p2", "price": None}, "p1": {"id": "p1", "price": 1000.0}}
+    assert collection.queries == []
+    assert asyncio.run(fetch_products(collection, engine, [])) == {}
+
+
+def test_cart_summary_totals_priced_lines():
+    products = {doc["id"]: doc for doc in PRODUCTS}
+    lines = expand_lines([
+        {"productId": "p1", "quantity": 2},
+        {"productId": "p2", "quantity": 1},
+        {"productId": "gone", "quantity": 1},
+    ], products)
+    assert [line["lineTotal"] for line in lines] == [2000.0, None, None]
+    assert lines[2]["product"] is None
+    summary = cart_summary(lines)
+    assert (summary["itemCount"], summary["subtotal"]) == (4, 2000.0)
+    # Wishlist lines have no quantity, so no total.
+    assert "lineTotal" not in expand_lines([{"productId": "p1"}], products)[0]
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from indexes import INDEX_SPEC, QUERY_SHAPES, IndexSpec, reconcile_indexes
+
+
+def equality_fields(filter):
+    return [field for field, value in filter.items() if not isinstance(value, dict) or "$in" in value]
+
+
+def serves_sort(index, prefix, sort):
+    keys = list(index.keys)
+    if [field for field, _ in keys[:len(prefix)]] != prefix:
+        return False
+    rest = keys[len(prefix):len(prefix) + len(sort)]
+    forward = [tuple(key) for key in sort]
+    backward = [(field, -direction) for field, direction in sort]
+    return rest in (forward, backward)
+
+
+@pytest.mark.parametrize("shape", [shape for shape in QUERY_SHAPES if shape.sort], ids=lambda shape: shape.name)
+def test_sorted_shapes_have_an_index_in_sort_order(shape):
+    prefix = equality_fields(shape.filter)
+    assert any(serves_sort(index, prefix, shape.sort) for index in INDEX_SPEC[shape.collection])
+
+
+class FakeCollection:
+    def __init__(self, existing):
+        self.existing = existing
+        self.created = []
+
+    async def index_information(self):
+        return self.existing
+
+    async def create_index(self, keys, name, unique, background, **options):
+        self.created.append((name, unique))
+
+
+def test_reconcile_creates_missing_and_reports_the_rest():
+    collection = FakeCollection({
+        "_id_": {"key": [("_id", 1)]},
+        "id_1": {"key": [("id", 1)], "unique": False},
+        "legacy_1": {"key": [("legacy", 1)]},
+    })
+    spec = {"products": [
+        IndexSpec(keys=(("id", 1),), unique=True),
+        IndexSpec(keys=(("price", -1), ("id", 1))),
+    ]}
+    report = asyncio.run(reconcile_indexes({"products": collection}, spec))
+    assert collection.created == [("price_-1_id_1", False)]
+    assert report.created == ["products.price_-1_id_1"]
+    assert report.conflicts == ["products.id_1 (unique=False, spec=True)"]
+    assert report.extra == ["products.legacy_1"]
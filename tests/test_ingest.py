@@ -0,0 +1,113 @@
+import asyncio
+
+import pymongo
+import pytest
+from pymongo import _csot
+from pymongo.errors import AutoReconnect, BulkWriteError, ExecutionTimeout
+
+from ingest import IngestPipeline, QueueFull, WriteBehindQueue
+
+
+class FakeCollection:
+    """Records insert_many batches; honours pymongo.timeout like the driver."""
+
+    def __init__(self, name="appointments"):
+        self.name = name
+        self.batches = []
+
+    async def insert_many(self, docs, ordered=True):
+        remaining = _csot.remaining()
+        if remaining is not None and remaining <= 0:
+            raise ExecutionTimeout("operation exceeded time limit")
+        self.batches.append(list(docs))
+
+
+class FakeDB(dict):
+    def __missing__(self, name):
+        collection = self[name] = FakeCollection(name)
+        return collection
+
+
+def test_flusher_batches_documents():
+    async def scenario():
+        collection = FakeCollection()
+        queue = WriteBehindQueue(collection, batch_size=3, flush_interval=0.05)
+        queue.start()
+        for n in range(5):
+            queue.submit({"n": n})
+        await asyncio.sleep(0.15)
+        await queue.drain()
+        return collection.batches
+
+    batches = asyncio.run(scenario())
+    assert [len(batch) for batch in batches] == [3, 2]
+
+
+def test_full_queue_raises():
+    async def scenario():
+        queue = WriteBehindQueue(FakeCollection(), max_size=1)
+        queue.submit({"n": 1})
+        with pytest.raises(QueueFull):
+            queue.submit({"n": 2})
+
+    asyncio.run(scenario())
+
+
+def test_drain_writes_pending_documents():
+    async def scenario():
+        db = FakeDB()
+        pipeline = IngestPipeline(db, flush_interval=10)
+        pipeline.start()
+        pipeline.submit("leads", {"n": 1})
+        pipeline.submit("leads", {"n": 2})
+        await asyncio.sleep(0)
+        await pipeline.drain()
+        return db["leads"].batches
+
+    assert asyncio.run(scenario()) == [[{"n": 1}, {"n": 2}]]
+
+
+def test_flusher_does_not_inherit_request_deadline():
+    async def scenario():
+        db = FakeDB()
+        pipeline = IngestPipeline(db, flush_interval=0.1, max_retries=1)
+        pipeline.start()
+        # The first submit creates the queue inside a request's time budget
+        with pymongo.timeout(0.02):
+            pipeline.submit("appointments", {"n": 1})
+        await asyncio.sleep(0.2)
+        pipeline.submit("appointments", {"n": 2})
+        await asyncio.sleep(0.2)
+        await pipeline.drain()
+        return db["appointments"].batches
+
+    assert asyncio.run(scenario()) == [[{"n": 1}], [{"n": 2}]]
+
+
+class FlakyCollection(FakeCollection):
+    """Fails with the given errors before accepting inserts."""
+
+    def __init__(self, *errors):
+        super().__init__("leads")
+        self.errors = list(errors)
+
+    async def insert_many(self, docs, ordered=True):
+        if self.errors:
+            raise self.errors.pop(0)
+        await super().insert_many(docs, ordered)
+
+
+def test_transient_failures_are_retried():
+    collection = FlakyCollection(AutoReconnect("connection reset"))
+    queue = WriteBehindQueue(collection)
+    asyncio.run(queue._flush([{"n": 1}]))
+    assert collection.batches == [[{"n": 1}]]
+
+
+def test_duplicate_keys_are_not_retried_or_reported(caplog):
+    duplicate = BulkWriteError({"writeErrors": [{"index": 0, "code": 11000, "errmsg": "E11000 duplicate key"}]})
+    collection = FlakyCollection(duplicate)
+    queue = WriteBehindQueue(collection)
+    asyncio.run(queue._flush([{"n": 1}, {"n": 2}]))
+    assert collection.batches == []
+    assert not caplog.records
@@ -0,0 +1,93 @@
+import asyncio
+import math
+import random
+
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+from locator import EARTH_RADIUS_KM, StoreLocator, load_centroids
+
+STORES = [
+    {"id": "s1", "name": "Fort", "pincode": "400001", "latitude": 18.9388, "longitude": 72.8354},
+    {"id": "s2", "name": "Connaught Place", "pincode": "110001", "latitude": 28.6315, "longitude": 77.2167},
+]
+
+
+class FlakyCursor:
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def to_list(self, length):
+        self.collection.attempts += 1
+        if self.collection.attempts <= self.collection.failures:
+            raise ServerSelectionTimeoutError("no servers available")
+        return [dict(store) for store in STORES]
+
+
+class FlakyCollection:
+    def __init__(self, failures):
+        self.failures = failures
+        self.attempts = 0
+
+    def find(self, filter=None, projection=None):
+        return FlakyCursor(self)
+
+
+def test_warm_up_retries_until_mongo_answers():
+    locator = StoreLocator()
+    collection = FlakyCollection(failures=2)
+    asyncio.run(locator.warm_up(collection, delay=0.01))
+    assert locator.warm
+    assert collection.attempts == 3
+    store, distance = locator.nearest((19.0, 72.84), k=1)[0]
+    assert store["id"] == "s1"
+    assert distance < 10
+
+
+def haversine_km(a, b):
+    lat1, lng1, lat2, lng2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+def test_nearest_matches_a_brute_force_scan():
+    rng = random.Random(3)
+    stores = [
+        {"id": f"s{i}", "latitude": rng.uniform(8, 34), "longitude": rng.uniform(68, 97)}
+        for i in range(500)
+    ]
+    locator = StoreLocator()
+    locator.load(stores)
+    for _ in range(25):
+        origin = (rng.uniform(8, 34), rng.uniform(68, 97))
+        expected = sorted(
+            (haversine_km(origin, (store["latitude"], store["longitude"])), store["id"]) for store in stores
+        )
+        found = locator.nearest(origin, k=5)
+        assert [store["id"] for store, _ in found] == [store_id for _, store_id in expected[:5]]
+        assert [distance for _, distance in found] == pytest.approx([distance for distance, _ in expected[:5]])
+
+        radius = expected[3][0]
+        assert len(locator.nearest(origin, k=10, max_km=radius + 1e-6)) == 4
+
+
+def test_pincodes_fall_back_to_district_then_region():
+    locator = StoreLocator({"400001": (18.9, 72.8), "400051": (19.1, 72.9), "401101": (19.3, 72.85)})
+    assert locator.resolve_pincode(" 400001 ") == (18.9, 72.8)
+    assert locator.resolve_pincode("400099") == pytest.approx((19.0, 72.85))
+    assert locator.resolve_pincode("402000") == pytest.approx((19.1, 72.85))
+    assert locator.resolve_pincode("999999") is None
+    assert locator.resolve_pincode("4000") is None
+
+
+def test_stores_without_coordinates_use_their_pincode():
+    locator = StoreLocator(load_centroids())
+    locator.load([
+        {"id": "cp", "pincode": "110001"},
+        {"id": "nowhere", "pincode": "000000"},
+        {"id": "fort", "pincode": "400001", "latitude": 18.9388, "longitude": 72.8354},
+    ])
+    assert len(locator) == 2
+    assert locator.nearest(locator.resolve_pincode("110001"), k=1)[0][0]["id"] == "cp"
+    # A store's own coordinates replace the table entry for its pincode.
+    assert locator.resolve_pincode("400001") == (18.9388, 72.8354)
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import subprocess
+import sys
+from types import SimpleNamespace
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+import metrics
+from metrics import (
+    REQUEST_LATENCY, Counter, Gauge, Histogram, MetricsMiddleware, MongoCommandListener, MultiProcessMetrics, Registry,
+    RequestStats,
+)
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency", "Latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/a")
+    assert histogram.render()[2:] == [
+        'latency_bucket{route="/a",le="0.1"} 2',
+        'latency_bucket{route="/a",le="1.0"} 3',
+        'latency_bucket{route="/a",le="+Inf"} 4',
+        'latency_sum{route="/a"} 3.65',
+        'latency_count{route="/a"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = Counter("hits", "Hits.", ("path",))
+    counter.inc('a"b\\c\n')
+    assert counter.render()[-1] == 'hits{path="a\\"b\\\\c\\n"} 1.0'
+
+
+def command_events(name, command, reply, request_id=1):
+    common = dict(command_name=name, request_id=request_id, connection_id=("db", 27017))
+    started = SimpleNamespace(command=command, database_name="shop", **common)
+    succeeded = SimpleNamespace(reply=reply, duration_micros=2500, **common)
+    return started, succeeded
+
+
+def test_listener_charges_commands_to_the_current_request():
+    listener = MongoCommandListener()
+    stats = RequestStats()
+    token = metrics.current_request.set(stats)
+    try:
+        for request_id, (name, command, reply) in enumerate([
+            ("find", {"find": "products"}, {"cursor": {"firstBatch": [{}, {}]}}),
+            ("getMore", {"getMore": 1, "collection": "products"}, {"cursor": {"nextBatch": [{}]}}),
+            ("insert", {"insert": "leads"}, {"n": 3}),
+        ]):
+            started, succeeded = command_events(name, command, reply, request_id)
+            listener.started(started)
+            listener.succeeded(succeeded)
+    finally:
+        metrics.current_request.reset(token)
+    assert stats.commands == {
+        ("products", "find"): [1, 0.0025, 2],
+        ("products", "getMore"): [1, 0.0025, 1],
+        ("leads", "insert"): [1, 0.0025, 3],
+    }
+    assert stats.breakdown().startswith("products.find x1 2.5ms (2 docs)")
+
+
+def test_middleware_labels_by_route_template_and_logs_slow_requests(caplog):
+    async def product(request):
+        return PlainTextResponse("ring")
+
+    app = Starlette(routes=[Route("/api/products/{product_id}", product)])
+    middleware = MetricsMiddleware(app, slow_request_seconds=0)
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    scope = {
+        "type": "http", "method": "GET", "path": "/api/products/p1", "query_string": b"",
+        "headers": [], "app": app,
+    }
+    with caplog.at_level(logging.WARNING, logger="metrics"):
+        asyncio.run(middleware(scope, receive, send))
+
+    assert messages[0]["status"] == 200
+    assert 'route="/api/products/{product_id}",status="200"' in "\n".join(REQUEST_LATENCY.render())
+    assert "Slow request GET /api/products/p1 -> 200" in caplog.text
+
+
+def _worker_registry(requests, in_flight):
+    registry = Registry()
+    registry.register(Counter("requests_total", "Requests.", ("route",))).inc("/a", amount=requests)
+    registry.register(Gauge("in_flight", "In flight.", ("route",))).inc("/a", amount=in_flight)
+    registry.register(Histogram("latency", "Latency.", ("route",), buckets=(1.0,))).observe(0.5, "/a")
+    return registry
+
+
+def test_multiprocess_metrics_sum_every_worker(tmp_path):
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    MultiProcessMetrics(_worker_registry(3, 1), tmp_path).write()
+    MultiProcessMetrics(_worker_registry(4, 5), tmp_path, pid=exited.pid).write()
+
+    text = MultiProcessMetrics(_worker_registry(0, 0), tmp_path, pid=1).render()
+
+    # The exited worker's requests still count, but not its in-flight gauge
+    assert 'requests_total{route="/a"} 7.0' in text
+    assert 'in_flight{route="/a"} 1.0' in text
+    assert 'latency_bucket{route="/a",le="1.0"} 3' in text
+    assert 'latency_count{route="/a"} 3' in text
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from orders import decode_order_cursor, encode_order_cursor, order_history_filter, order_item_count
+from pagination import encode_token
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+ORDERS = [
+    {"id": f"o{i}", "userId": "u1", "status": "delivered" if i % 3 else "pending",
+     "createdAt": START + timedelta(days=i // 2)}
+    for i in range(12)
+]
+
+
+def matches(order, query):
+    """Evaluate the subset of the Mongo query language order filters use."""
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(order, branch) for branch in condition):
+                return False
+        elif isinstance(condition, dict):
+            for op, value in condition.items():
+                ok = {
+                    "$lt": lambda v: order[field] < v,
+                    "$gte": lambda v: order[field] >= v,
+                    "$in": lambda v: order[field] in v,
+                }[op](value)
+                if not ok:
+                    return False
+        elif order[field] != condition:
+            return False
+    return True
+
+
+def newest_first(orders):
+    return sorted(orders, key=lambda order: (order["createdAt"], order["id"]), reverse=True)
+
+
+def test_cursor_pages_walk_the_history_once():
+    statuses = ["delivered"]
+    since, until = START + timedelta(days=1), START + timedelta(days=5)
+    expected = newest_first(
+        order for order in ORDERS if order["status"] == "delivered" and since <= order["createdAt"] < until
+    )
+    seen, after = [], None
+    while True:
+        query = order_history_filter("u1", statuses, since, until, after)
+        page = newest_first(order for order in ORDERS if matches(order, query))[:2]
+        if not page:
+            break
+        seen.extend(page)
+        after = decode_order_cursor(encode_order_cursor(page[-1]))
+    assert [order["id"] for order in seen] == [order["id"] for order in expected]
+
+
+def test_status_filter_uses_in_for_several_statuses():
+    assert order_history_filter("u1", ["pending"]) == {"userId": "u1", "status": "pending"}
+    assert order_history_filter("u1", ["pending", "shipped"])["status"] == {"$in": ["pending", "shipped"]}
+
+
+def test_naive_timestamps_are_encoded_as_utc():
+    token = encode_order_cursor({"createdAt": datetime(2024, 3, 1, 9, 30), "id": "o1"})
+    assert decode_order_cursor(token) == (datetime(2024, 3, 1, 9, 30, tzinfo=timezone.utc), "o1")
+
+
+@pytest.mark.parametrize("token", ["%%%", encode_token({"id": "o1"}), encode_token({"createdAt": 5, "id": "o1"})])
+def test_malformed_cursors_are_rejected(token):
+    with pytest.raises(ValueError):
+        decode_order_cursor(token)
+
+
+def test_item_count_defaults_quantity_to_one():
+    assert order_item_count([{"quantity": 2}, {}, {"quantity": 3}]) == 6
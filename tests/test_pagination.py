@@ -0,0 +1,75 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from pagination import (
+    SORT_KEYS,
+    Cursor,
+    cursor_after,
+    decode_cursor,
+    encode_cursor,
+    encode_token,
+    keyset_filter,
+    parse_datetime,
+)
+
+DOCS = [
+    {"id": f"p{i}", "price": price, "rating": rating}
+    for i, (price, rating) in enumerate([(500, 4.0), (900, 4.5), (500, 5.0), (1200, 4.0), (900, 4.0), (500, 4.5)])
+]
+
+
+def matches(doc, query):
+    """Evaluate the subset of the Mongo query language keyset filters use."""
+    if "$or" in query:
+        return any(matches(doc, branch) for branch in query["$or"])
+    for field, condition in query.items():
+        if isinstance(condition, dict):
+            (op, value), = condition.items()
+            if not (doc[field] < value if op == "$lt" else doc[field] > value):
+                return False
+        elif doc[field] != condition:
+            return False
+    return True
+
+
+def ordered(sort):
+    field, direction = SORT_KEYS[sort]
+    by_id = sorted(DOCS, key=lambda doc: doc["id"])
+    if field == "id":
+        return by_id[::-1]
+    return sorted(by_id, key=lambda doc: direction * doc[field])
+
+
+def test_cursor_tokens_round_trip():
+    cursor = Cursor(sort="price_high", value=900, id="p4")
+    token = encode_cursor(cursor)
+    assert "=" not in token
+    assert decode_cursor(token) == cursor
+    assert decode_cursor(encode_cursor(Cursor(sort="featured", offset=40))) == Cursor(sort="featured", offset=40)
+
+
+@pytest.mark.parametrize("token", [
+    "not base64!",
+    encode_token({"sort": "cheapest", "id": "p1"}),
+    encode_token({"sort": "newest"}),
+    encode_token({"sort": "newest", "offset": -1}),
+    encode_token({"sort": "newest", "id": "p1", "page": 2}),
+    encode_token(["newest"]),
+])
+def test_malformed_cursors_are_rejected(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+
+@pytest.mark.parametrize("sort", list(SORT_KEYS))
+def test_keyset_filter_selects_exactly_the_rows_after_the_cursor(sort):
+    rows = ordered(sort)
+    for i, row in enumerate(rows):
+        after = keyset_filter(cursor_after(sort, row))
+        assert [doc["id"] for doc in rows if matches(doc, after)] == [doc["id"] for doc in rows[i + 1:]]
+
+
+def test_parse_datetime_defaults_to_utc():
+    assert parse_datetime("2024-03-01T10:00:00") == datetime(2024, 3, 1, 10, tzinfo=timezone.utc)
+    assert parse_datetime("2024-03-01T10:00:00Z") == datetime(2024, 3, 1, 10, tzinfo=timezone.utc)
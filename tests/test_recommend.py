@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from catalog import CatalogSnapshot
+from recommend import budget_score, recommend, score_quiz, style_tags
+
+DOCS = [
+    {"id": "a", "price": 40000.0, "rating": 4.0, "metal": "Gold", "occasion": ["Wedding"], "tags": ["temple", "bridal"]},
+    {"id": "b", "price": 45000.0, "rating": 5.0, "metal": "Gold", "occasion": ["Wedding"], "tags": ["minimal"]},
+    {"id": "c", "price": 5000.0, "rating": 4.5, "metal": "Silver", "occasion": ["Daily Wear"], "tags": ["minimal", "daily"]},
+    {"id": "d", "price": 400000.0, "rating": 5.0, "metal": "Gold", "occasion": ["Wedding"], "tags": ["bridal"]},
+    {"id": "e", "price": None, "rating": None, "metal": "Platinum", "occasion": [], "tags": []},
+]
+
+
+def test_style_tags_expand_known_styles_and_keep_unknown_words():
+    assert style_tags("Traditional")[:2] == ["traditional", "ethnic"]
+    assert style_tags("vintage boho") == ["vintage", "boho"]
+
+
+def test_budget_score_falls_off_outside_the_range():
+    scores = budget_score(np.array([30000.0, 50000.0, 62500.0, np.nan]), [20000, 50000])
+    assert scores[:2].tolist() == [1.0, 1.0]
+    assert scores[2] == pytest.approx(np.exp(-1))
+    assert scores[3] == 0.0
+    assert budget_score(np.array([1.0]), []).tolist() == [1.0]
+
+
+def test_recommend_ranks_soft_matches_and_fills_the_page():
+    snapshot = CatalogSnapshot(DOCS)
+    ranked = recommend(snapshot, "Wedding", [30000, 50000], "traditional", "Gold", limit=4)
+    assert [doc["id"] for doc in ranked] == ["a", "b", "d", "c"]
+    # Nothing matches the metal, yet the page is still full.
+    assert len(recommend(snapshot, None, [], None, "Titanium", limit=10)) == 5
+
+
+def test_equal_scores_follow_the_featured_order():
+    snapshot = CatalogSnapshot([dict(doc, rating=4.0, tags=[]) for doc in DOCS[:3]])
+    assert np.unique(score_quiz(snapshot, None, [], None, None)).size == 1
+    assert [doc["id"] for doc in recommend(snapshot, None, [], None, None)] == ["a", "b", "c"]
+
+
+def test_empty_catalog():
+    assert recommend(CatalogSnapshot([]), "Wedding", [1, 2], None, None) == []
@@ -0,0 +1,85 @@
+import random
+
+import numpy as np
+import pytest
+
+from related import WEIGHTS, RelatedIndex, _Features
+
+
+def make_catalog(n, seed=7):
+    rng = random.Random(seed)
+    tags = ["bridal", "daily", "floral", "temple", "minimal", "party", "heritage"]
+    return [
+        {
+            "id": f"p{i:04d}",
+            "category": rng.choice(["Rings", "Earrings", "Necklaces", "Bangles"]),
+            "metal": rng.choice(["Gold", "Silver", "Platinum"]),
+            "purity": rng.choice(["22K", "18K", "925"]),
+            "tags": rng.sample(tags, rng.randint(0, 3)),
+            "occasion": rng.sample(["Wedding", "Festive", "Office"], rng.randint(0, 2)),
+            "price": rng.uniform(1000, 200000),
+        }
+        for i in range(n)
+    ]
+
+
+def brute_force(docs, k):
+    ids = sorted(doc["id"] for doc in docs)
+    by_id = {doc["id"]: doc for doc in docs}
+    features = _Features([by_id[doc_id] for doc_id in ids])
+    sim = features.similarity(np.arange(len(ids)), np.arange(len(ids)))
+    table = {}
+    for i, doc_id in enumerate(ids):
+        ranked = sorted((j for j in range(len(ids)) if j != i), key=lambda j: (-sim[i, j], ids[j]))
+        table[doc_id] = [ids[j] for j in ranked[:k]]
+    return table
+
+
+def test_price_similarity_halves_per_doubling():
+    # Nothing but the price in common, so the score is the weighted price term
+    docs = [{"id": f"p{i}", "price": price} for i, price in enumerate([999, 1999, 3999, 0])]
+    sim = _Features(docs).similarity(np.arange(4), np.arange(4))
+    assert sim[0, 0] == pytest.approx(WEIGHTS["price"])
+    assert sim[0, 1] == pytest.approx(WEIGHTS["price"] / 2)
+    assert sim[1, 0] == pytest.approx(WEIGHTS["price"] / 2)
+    assert sim[0, 2] == pytest.approx(WEIGHTS["price"] / 4)
+    assert sim[3, 0] == pytest.approx(WEIGHTS["price"] / 1000)
+
+
+def test_full_build_matches_brute_force():
+    docs = make_catalog(120)
+    index = RelatedIndex(k=5)
+    index.apply(docs, [])
+    expected = brute_force(docs, 5)
+    assert {doc_id: index.neighbours(doc_id) for doc_id in expected} == expected
+
+
+def test_incremental_patch_matches_rebuild():
+    docs = make_catalog(200)
+    index = RelatedIndex(k=5)
+    index.apply(docs, [])
+
+    changed = dict(docs[3], price=docs[3]["price"] * 3, tags=["bridal"])
+    added = dict(docs[10], id="p9999")
+    index.apply([changed, added], ["p0042"])
+
+    current = {doc["id"]: doc for doc in docs}
+    current.pop("p0042")
+    current[changed["id"]] = changed
+    current[added["id"]] = added
+    expected = brute_force(list(current.values()), 5)
+    assert index.neighbours("p0042") is None
+    assert {doc_id: index.neighbours(doc_id) for doc_id in expected} == expected
+
+
+def test_prepare_does_not_change_the_served_table():
+    docs = make_catalog(50)
+    index = RelatedIndex(k=3)
+    index.apply(docs, [])
+    before = {doc["id"]: index.neighbours(doc["id"]) for doc in docs}
+
+    swap = index.prepare([], ["p0001"])
+    assert {doc["id"]: index.neighbours(doc["id"]) for doc in docs} == before
+    swap()
+    assert index.neighbours("p0001") is None
+    assert len(index) == 49
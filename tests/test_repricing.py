@@ -0,0 +1,175 @@
+import asyncio
+
+import pytest
+from pymongo.errors import AutoReconnect
+
+import repricing
+from repricing import compute_prices, purity_fraction, reprice_catalog, resolve_rate
+
+TABLE = {"Gold": 7200, "Silver": {"925": 88}}
+
+
+def product(product_id, metal="Gold", purity="22K", weight=10.0, stone=0.0, making=5000.0, price=0.0):
+    return {
+        "id": product_id,
+        "metal": metal,
+        "purity": purity,
+        "grossWeight": weight,
+        "price": price,
+        "priceBreakup": {"metalCost": 0.0, "stoneCost": stone, "makingCharges": making, "gst": 0.0},
+    }
+
+
+def test_rates_scale_by_purity_or_use_explicit_rates():
+    assert purity_fraction("18k") == 0.75
+    assert purity_fraction("925") == 0.925
+    assert purity_fraction("n/a") is None
+    assert resolve_rate(TABLE, "Gold", "22K") == pytest.approx(6600)
+    assert resolve_rate(TABLE, "Silver", "925") == 88
+    assert resolve_rate(TABLE, "Silver", "999") is None
+    assert resolve_rate(TABLE, "Platinum", "950") is None
+
+
+def test_compute_prices():
+    docs = [product("g"), product("s", metal="Silver", purity="925", weight=20, making=500), product("p", metal="Platinum")]
+    priceable, changed, columns = compute_prices(docs, TABLE)
+    assert priceable.tolist() == [True, True, False]
+    assert changed.tolist() == [True, True, False]
+    assert columns["metalCost"][0] == 66000
+    assert columns["gst"][0] == round(0.03 * 71000)
+    assert columns["price"][1] == 1760 + 500 + round(0.03 * 2260)
+
+
+class Collection:
+    """In-memory collection supporting the calls a repricing run makes."""
+
+    def __init__(self, db, name, docs=()):
+        self.db = db
+        self.name = name
+        self.docs = {doc["id"]: doc for doc in docs}
+        self.indexes = {"_id_": {"key": [("_id", 1)]}}
+        self.batches = 0
+
+    def _cursor(self, docs):
+        class Cursor:
+            async def to_list(self, length):
+                return docs
+
+        return Cursor()
+
+    def find(self, filter, projection):
+        return self._cursor([dict(doc, priceBreakup=dict(doc["priceBreakup"])) for doc in self.docs.values()])
+
+    def aggregate(self, pipeline):
+        (stage,) = pipeline
+        copy = self.db[stage["$out"]]
+        copy.docs = {doc_id: dict(doc, priceBreakup=dict(doc["priceBreakup"])) for doc_id, doc in self.docs.items()}
+        return self._cursor([])
+
+    async def bulk_write(self, requests, ordered=True):
+        self.db.before_write(self)
+        self.batches += 1
+        for request in requests:
+            doc = self.docs[request._filter["id"]]
+            for path, value in request._doc["$set"].items():
+                if path.startswith("priceBreakup."):
+                    doc["priceBreakup"][path.split(".", 1)[1]] = value
+                else:
+                    doc[path] = value
+
+    async def index_information(self):
+        return self.indexes
+
+    async def create_index(self, keys, name, unique, background, **options):
+        self.indexes[name] = {"key": keys, "unique": unique}
+
+    async def drop(self):
+        self.db.collections.pop(self.name, None)
+
+    async def find_one_and_update(self, filter, update, upsert, return_document):
+        self.db.version += 1
+        return {"version": self.db.version}
+
+
+class Admin:
+    def __init__(self, db):
+        self.db = db
+
+    async def command(self, name, source, to, dropTarget):
+        assert (name, dropTarget) == ("renameCollection", True)
+        collections = self.db.collections
+        staging = collections.pop(source.split(".", 1)[1])
+        staging.name = to.split(".", 1)[1]
+        collections[staging.name] = staging
+
+
+class DB:
+    name = "shop"
+
+    def __init__(self, docs, before_write=lambda collection: None):
+        self.collections = {}
+        self.products.docs = {doc["id"]: doc for doc in docs}
+        self.client = type("Client", (), {"admin": Admin(self)})()
+        self.before_write = before_write
+        self.version = 0
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = Collection(self, name)
+        return self.collections[name]
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+NEW_PRICE = 66000 + 5000 + 2130
+
+
+def test_new_prices_go_live_in_one_swap():
+    def live_prices_unchanged(collection):
+        assert collection.name != "products"
+        assert all(doc["price"] == 0 for doc in db.products.docs.values())
+
+    db = DB([product(f"p{i}") for i in range(5)], before_write=live_prices_unchanged)
+    report = asyncio.run(reprice_catalog(db, TABLE, batch_size=2))
+    assert (report.products, report.changed) == (5, 5)
+    assert all(doc["price"] == NEW_PRICE for doc in db.products.docs.values())
+    assert "price_1_id_1" in db.products.indexes
+    assert set(db.collections) == {"products", "catalog_meta"}
+    assert db.version == 1
+
+    report = asyncio.run(reprice_catalog(db, TABLE))
+    assert report.changed == 0
+    assert db.version == 1
+
+
+def test_failed_run_leaves_the_live_catalog_untouched():
+    def fail_second_batch(collection):
+        if collection.batches == 1:
+            raise AutoReconnect("connection reset")
+
+    db = DB([product(f"p{i}") for i in range(5)], before_write=fail_second_batch)
+    with pytest.raises(AutoReconnect):
+        asyncio.run(reprice_catalog(db, TABLE, batch_size=2))
+    assert all(doc["price"] == 0 for doc in db.products.docs.values())
+    assert set(db.collections) == {"products"}
+    assert db.version == 0
+
+
+def test_dry_run_writes_nothing():
+    db = DB([product("p1")])
+    report = asyncio.run(reprice_catalog(db, TABLE, dry_run=True))
+    assert (report.products, report.changed) == (1, 1)
+    assert set(db.collections) == {"products"}
+
+
+def test_a_failed_version_bump_is_logged_after_the_swap(monkeypatch, caplog):
+    async def bump(db):
+        raise AutoReconnect("primary stepped down")
+
+    monkeypatch.setattr(repricing, "bump_catalog_version", bump)
+    db = DB([product("p1")])
+    report = asyncio.run(reprice_catalog(db, TABLE))
+    assert report.changed == 1
+    assert db.products.docs["p1"]["price"] == NEW_PRICE
+    assert "version bump failed" in caplog.text
@@ -0,0 +1,128 @@
+import asyncio
+import shutil
+
+import pytest
+from bson import Timestamp
+from pymongo import monitoring
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+from routing import (
+    ReadRouter,
+    parse_read_preferences,
+    sign_causal_token,
+    user_session,
+    verify_causal_token,
+)
+
+SECRET = b"test-secret"
+
+
+class FakeClient:
+    def get_database(self, name, read_preference=None):
+        return (name, read_preference)
+
+
+class FakeSession:
+    def __init__(self, cluster_time=None, operation_time=None):
+        self.cluster_time = {"clusterTime": cluster_time} if cluster_time else None
+        self.operation_time = operation_time
+
+
+def make_router(**routes):
+    return ReadRouter(FakeClient(), "shop", routes, secret=SECRET)
+
+
+def test_modes_fall_back_to_the_route_prefix_then_primary():
+    router = make_router(**{"products.export": "secondary"})
+    assert router.mode("products.list") == "secondaryPreferred"
+    assert router.mode("products.export") == "secondary"
+    assert router.mode("appointments") == "primary"
+
+
+def test_primary_ignores_route_overrides():
+    router = make_router(primary="secondary")
+    assert router.primary()[1] == Primary()
+    assert router.database("products.list")[1] == SecondaryPreferred(max_staleness=90)
+
+
+def test_parse_read_preferences_rejects_unknown_modes():
+    assert parse_read_preferences(" orders=primary, ,stores=nearest") == {"orders": "primary", "stores": "nearest"}
+    with pytest.raises(ValueError):
+        parse_read_preferences("orders=fastest")
+
+
+def test_token_round_trip_and_tampering():
+    token = sign_causal_token(Timestamp(100, 1), SECRET)
+    assert verify_causal_token(token, SECRET) == Timestamp(100, 1)
+    assert verify_causal_token(token, b"other-secret") is None
+    signature = token.partition(".")[2]
+    forged = sign_causal_token(Timestamp(2 ** 31, 1), b"guess").partition(".")[0]
+    assert verify_causal_token(f"{forged}.{signature}", SECRET) is None
+    assert verify_causal_token("garbage!!", SECRET) is None
+    assert verify_causal_token(None, SECRET) is None
+
+
+def test_tokens_ahead_of_the_known_cluster_time_are_ignored():
+    router = make_router()
+    token = sign_causal_token(Timestamp(100, 1), SECRET)
+    # Nothing seen yet: the token cannot be vouched for
+    assert router.resume_time(token) is None
+    issued = router.issue_token(FakeSession(Timestamp(100, 5), Timestamp(100, 1)))
+    assert router.resume_time(issued) == Timestamp(100, 1)
+    assert router.resume_time(sign_causal_token(Timestamp(101, 1), SECRET)) is None
+
+
+@pytest.fixture(scope="module")
+def replica_set():
+    if shutil.which("mongod") is None:
+        pytest.skip("mongod is not installed")
+    from benchmarks.standin import LocalMongo
+
+    with LocalMongo() as mongo:
+        yield mongo.url
+
+
+class FindRecorder(monitoring.CommandListener):
+    def __init__(self):
+        self.finds = []
+
+    def started(self, event):
+        if event.command_name == "find":
+            self.finds.append(event.command)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def test_reads_are_routed_and_see_the_shoppers_writes(replica_set):
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def scenario():
+        recorder = FindRecorder()
+        client = AsyncIOMotorClient(replica_set, event_listeners=[recorder])
+        router = ReadRouter(client, "routing_test", secret=SECRET)
+        try:
+            await router.primary().products.insert_one({"id": "p1"})
+            await router.database("products.list").products.find_one({"id": "p1"})
+            catalog_read = recorder.finds[-1]
+
+            async with user_session(router, "cart", None) as user:
+                await router.primary().cart.insert_one({"userId": "u1", "productId": "p1"}, session=user.session)
+                token = user.token
+            async with user_session(router, "cart", token) as user:
+                assert user.db is router.database("cart")
+                lines = await user.db.cart.find({"userId": "u1"}, session=user.session).to_list(10)
+            cart_read = recorder.finds[-1]
+            return catalog_read, cart_read, lines
+        finally:
+            await client.drop_database("routing_test")
+            client.close()
+
+    catalog_read, cart_read, lines = asyncio.run(scenario())
+    assert catalog_read["$readPreference"] == {"mode": "secondaryPreferred", "maxStalenessSeconds": 90}
+    assert cart_read["$readPreference"]["mode"] == "secondaryPreferred"
+    assert "afterClusterTime" in cart_read["readConcern"]
+    assert [line["productId"] for line in lines] == ["p1"]
@@ -0,0 +1,59 @@
+import re
+
+from search import SearchIndex, literal_pattern, regex_filter, tokenize
+
+DOCS = [
+    {"id": "r1", "name": "Solitaire Diamond Ring", "sku": "RG-1001", "category": "Rings", "tags": ["diamond"]},
+    {"id": "r2", "name": "Gold Band", "sku": "RG-1002", "category": "Rings", "description": "plain gold ring"},
+    {"id": "n1", "name": "Layered Necklace", "sku": "NK-2001", "category": "Necklaces", "occasion": ["Wedding"]},
+    {"id": "e1", "name": "Crème Drop Earrings", "sku": "ER-3001", "category": "Earrings"},
+]
+
+
+def build(docs=DOCS):
+    index = SearchIndex()
+    index.apply(docs, [])
+    return index
+
+
+def ids(results):
+    return [doc_id for doc_id, _ in results]
+
+
+def test_tokenize_folds_accents_and_case():
+    assert tokenize("Crème  DROP-earrings!") == ["creme", "drop", "earrings"]
+
+
+def test_every_token_must_match():
+    index = build()
+    assert ids(index.search("gold ring")) == ["r2"]
+    assert index.search("gold necklace") == []
+    assert index.search("   ") == []
+
+
+def test_name_hits_outrank_description_hits():
+    assert ids(build().search("ring")) == ["r1", "r2"]
+
+
+def test_prefixes_and_whole_skus_match():
+    index = build()
+    assert ids(index.search("neck")) == ["n1"]
+    assert ids(index.search("rg1001")) == ["r1"]
+    assert ids(index.search("creme")) == ["e1"]
+
+
+def test_apply_updates_and_removes_documents():
+    index = build()
+    index.apply([dict(DOCS[2], name="Layered Chain")], ["r1"])
+    assert len(index) == 3
+    assert index.search("solitaire") == []
+    assert ids(index.search("chain")) == ["n1"]
+    # Still found by prefix through its category
+    assert ids(index.search("necklace")) == ["n1"]
+
+
+def test_regex_fallback_matches_literally():
+    pattern = literal_pattern("  18k (rose)   gold ")
+    assert re.search(pattern, "18k (rose) gold ring")
+    assert not re.search(pattern, "18k rose gold ring")
+    assert regex_filter("a.b")["$or"][0] == {"name": {"$regex": r"a\.b", "$options": "i"}}
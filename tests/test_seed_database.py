@@ -0,0 +1,74 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from pymongo import DeleteOne
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from indexes import INDEX_SPEC  # noqa: E402
+from seed_database import seed  # noqa: E402
+from sync_catalog import DEFAULT_SOURCE  # noqa: E402
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = {}
+        self.indexes = {"_id_": {"key": [("_id", 1)]}}
+
+    def find(self, filter, projection):
+        async def rows():
+            for doc in list(self.docs.values()):
+                yield dict(doc)
+        return rows()
+
+    async def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            if isinstance(request, DeleteOne):
+                self.docs.pop(request._filter["id"], None)
+            else:
+                self.docs[request._filter["id"]] = dict(request._doc)
+
+    async def delete_many(self, filter):
+        self.docs.clear()
+
+    async def insert_many(self, docs, ordered=True):
+        self.docs.update((doc["id"], dict(doc)) for doc in docs)
+
+    async def index_information(self):
+        return self.indexes
+
+    async def create_index(self, keys, name, unique, background, **options):
+        self.indexes[name] = {"key": keys, "unique": unique}
+
+    async def find_one_and_update(self, filter, update, upsert, return_document):
+        doc = self.docs.setdefault(filter["_id"], {"version": 0})
+        doc["version"] += update["$inc"]["version"]
+        return doc
+
+
+class FakeDB(dict):
+    def __missing__(self, name):
+        collection = self[name] = FakeCollection()
+        return collection
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+def test_seed_bumps_the_catalog_version_on_every_run(tmp_path):
+    source = tmp_path / "products.json"
+    source.write_text(json.dumps(json.loads(DEFAULT_SOURCE.read_text())[:3]))
+    db = FakeDB()
+
+    asyncio.run(seed(db, source))
+    assert len(db.products.docs) == 3
+    assert len(db.stores.docs) == 5
+    assert all(index.name in db[name].indexes for name, indexes in INDEX_SPEC.items() for index in indexes)
+    assert db.catalog_meta.docs["catalog"]["version"] == 1
+
+    # Nothing changed in the feed, so the script bumps the version itself for
+    # the rewritten stores.
+    asyncio.run(seed(db, source))
+    assert db.catalog_meta.docs["catalog"]["version"] == 2
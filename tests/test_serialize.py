@@ -0,0 +1,41 @@
+import json
+from datetime import datetime, timezone
+
+from fields import VIEWS, FieldSet
+from serialize import FastJSONResponse, FragmentCache, RawJSON, dumps
+
+DOC = {"id": "p1", "name": "Ring", "price": 1200.5, "images": ["a.jpg", "b.jpg"], "description": "long"}
+
+
+def test_dumps_splices_raw_fragments():
+    body = dumps({"products": [RawJSON(b'{"id":"p1"}')], "total": 1, "at": datetime(2024, 1, 1, tzinfo=timezone.utc)})
+    assert json.loads(body) == {"products": [{"id": "p1"}], "total": 1, "at": "2024-01-01T00:00:00+00:00"}
+    assert FastJSONResponse({"ok": True}).body == b'{"ok":true}'
+
+
+def test_fragments_are_reused_until_the_document_object_changes():
+    cache = FragmentCache()
+    card = VIEWS["card"]
+    first = cache.encode(DOC, card)
+    assert cache.encode(DOC, card) is first
+    assert json.loads(first.data) == {"id": "p1", "name": "Ring", "price": 1200.5, "images": ["a.jpg"]}
+    assert json.loads(cache.encode(DOC).data) == DOC
+
+    # A new snapshot carries a new object for a changed product.
+    changed = dict(DOC, price=999.0)
+    assert json.loads(cache.encode(changed, card).data)["price"] == 999.0
+    assert len(cache) == 1
+
+
+def test_ad_hoc_fieldsets_are_not_cached():
+    cache = FragmentCache()
+    fieldset = FieldSet("id,price", ("id", "price"))
+    assert json.loads(cache.encode(DOC, fieldset).data) == {"id": "p1", "price": 1200.5}
+    assert len(cache) == 0
+
+
+def test_catalog_changes_drop_fragments():
+    cache = FragmentCache()
+    cache.encode_many([DOC, dict(DOC, id="p2"), dict(DOC, id="p3")])
+    cache.apply([DOC], ["p2"])
+    assert len(cache) == 1
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight, query_key
+
+
+def test_concurrent_identical_reads_share_one_call():
+    async def scenario():
+        flights = SingleFlight()
+        calls = []
+
+        async def read(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return f"result {key}"
+
+        results = await asyncio.gather(*(
+            flights.do("products.find", key, lambda key=key: read(key)) for key in ["a", "a", "a", "b"]
+        ))
+        # Landed flights are forgotten, so a later read runs again.
+        again = await flights.do("products.find", "a", lambda: read("a"))
+        return results, again, calls, len(flights), flights.hot_keys()
+
+    results, again, calls, inflight, hot = asyncio.run(scenario())
+    assert results == ["result a", "result a", "result a", "result b"]
+    assert again == "result a"
+    assert calls == ["a", "b", "a"]
+    assert inflight == 0
+    assert hot == [(("products.find", "a"), 2)]
+
+
+def test_errors_reach_every_waiter():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        return await asyncio.gather(*(flights.do("op", "k", fail) for _ in range(3)), return_exceptions=True)
+
+    assert [str(result) for result in asyncio.run(scenario())] == ["boom"] * 3
+
+
+def test_a_cancelled_leader_does_not_cancel_followers():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def read():
+            await asyncio.sleep(0.02)
+            return 42
+
+        leader = asyncio.ensure_future(flights.do("op", "k", read))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do("op", "k", read))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == 42
+
+
+def test_query_key_ignores_dict_order():
+    assert query_key({"a": 1, "b": [1, 2]}, "price_low") == query_key({"b": [1, 2], "a": 1}, "price_low")
+    assert query_key({"a": 1}) != query_key({"a": 2})
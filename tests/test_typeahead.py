@@ -0,0 +1,64 @@
+from typeahead import TypeaheadIndex
+
+DOCS = [
+    {"id": "p1", "name": "Traditional Gold Jhumkas", "sku": "GJ-001", "category": "Earrings",
+     "tags": ["temple"], "rating": 4.8, "reviewCount": 120, "price": 45000},
+    {"id": "p2", "name": "Silver Oxidized Jhumkas", "sku": "SJ-002", "category": "Earrings",
+     "tags": ["boho"], "rating": 4.2, "reviewCount": 40, "price": 2500},
+    {"id": "p3", "name": "Diamond Solitaire Ring", "sku": "DR-003", "category": "Rings",
+     "tags": ["bridal"], "rating": 4.9, "reviewCount": 300, "price": 150000},
+]
+
+STATE = ("_docs", "_doc_terms", "_terms", "_postings", "_prefix_counts", "_fuzzy", "_suggestions", "_scores")
+
+
+def build(docs):
+    index = TypeaheadIndex()
+    index.apply(docs, [])
+    return index
+
+
+def names(suggestions):
+    return [suggestion["name"] for suggestion in suggestions]
+
+
+def test_prefix_matches_rank_by_popularity():
+    index = build(DOCS)
+    assert names(index.suggest("jhu")) == ["Traditional Gold Jhumkas", "Silver Oxidized Jhumkas"]
+    assert names(index.suggest("silver jhu")) == ["Silver Oxidized Jhumkas"]
+    assert index.suggest("zz") == []
+
+
+def test_sku_and_typo_tolerance():
+    index = build(DOCS)
+    assert names(index.suggest("dr003")) == ["Diamond Solitaire Ring"]
+    assert names(index.suggest("solitiare")) == ["Diamond Solitaire Ring"]
+
+
+def test_small_change_is_patched_in_place():
+    docs = DOCS + [
+        {"id": f"x{i}", "name": f"Plain Band {i}", "category": "Rings", "rating": 3.0, "reviewCount": 1}
+        for i in range(20)
+    ]
+    index = build(docs)
+    terms = index._terms
+    renamed = dict(DOCS[2], name="Emerald Halo Ring")
+    index.apply([renamed], ["p2"])
+
+    assert index._terms is terms
+    assert names(index.suggest("emer")) == ["Emerald Halo Ring"]
+    assert index.suggest("diamond") == []
+    assert names(index.suggest("jhu")) == ["Traditional Gold Jhumkas"]
+
+    expected = build([doc for doc in docs if doc["id"] not in ("p2", "p3")] + [renamed])
+    for attribute in STATE:
+        assert getattr(index, attribute) == getattr(expected, attribute), attribute
+
+
+def test_prepare_leaves_the_served_index_alone():
+    index = build(DOCS)
+    swap = index.prepare([], ["p1", "p2"])
+    assert len(names(index.suggest("jhu"))) == 2
+    swap()
+    assert index.suggest("jhu") == []
+    assert len(index) == 1